@@ -0,0 +1,76 @@
+"""
+Benchmarks for the overhead of the lambda_pipeline framework.
+
+Run from the repository root with:
+
+    python -m benchmarks list [PATTERN]
+    python -m benchmarks run [PATTERN] [--output results.json] [--min-time 0.5]
+    python -m benchmarks compare baseline.json current.json [--threshold 0.1]
+
+where PATTERN is a glob of benchmark names, e.g. "handler.*". `compare` exits
+with a non-zero status if the p50 latency of any benchmark has increased by
+more than the threshold (a fraction of the baseline).
+"""
+import argparse
+import sys
+from pathlib import Path
+
+from benchmarks import (
+    batch,
+    compile_pipeline,
+    context,
+    dependencies,
+    early_exit,
+    events,
+    framework,
+    handler,
+    memory,
+    pipeline_data,
+    response_rendering,
+    retry,
+    router,
+)
+from benchmarks.harness import compare, find, read_results, run_all, write_results
+from example.api import response
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    list_parser = subparsers.add_parser("list", help="list the benchmarks")
+    list_parser.add_argument("pattern", nargs="?", default="*")
+
+    run_parser = subparsers.add_parser("run", help="run the benchmarks")
+    run_parser.add_argument("pattern", nargs="?", default="*")
+    run_parser.add_argument("--output", type=Path)
+    run_parser.add_argument("--min-time", type=float, default=0.5)
+
+    compare_parser = subparsers.add_parser("compare", help="compare two runs")
+    compare_parser.add_argument("baseline", type=Path)
+    compare_parser.add_argument("current", type=Path)
+    compare_parser.add_argument("--threshold", type=float, default=0.1)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "list":
+        print("\n".join(find(args.pattern)))
+    elif args.command == "run":
+        response.logger.setLevel("WARNING")
+        results = run_all(pattern=args.pattern, min_time=args.min_time)
+        if args.output:
+            write_results(results=results, path=args.output)
+    elif args.command == "compare":
+        regressions = compare(
+            baseline=read_results(args.baseline),
+            current=read_results(args.current),
+            threshold=args.threshold,
+        )
+        if regressions:
+            print(f"{len(regressions)} regression(s) above {args.threshold:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
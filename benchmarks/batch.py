@@ -0,0 +1,97 @@
+"""
+Processing an SQS event of 100 records with the batch pipeline: the framework's
+overhead per record (a step which does nothing), and the throughput with a step
+which waits on (simulated) I/O for 1 ms, with and without concurrency, and with
+a batch step which waits for 1 ms per chunk of 25 records.
+"""
+import time
+from logging import Logger, getLogger
+from typing import Any
+
+from aws_lambda_powertools.utilities.parser.models import SqsRecordModel
+
+from benchmarks.harness import benchmark
+from lambda_pipeline.batch import batch_step, compile_batch_pipeline
+from lambda_pipeline.types import FrozenDict, LambdaContext, PipelineData
+
+LOGGER = getLogger(__name__)
+N_RECORDS = 100
+IO_TIME = 0.001
+
+
+def _make_event(n_records: int) -> dict:
+    record = {
+        "messageId": "",
+        "receiptHandle": "receipt-handle",
+        "body": "{}",
+        "attributes": {
+            "ApproximateReceiveCount": "1",
+            "SentTimestamp": "1545082649183",
+            "SenderId": "AIDAIENQZJOLO23YVJ4VO",
+            "ApproximateFirstReceiveTimestamp": "1545082649185",
+        },
+        "messageAttributes": {},
+        "md5OfBody": "99914b932bd37a50b983c5e7c90ae93b",
+        "eventSource": "aws:sqs",
+        "eventSourceARN": "arn:aws:sqs:eu-west-2:123456789012:queue",
+        "awsRegion": "eu-west-2",
+    }
+    return {"Records": [dict(record, messageId=str(i)) for i in range(n_records)]}
+
+
+def passthrough_step(
+    data: PipelineData,
+    event: SqsRecordModel,
+    context: LambdaContext,
+    dependencies: FrozenDict[str, Any],
+    logger: Logger,
+) -> PipelineData:
+    return data
+
+
+def io_step(
+    data: PipelineData,
+    event: SqsRecordModel,
+    context: LambdaContext,
+    dependencies: FrozenDict[str, Any],
+    logger: Logger,
+) -> PipelineData:
+    time.sleep(IO_TIME)
+    return data
+
+
+@batch_step(batch_size=25)
+def batch_io_step(
+    records: list[tuple[PipelineData, SqsRecordModel]],
+    context: LambdaContext,
+    dependencies: FrozenDict[str, Any],
+    logger: Logger,
+) -> list[PipelineData]:
+    time.sleep(IO_TIME)
+    return [data for data, _ in records]
+
+
+def _process(step, max_concurrency: int):
+    compiled_pipeline = compile_batch_pipeline(
+        steps=[step],
+        event_type=SqsRecordModel,
+        validation="boundary",
+        max_concurrency=max_concurrency,
+    )
+    event = _make_event(n_records=N_RECORDS)
+    context = LambdaContext()
+    return lambda: compiled_pipeline.process(
+        event=event, context=context, dependencies={}, logger=LOGGER
+    )
+
+
+benchmark(f"batch.sqs[{N_RECORDS} records, passthrough]")(
+    lambda: _process(step=passthrough_step, max_concurrency=1)
+)
+for _max_concurrency in (1, 10):
+    benchmark(
+        f"batch.sqs[{N_RECORDS} records, 1 ms io, max_concurrency={_max_concurrency}]"
+    )(lambda max_concurrency=_max_concurrency: _process(io_step, max_concurrency))
+benchmark(f"batch.sqs[{N_RECORDS} records, 1 ms io per 25 records, batch step]")(
+    lambda: _process(step=batch_io_step, max_concurrency=1)
+)
@@ -0,0 +1,58 @@
+"""
+The per-invocation overhead of `make_pipeline` against binding a pipeline
+that was compiled once with `compile_pipeline` (in each validation mode),
+for the step list in `example.api.handler`.
+"""
+from logging import getLogger
+
+from benchmarks.harness import benchmark, load_event
+from example.api.handler import EventModel, build_shared_dependencies, steps
+from lambda_pipeline.pipeline import compile_pipeline, make_pipeline
+from lambda_pipeline.types import LambdaContext, PipelineData
+
+LOGGER = getLogger(__name__)
+
+
+@benchmark("compile_pipeline.make_pipeline")
+def invoke_make_pipeline():
+    event = EventModel(**load_event())
+    context = LambdaContext()
+    dependencies = build_shared_dependencies()
+
+    def invoke():
+        pipeline = make_pipeline(
+            steps=steps,
+            event=event,
+            context=context,
+            dependencies=dependencies,
+            logger=LOGGER,
+        )
+        return pipeline(data=PipelineData())
+
+    return invoke
+
+
+def _invoke_compiled_pipeline(validation: str):
+    event = EventModel(**load_event())
+    context = LambdaContext()
+    dependencies = build_shared_dependencies()
+    compiled_pipeline = compile_pipeline(
+        steps=steps, event_type=EventModel, validation=validation
+    )
+
+    def invoke():
+        pipeline = compiled_pipeline.bind(
+            event=event,
+            context=context,
+            dependencies=dependencies,
+            logger=LOGGER,
+        )
+        return pipeline(data=PipelineData())
+
+    return invoke
+
+
+for _validation in ("full", "boundary", "off"):
+    benchmark(f"compile_pipeline.compile_pipeline[{_validation}]")(
+        lambda validation=_validation: _invoke_compiled_pipeline(validation)
+    )
@@ -0,0 +1,85 @@
+"""
+Isolating the context from each step with a deepcopy (as
+do_not_persist_changes_to_context used to) against a ContextView, for both
+the construction cost and the per-step cost of reading from (and writing to)
+the isolated context, and for a step which reads the attributes that are
+logged.
+"""
+from copy import deepcopy
+from types import SimpleNamespace
+
+from benchmarks.harness import benchmark
+from lambda_pipeline.types import ContextView, LambdaContext
+
+
+def _minimal_context() -> LambdaContext:
+    context = LambdaContext()
+    context._function_name = "api"
+    return context
+
+
+def _populated_context() -> LambdaContext:
+    """Roughly the shape of the context given by the Lambda runtime"""
+    context = _minimal_context()
+    context._function_version = "$LATEST"
+    context._invoked_function_arn = "arn:aws:lambda:eu-west-2:123456789012:function:api"
+    context._memory_limit_in_mb = 512
+    context._aws_request_id = "c6af9ac6-7b61-11e6-9a41-93e8deadbeef"
+    context._log_group_name = "/aws/lambda/api"
+    context._log_stream_name = "2022/10/17/[$LATEST]c6af9ac67b6111e69a4193e8deadbeef"
+    context._identity = SimpleNamespace(
+        cognito_identity_id="eu-west-2:1234", cognito_identity_pool_id="eu-west-2:5678"
+    )
+    context._client_context = SimpleNamespace(
+        client=SimpleNamespace(installation_id="abc", app_title="app"),
+        custom={f"key_{i}": {"value": i} for i in range(20)},
+        env={"platform": "linux", "locale": "en-GB"},
+    )
+    return context
+
+
+def _step(context):
+    context.function_name
+    context._aws_request_id = "foo"
+    return context._aws_request_id
+
+
+def _logging_step(context):
+    """A step which reads the attributes that are added to its log lines"""
+    return (
+        context.function_name,
+        context.function_version,
+        context.invoked_function_arn,
+        context.memory_limit_in_mb,
+        context.aws_request_id,
+        context.get_remaining_time_in_millis(),
+    )
+
+
+CONTEXTS = {"minimal": _minimal_context, "populated": _populated_context}
+BENCHMARKS = {
+    "construct_deepcopy": lambda context: deepcopy(context),
+    "construct_context_view": lambda context: ContextView(context),
+    "step_deepcopy": lambda context: _step(deepcopy(context)),
+    "step_context_view": lambda context: _step(ContextView(context)),
+}
+
+for _context_name, _make_context in CONTEXTS.items():
+    for _name, _func in BENCHMARKS.items():
+        benchmark(f"context.{_name}[{_context_name}]")(
+            lambda func=_func, make_context=_make_context: (
+                lambda context=make_context(): func(context)
+            )
+        )
+
+
+@benchmark("context.logging_step_deepcopy[populated]")
+def _logging_step_deepcopy():
+    context = _populated_context()
+    return lambda: _logging_step(deepcopy(context))
+
+
+@benchmark("context.logging_step_context_view[populated]")
+def _logging_step_context_view():
+    context = _populated_context()
+    return lambda: _logging_step(ContextView(context))
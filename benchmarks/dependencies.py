@@ -0,0 +1,84 @@
+"""
+Dependencies for a pipeline with 10 dependencies (each of which takes a while to
+construct, like a boto3 client), whose steps only use one of them: a dict of the
+dependencies against a DependencyContainer of lazy dependencies. "cold_start"
+builds the dependencies and invokes the pipeline once, and "warm" binds and
+invokes the pipeline with dependencies that have already been built.
+"""
+from logging import Logger, getLogger
+from typing import Any
+
+from benchmarks.harness import benchmark, load_event
+from example.api.handler import EventModel
+from lambda_pipeline.dependencies import DependencyContainer, lazy
+from lambda_pipeline.pipeline import compile_pipeline
+from lambda_pipeline.types import FrozenDict, LambdaContext, PipelineData
+
+LOGGER = getLogger(__name__)
+N_DEPENDENCIES = 10
+
+
+class Client:
+    def __init__(self):
+        self.config = {f"option_{i}": i for i in range(2000)}
+
+
+def read_client(
+    data: PipelineData,
+    event: EventModel,
+    context: LambdaContext,
+    dependencies: FrozenDict[str, Any],
+    logger: Logger,
+) -> PipelineData:
+    return data.set("option", dependencies["client_0"].config["option_0"])
+
+
+def _build_dict() -> dict:
+    return {f"client_{i}": Client() for i in range(N_DEPENDENCIES)}
+
+
+def _build_container() -> DependencyContainer:
+    return DependencyContainer(
+        {f"client_{i}": lazy(Client) for i in range(N_DEPENDENCIES)}
+    )
+
+
+BUILDERS = {"dict": _build_dict, "container": _build_container}
+
+
+def _invoke(compiled_pipeline, event, dependencies) -> PipelineData:
+    pipeline = compiled_pipeline.bind(
+        event=event, context=LambdaContext(), dependencies=dependencies, logger=LOGGER
+    )
+    return pipeline(data=PipelineData())
+
+
+def _cold_start(builder: str, validation: str):
+    event = EventModel(**load_event())
+    compiled_pipeline = compile_pipeline(
+        steps=[read_client], event_type=EventModel, validation=validation
+    )
+    build = BUILDERS[builder]
+    return lambda: _invoke(compiled_pipeline, event=event, dependencies=build())
+
+
+def _warm(builder: str, validation: str):
+    event = EventModel(**load_event())
+    compiled_pipeline = compile_pipeline(
+        steps=[read_client], event_type=EventModel, validation=validation
+    )
+    dependencies = BUILDERS[builder]()
+    _invoke(compiled_pipeline, event=event, dependencies=dependencies)
+    return lambda: _invoke(compiled_pipeline, event=event, dependencies=dependencies)
+
+
+for _builder in BUILDERS:
+    for _validation in ("full", "boundary"):
+        benchmark(f"dependencies.cold_start[{_builder}, {_validation}]")(
+            lambda builder=_builder, validation=_validation: _cold_start(
+                builder, validation
+            )
+        )
+        benchmark(f"dependencies.warm[{_builder}, {_validation}]")(
+            lambda builder=_builder, validation=_validation: _warm(builder, validation)
+        )
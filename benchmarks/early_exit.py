@@ -0,0 +1,88 @@
+"""
+Ending a pipeline of 10 steps early, at its first step (e.g. on a cache hit or for
+a 304 Not Modified): raising an exception which the handler catches, against
+returning `PipelineResult.done(data)`. "full_run" is the same pipeline when it
+isn't ended early, for the overhead of checking each step's output.
+"""
+from logging import Logger, getLogger
+from typing import Any
+
+from benchmarks.harness import benchmark, load_event
+from example.api.handler import EventModel
+from lambda_pipeline.pipeline import compile_pipeline
+from lambda_pipeline.types import (
+    FrozenDict,
+    LambdaContext,
+    PipelineData,
+    PipelineResult,
+)
+
+LOGGER = getLogger(__name__)
+N_STEPS = 10
+
+
+class NotModified(Exception):
+    def __init__(self, data: PipelineData):
+        self.data = data
+
+
+def raise_not_modified(
+    data: PipelineData,
+    event: EventModel,
+    context: LambdaContext,
+    dependencies: FrozenDict[str, Any],
+    logger: Logger,
+) -> PipelineData:
+    raise NotModified(data.set("status_code", 304))
+
+
+def return_not_modified(
+    data: PipelineData,
+    event: EventModel,
+    context: LambdaContext,
+    dependencies: FrozenDict[str, Any],
+    logger: Logger,
+) -> PipelineData:
+    return PipelineResult.done(data.set("status_code", 304))
+
+
+def no_op(
+    data: PipelineData,
+    event: EventModel,
+    context: LambdaContext,
+    dependencies: FrozenDict[str, Any],
+    logger: Logger,
+) -> PipelineData:
+    return data
+
+
+def _make_handler(first_step, validation: str):
+    event = EventModel(**load_event())
+    compiled_pipeline = compile_pipeline(
+        steps=[first_step] + [no_op] * (N_STEPS - 1),
+        event_type=EventModel,
+        validation=validation,
+    )
+
+    def handler() -> PipelineData:
+        pipeline = compiled_pipeline.bind(
+            event=event, context=LambdaContext(), dependencies={}, logger=LOGGER
+        )
+        try:
+            return pipeline(data=PipelineData())
+        except NotModified as exc:
+            return exc.data
+
+    return handler
+
+
+for _validation in ("boundary", "off"):
+    benchmark(f"early_exit.exception[{_validation}]")(
+        lambda validation=_validation: _make_handler(raise_not_modified, validation)
+    )
+    benchmark(f"early_exit.pipeline_result[{_validation}]")(
+        lambda validation=_validation: _make_handler(return_not_modified, validation)
+    )
+    benchmark(f"early_exit.full_run[{_validation}]")(
+        lambda validation=_validation: _make_handler(no_op, validation)
+    )
@@ -0,0 +1,48 @@
+"""
+Parsing a large API Gateway event (100 headers, and a body of about 1 KB, 100 KB
+and 1 MB) and reading two of its headers, as the example steps do: validating the
+whole event with `EventModel(**event)` against `parse_event_lazily`.
+"""
+from aws_lambda_powertools.utilities.parser.models import (
+    APIGatewayProxyEventModel as EventModel,
+)
+from benchmarks.harness import benchmark, load_event
+from lambda_pipeline.events import parse_event_lazily
+
+BODY_SIZES = {"1KB": 2**10, "100KB": 100 * 2**10, "1MB": 2**20}
+N_HEADERS = 100
+
+
+def _large_event(body_size: int) -> dict:
+    event = load_event()
+    headers = {f"x-header-{i}": f"value-{i}" for i in range(N_HEADERS)}
+    event["headers"] = {**event["headers"], **headers}
+    event["multiValueHeaders"] = {
+        **event["multiValueHeaders"],
+        **{key: [value] for key, value in headers.items()},
+    }
+    event["body"] = "x" * body_size
+    return event
+
+
+def _read_headers(event) -> tuple:
+    return event.headers["auth_level"], event.headers.get("x-request-url")
+
+
+def _parse_eagerly(body_size: int):
+    event = _large_event(body_size=body_size)
+    return lambda: _read_headers(EventModel(**event))
+
+
+def _parse_lazily(body_size: int):
+    event = _large_event(body_size=body_size)
+    return lambda: _read_headers(parse_event_lazily(event_type=EventModel, event=event))
+
+
+for _size, _body_size in BODY_SIZES.items():
+    benchmark(f"events.parse_eagerly[{_size} body]")(
+        lambda body_size=_body_size: _parse_eagerly(body_size)
+    )
+    benchmark(f"events.parse_lazily[{_size} body]")(
+        lambda body_size=_body_size: _parse_lazily(body_size)
+    )
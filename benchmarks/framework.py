@@ -0,0 +1,90 @@
+"""
+The building blocks of the framework: constructing a pipeline with
+`make_pipeline`, calling a step through the step decorator stack, and
+creating, hashing and copying `FrozenDict`s.
+"""
+from logging import Logger, getLogger
+from typing import Any
+
+from benchmarks.harness import benchmark, load_event
+from example.api.handler import EventModel, steps
+from lambda_pipeline.pipeline import (
+    _decorate_step,
+    _make_step_decorators,
+    _make_template_step,
+    make_pipeline,
+)
+from lambda_pipeline.types import FrozenDict, LambdaContext, PipelineData
+
+LOGGER = getLogger(__name__)
+N_KEYS = (10, 1000)
+
+
+def passthrough_step(
+    data: PipelineData,
+    event: EventModel,
+    context: LambdaContext,
+    dependencies: FrozenDict[str, Any],
+    logger: Logger,
+) -> PipelineData:
+    return data
+
+
+@benchmark("framework.make_pipeline[construction]")
+def construct_make_pipeline():
+    event = EventModel(**load_event())
+    context = LambdaContext()
+
+    return lambda: make_pipeline(
+        steps=steps, event=event, context=context, dependencies={}, logger=LOGGER
+    )
+
+
+def _call_step(validation):
+    kwargs = dict(
+        data=PipelineData(),
+        event=EventModel(**load_event()),
+        context=LambdaContext(),
+        dependencies=FrozenDict(),
+        logger=LOGGER,
+    )
+    step = passthrough_step
+    if validation is not None:
+        step_decorators = _make_step_decorators(
+            template_step=_make_template_step(event_type=EventModel),
+            validation=validation,
+        )
+        step = _decorate_step(step=step, decorators=step_decorators)
+    return lambda: step(**kwargs)
+
+
+for _validation in (None, "full", "boundary", "off"):
+    benchmark(f"framework.step_decorators[{_validation or 'undecorated'}]")(
+        lambda validation=_validation: _call_step(validation)
+    )
+
+
+def _items(n_keys: int) -> dict:
+    return {f"key_{i}": i for i in range(n_keys)}
+
+
+def _hash_frozen_dict(n_keys: int):
+    frozen_dict = FrozenDict(_items(n_keys))
+
+    def _hash():
+        frozen_dict._hash = None
+        return hash(frozen_dict)
+
+    return _hash
+
+
+for _n_keys in N_KEYS:
+    benchmark(f"framework.frozen_dict.create[{_n_keys} keys]")(
+        lambda items=_items(_n_keys): lambda: FrozenDict(items)
+    )
+    benchmark(f"framework.frozen_dict.hash[{_n_keys} keys]")(
+        lambda n_keys=_n_keys: _hash_frozen_dict(n_keys)
+    )
+    benchmark(f"framework.frozen_dict.to_dict[{_n_keys} keys]")(
+        lambda items=_items(_n_keys): FrozenDict(items).to_dict
+    )
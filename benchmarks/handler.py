@@ -0,0 +1,46 @@
+"""
+A full invocation of the example handler (`example.api.index`), with 1, 6 and 50
+steps. The 6 steps are the example's own (2 of which are run in parallel) and a
+no-op, and the single step sets the body of the response.
+"""
+from logging import Logger
+from typing import Any
+
+from benchmarks.harness import benchmark, load_event
+from example.api import handler as steps_module
+from example.api import index
+from example.api.handler import EventModel
+from lambda_pipeline.types import FrozenDict, LambdaContext, PipelineData
+
+
+def read_document(
+    data: PipelineData,
+    event: EventModel,
+    context: LambdaContext,
+    dependencies: FrozenDict[str, Any],
+    logger: Logger,
+) -> PipelineData:
+    return data.set("body", {"id": 123, "message": "hello, world"})
+
+
+STEPS = {
+    1: [read_document],
+    6: [*steps_module.steps[:-1], steps_module.a_flaky_step, steps_module.steps[-1]],
+    50: [
+        *steps_module.steps[:-1],
+        *[steps_module.a_flaky_step] * 45,
+        steps_module.steps[-1],
+    ],
+}
+
+
+def _invoke_handler(steps: list):
+    handler = index.make_handler(steps=steps)
+    event = load_event()
+    return lambda: handler(event=event, context=index.LocalContext())
+
+
+for _n_steps, _steps in STEPS.items():
+    benchmark(f"handler.example_api[{_n_steps} steps]")(
+        lambda steps=_steps: _invoke_handler(steps)
+    )
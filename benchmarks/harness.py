@@ -0,0 +1,187 @@
+"""
+A small harness for the benchmarks: benchmarks are registered with
+`@benchmark(name)` on a factory which returns the zero-argument callable to
+be timed, so that any setup is excluded from the timings.
+
+Benchmarks registered with `@benchmark(name, memory=True)` also report the
+memory (in bytes, traced by tracemalloc) and the number of allocated blocks
+retained by the return value of each call.
+"""
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from fnmatch import fnmatch
+from pathlib import Path
+from typing import Callable, Optional
+
+EVENT_PATH = Path(__file__).parent.parent / "lambda_pipeline" / "tests" / "event.json"
+HEADERS = {"auth_level": "10", "x-request-url": "example.com"}
+
+MIN_BATCH_TIME = 20e-6
+N_MEMORY_CALLS = 1000
+
+BENCHMARKS: dict[str, Callable[[], Callable[[], object]]] = {}
+MEMORY_BENCHMARKS: set[str] = set()
+
+
+@dataclass
+class Result:
+    name: str
+    ops_per_sec: float
+    mean: float
+    p50: float
+    p99: float
+    n_samples: int
+    batch_size: int
+    bytes_per_call: Optional[float] = None
+    blocks_per_call: Optional[float] = None
+
+
+def benchmark(name: str, memory: bool = False):
+    def decorator(factory: Callable[[], Callable[[], object]]):
+        if name in BENCHMARKS:
+            raise ValueError(f"Benchmark '{name}' is already registered")
+        BENCHMARKS[name] = factory
+        if memory:
+            MEMORY_BENCHMARKS.add(name)
+        return factory
+
+    return decorator
+
+
+def load_event() -> dict:
+    """A local API Gateway proxy event, with the headers that the example expects"""
+    with open(EVENT_PATH) as f:
+        event = json.load(f)
+    event["headers"].update(HEADERS)
+    return event
+
+
+def _calibrate(func: Callable[[], object]) -> int:
+    """The number of calls to batch together, so that timer overhead is negligible"""
+    batch_size = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(batch_size):
+            func()
+        if time.perf_counter() - started >= MIN_BATCH_TIME:
+            return batch_size
+        batch_size *= 2
+
+
+def _percentile(samples: list[float], percentile: float) -> float:
+    index = min(len(samples) - 1, round(percentile * (len(samples) - 1)))
+    return samples[index]
+
+
+def measure_memory(func: Callable[[], object]) -> tuple[float, float]:
+    """The bytes and blocks retained per call, by keeping the return values alive"""
+    func()
+    results = []
+    blocks = sys.getallocatedblocks()
+    tracemalloc.start()
+    try:
+        memory = tracemalloc.get_traced_memory()[0]
+        for _ in range(N_MEMORY_CALLS):
+            results.append(func())
+        memory = tracemalloc.get_traced_memory()[0] - memory
+    finally:
+        tracemalloc.stop()
+    blocks = sys.getallocatedblocks() - blocks
+    # Exclude the list which holds the results
+    memory -= sys.getsizeof(results)
+    blocks -= 1
+    return memory / N_MEMORY_CALLS, blocks / N_MEMORY_CALLS
+
+
+def run(name: str, func: Callable[[], object], min_time: float = 0.5) -> Result:
+    """Time batches of calls to func for at least min_time seconds (after a warm up)"""
+    batch_size = _calibrate(func)
+    samples = []
+    total_time = 0.0
+    while total_time < min_time or len(samples) < 100:
+        started = time.perf_counter()
+        for _ in range(batch_size):
+            func()
+        elapsed = time.perf_counter() - started
+        total_time += elapsed
+        samples.append(elapsed / batch_size)
+
+    samples.sort()
+    return Result(
+        name=name,
+        ops_per_sec=len(samples) * batch_size / total_time,
+        mean=statistics.fmean(samples),
+        p50=_percentile(samples, 0.5),
+        p99=_percentile(samples, 0.99),
+        n_samples=len(samples),
+        batch_size=batch_size,
+    )
+
+
+def run_all(pattern: str = "*", min_time: float = 0.5) -> list[Result]:
+    results = []
+    for name, factory in BENCHMARKS.items():
+        if not fnmatch(name, pattern):
+            continue
+        func = factory()
+        result = run(name=name, func=func, min_time=min_time)
+        line = (
+            f"{name:<48} {result.ops_per_sec:>12,.0f} ops/s "
+            f"p50 {result.p50 * 1e6:>10.2f} us  p99 {result.p99 * 1e6:>10.2f} us"
+        )
+        if name in MEMORY_BENCHMARKS:
+            result.bytes_per_call, result.blocks_per_call = measure_memory(func)
+            line += (
+                f"  {result.bytes_per_call:>10,.0f} B/call "
+                f"{result.blocks_per_call:>8,.1f} blocks/call"
+            )
+        print(line)
+        results.append(result)
+    return results
+
+
+def write_results(results: list[Result], path: Path):
+    document = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.time(),
+        "results": [asdict(result) for result in results],
+    }
+    with open(path, "w") as f:
+        json.dump(document, f, indent=2)
+
+
+def read_results(path: Path) -> dict[str, Result]:
+    with open(path) as f:
+        document = json.load(f)
+    return {result["name"]: Result(**result) for result in document["results"]}
+
+
+def compare(
+    baseline: dict[str, Result], current: dict[str, Result], threshold: float
+) -> list[str]:
+    """Print the change in p50 for each benchmark, and return the names of regressions"""
+    regressions = []
+    for name in sorted(baseline.keys() & current.keys()):
+        ratio = current[name].p50 / baseline[name].p50
+        regressed = ratio > 1 + threshold
+        if regressed:
+            regressions.append(name)
+        print(
+            f"{name:<48} p50 {baseline[name].p50 * 1e6:>10.2f} us -> "
+            f"{current[name].p50 * 1e6:>10.2f} us ({ratio - 1:+7.1%})"
+            f"{'  REGRESSION' if regressed else ''}"
+        )
+    n_missing = len(baseline.keys() - current.keys())
+    if n_missing:
+        print(f"{n_missing} benchmark(s) in the baseline are missing from the results")
+    return regressions
+
+
+def find(pattern: str) -> list[str]:
+    return [name for name in BENCHMARKS if fnmatch(name, pattern)]
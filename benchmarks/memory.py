@@ -0,0 +1,54 @@
+"""
+The memory retained by, and the number of allocations for, FrozenDict and
+PipelineData instances: creating one from a dict, deriving one with `set`,
+and a batch of 1000 records (e.g. from SQS) of 5 keys each, as PipelineData and
+as a fixed schema (see `make_fixed_schema`).
+"""
+from benchmarks.harness import benchmark
+from lambda_pipeline.types import FrozenDict, PipelineData, make_fixed_schema
+
+N_KEYS = (5, 50)
+N_RECORDS = 1000
+RECORD_KEYS = ("id", "status", "body", "version", "source")
+
+
+def _items(n_keys: int) -> dict:
+    return {f"key_{i}": i for i in range(n_keys)}
+
+
+def _records(n_records: int) -> list[dict]:
+    return [dict.fromkeys(RECORD_KEYS, i) for i in range(n_records)]
+
+
+for _n_keys in N_KEYS:
+    benchmark(f"memory.frozen_dict.create[{_n_keys} keys]", memory=True)(
+        lambda items=_items(_n_keys): lambda: FrozenDict(items)
+    )
+    benchmark(f"memory.pipeline_data.create[{_n_keys} keys]", memory=True)(
+        lambda items=_items(_n_keys): lambda: PipelineData(items)
+    )
+
+
+@benchmark("memory.pipeline_data.set", memory=True)
+def set_pipeline_data():
+    data = PipelineData(_items(5))
+    return lambda: data.set("key_0", "value")
+
+
+@benchmark(f"memory.pipeline_data.batch[{N_RECORDS} records]", memory=True)
+def batch_of_pipeline_data():
+    records = _records(N_RECORDS)
+    return lambda: [PipelineData(record) for record in records]
+
+
+@benchmark(f"memory.fixed_schema.batch[{N_RECORDS} records]", memory=True)
+def batch_of_fixed_schema():
+    records = _records(N_RECORDS)
+    Record = make_fixed_schema(keys=RECORD_KEYS, name="Record")
+    return lambda: [Record(record) for record in records]
+
+
+@benchmark("memory.fixed_schema.set", memory=True)
+def set_fixed_schema():
+    data = make_fixed_schema(keys=RECORD_KEYS)(dict.fromkeys(RECORD_KEYS, 0))
+    return lambda: data.set("status", "value")
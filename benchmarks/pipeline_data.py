@@ -0,0 +1,69 @@
+"""
+Deriving a new PipelineData in each step by copying the whole mapping
+(`PipelineData(new_key=..., **data)`) against the structurally shared
+`data.set(new_key, ...)`, for a chain of steps that starts with a large
+document in `data`.
+
+`set` and `flattening_set` are single updates: `flattening_set` is the update
+which takes the chain of layers deeper than PipelineData._MAX_DEPTH, and so
+copies every key. In the 50 step chains, 5 of the updates flatten.
+"""
+from benchmarks.harness import benchmark
+from lambda_pipeline.types import PipelineData
+
+N_STEPS = (6, 50)
+N_KEYS = (10, 1000)
+
+
+def _initial_data(n_keys: int) -> PipelineData:
+    return PipelineData({f"field_{i}": {"value": i} for i in range(n_keys)})
+
+
+def copy_per_step(data: PipelineData, n_steps: int) -> PipelineData:
+    for i in range(n_steps):
+        data = PipelineData({f"step_{i}": data[f"field_{i % 10}"]}, **data)
+    return data
+
+
+def set_per_step(data: PipelineData, n_steps: int) -> PipelineData:
+    for i in range(n_steps):
+        data = data.set(f"step_{i}", data[f"field_{i % 10}"])
+    return data
+
+
+def _chain(func, n_keys: int, n_steps: int):
+    initial_data = _initial_data(n_keys=n_keys)
+    return lambda: func(initial_data, n_steps)
+
+
+for _func in (copy_per_step, set_per_step):
+    for _n_keys in N_KEYS:
+        for _n_steps in N_STEPS:
+            benchmark(
+                f"pipeline_data.{_func.__name__}[{_n_keys} keys, {_n_steps} steps]"
+            )(
+                lambda func=_func, n_keys=_n_keys, n_steps=_n_steps: _chain(
+                    func, n_keys, n_steps
+                )
+            )
+
+
+def _deepest_data(n_keys: int) -> PipelineData:
+    """Data whose next update takes the chain of layers deeper than _MAX_DEPTH"""
+    data = _initial_data(n_keys=n_keys)
+    for i in range(PipelineData._MAX_DEPTH):
+        data = data.set(f"step_{i}", i)
+    return data
+
+
+for _n_keys in N_KEYS:
+    benchmark(f"pipeline_data.set[{_n_keys} keys]")(
+        lambda n_keys=_n_keys: (
+            lambda data=_initial_data(n_keys=n_keys): data.set("new_key", 1)
+        )
+    )
+    benchmark(f"pipeline_data.flattening_set[{_n_keys} keys]")(
+        lambda n_keys=_n_keys: (
+            lambda data=_deepest_data(n_keys=n_keys): data.set("new_key", 1)
+        )
+    )
@@ -0,0 +1,70 @@
+"""
+Rendering an API Gateway response from a large body in PipelineData (about 1 KB,
+100 KB and 1 MB of JSON): with `render_response` and each of the serializers,
+against thawing the body and serialising it with `json.dumps`, and streaming the
+body in chunks (from a Stream of the documents) with `stream_body`.
+"""
+import json
+
+from benchmarks.harness import benchmark
+from lambda_pipeline.response import get_serializer, render_response, stream_body
+from lambda_pipeline.types import PipelineData, thaw
+
+N_DOCUMENTS = {"1KB": 8, "100KB": 800, "1MB": 8000}
+
+
+def _documents(n_documents: int):
+    return (
+        {"id": i, "content": "x" * 80, "tags": ["a", "b"], "meta": {"version": 1}}
+        for i in range(n_documents)
+    )
+
+
+def _body(n_documents: int) -> PipelineData:
+    return PipelineData(body={"documents": list(_documents(n_documents))})["body"]
+
+
+def _serializers() -> list[str]:
+    try:
+        get_serializer("orjson")
+    except ModuleNotFoundError:
+        return ["json"]
+    return ["json", "orjson"]
+
+
+def _thaw_and_json_dumps(n_documents: int):
+    body = _body(n_documents=n_documents)
+    return lambda: json.dumps(thaw(body))
+
+
+def _render_response(n_documents: int, serializer: str):
+    body = _body(n_documents=n_documents)
+    serializer = get_serializer(serializer)
+    return lambda: render_response(body=body, serializer=serializer)
+
+
+def _stream_body(n_documents: int, serializer: str):
+    serializer = get_serializer(serializer)
+
+    def stream():
+        body = PipelineData(body={"documents": _documents(n_documents)})["body"]
+        return sum(map(len, stream_body(body, serializer=serializer)))
+
+    return stream
+
+
+for _size, _n_documents in N_DOCUMENTS.items():
+    benchmark(f"response.thaw_and_json_dumps[{_size}]")(
+        lambda n_documents=_n_documents: _thaw_and_json_dumps(n_documents)
+    )
+    for _serializer in _serializers():
+        benchmark(f"response.render_response[{_serializer}, {_size}]")(
+            lambda n_documents=_n_documents, serializer=_serializer: _render_response(
+                n_documents, serializer
+            )
+        )
+        benchmark(f"response.stream_body[{_serializer}, {_size}]")(
+            lambda n_documents=_n_documents, serializer=_serializer: _stream_body(
+                n_documents, serializer
+            )
+        )
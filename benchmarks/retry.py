@@ -0,0 +1,69 @@
+"""
+The tail latency of a read step whose dependency is occasionally slow (1 ms, but
+20 ms for 2% of calls) without hedging, against with `hedge` (which starts a
+second attempt after the p95 latency), and the overhead of `retry` on a step
+which doesn't fail.
+"""
+import random
+import time
+from logging import Logger, getLogger
+from typing import Any
+
+from benchmarks.harness import benchmark
+from lambda_pipeline.retry import hedge, retry
+from lambda_pipeline.types import FrozenDict, LambdaContext, PipelineData
+
+LOGGER = getLogger(__name__)
+SLOW_FRACTION = 0.02
+
+
+def read_document(
+    data: PipelineData,
+    event: Any,
+    context: LambdaContext,
+    dependencies: FrozenDict[str, Any],
+    logger: Logger,
+) -> PipelineData:
+    time.sleep(0.02 if random.random() < SLOW_FRACTION else 0.001)
+    return data
+
+
+def no_op(
+    data: PipelineData,
+    event: Any,
+    context: LambdaContext,
+    dependencies: FrozenDict[str, Any],
+    logger: Logger,
+) -> PipelineData:
+    return data
+
+
+def _invoke(step):
+    kwargs = dict(
+        data=PipelineData(),
+        event=None,
+        context=LambdaContext(),
+        dependencies=FrozenDict(),
+        logger=LOGGER,
+    )
+    return lambda: step(**kwargs)
+
+
+@benchmark("retry.slow_dependency[no hedging]")
+def without_hedging():
+    return _invoke(read_document)
+
+
+@benchmark("retry.slow_dependency[hedge]")
+def with_hedging():
+    return _invoke(hedge(after_ms=5)(read_document))
+
+
+@benchmark("retry.overhead[no retry]")
+def without_retry():
+    return _invoke(no_op)
+
+
+@benchmark("retry.overhead[retry]")
+def with_retry():
+    return _invoke(retry()(no_op))
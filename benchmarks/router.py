@@ -0,0 +1,72 @@
+"""
+A Router with 50 routes, which share the example's 2 common steps (run in
+parallel). "resolve" dispatches an event by its (httpMethod, resource) with a dict
+lookup, or by its path with the combined regex of the path templates (the last
+of the 50 templates). "add_routes" compiles the 50 routes, with the common steps
+decorated once and shared, against compiling a pipeline per route.
+"""
+from benchmarks.harness import benchmark, load_event
+from example.api import handler as steps_module
+from example.api.handler import EventModel
+from lambda_pipeline.pipeline import CompiledPipeline
+from lambda_pipeline.router import Router
+
+N_ROUTES = 50
+COMMON_STEPS = steps_module.steps[:1]
+ROUTE_STEPS = steps_module.steps[1:]
+
+
+def _resource(i: int) -> str:
+    return f"/collection-{i}/{{id}}/items/{{item_id}}"
+
+
+def _make_router() -> Router:
+    router = Router(
+        event_type=EventModel, common_steps=COMMON_STEPS, validation="boundary"
+    )
+    for i in range(N_ROUTES):
+        router.add_route("GET", _resource(i), steps=ROUTE_STEPS)
+    return router
+
+
+def _compile_per_route() -> list[CompiledPipeline]:
+    return [
+        CompiledPipeline(
+            steps=[*COMMON_STEPS, *ROUTE_STEPS],
+            event_type=EventModel,
+            validation="boundary",
+        )
+        for _ in range(N_ROUTES)
+    ]
+
+
+@benchmark("router.resolve[resource]")
+def resolve_resource():
+    router = _make_router()
+    event = dict(
+        load_event(),
+        resource=_resource(N_ROUTES - 1),
+        pathParameters={"id": "1", "item_id": "2"},
+    )
+    return lambda: router.resolve(event)
+
+
+@benchmark("router.resolve[path template]")
+def resolve_path():
+    router = _make_router()
+    event = dict(
+        load_event(),
+        resource="/{proxy+}",
+        path=f"/collection-{N_ROUTES - 1}/1/items/2",
+    )
+    return lambda: router.resolve(event)
+
+
+@benchmark("router.add_routes[shared common steps]")
+def add_routes():
+    return _make_router
+
+
+@benchmark("router.add_routes[pipeline per route]")
+def compile_per_route():
+    return _compile_per_route
@@ -1,26 +1,40 @@
-import json
 from logging import Logger
 import os
-from typing import Any
+from typing import Any, TypedDict
 
 from aws_lambda_powertools.utilities.parser.models import (
     APIGatewayProxyEventModel as EventModel,
 )
-from example.api.response import response_200
 from example.some_third_party_lib.some_third_party_tool import (
     validate_x_request_url as _validate_x_request_url,
 )
+from lambda_pipeline.circuit_breaker import CircuitBreaker
+from lambda_pipeline.dependencies import DependencyContainer
+from lambda_pipeline.parallel import parallel
+from lambda_pipeline.retry import retry
 from lambda_pipeline.types import PipelineData, FrozenDict, LambdaContext
 
 MIN_AUTH_LEVEL = 2
 
+# Kept in the warm container, so that invocations fail fast while the I/O is failing
+flaky_io_breaker = CircuitBreaker("flaky-io", failure_on=(ConnectionError,))
+
 
 class HandlerError(Exception):
     pass
 
 
+class MessageSchema(TypedDict):
+    something_for_later: str
+
+
+class BodySchema(TypedDict):
+    body: dict
+
+
 def build_shared_dependencies():
-    return {}
+    """Declare clients with `lazy` so that they are only constructed when they are used"""
+    return DependencyContainer()
 
 
 def authorise(
@@ -52,6 +66,8 @@ def validate_x_request_url(
     return data
 
 
+@flaky_io_breaker
+@retry(max_attempts=3, backoff_ms=20, retry_on=(ConnectionError,))
 def a_flaky_step(
     data: PipelineData,
     event: EventModel,
@@ -61,7 +77,7 @@ def a_flaky_step(
 ) -> PipelineData:
     """An example of a step that will raise a 500 in the right conditions"""
     if os.environ.get("FLAKE_OUT"):
-        raise Exception("Some I/O flaked out!")
+        raise ConnectionError("Some I/O flaked out!")
     return data
 
 
@@ -71,46 +87,33 @@ def intermediate_step(
     context: LambdaContext,
     dependencies: FrozenDict[str, Any],
     logger: Logger,
-) -> PipelineData:
+) -> PipelineData[MessageSchema]:
     """An example of an intermediate step that mutates a pipeline data field"""
-    return PipelineData(something_for_later="hello, world")
+    return data.set("something_for_later", "hello, world")
 
 
 def read_document_from_db(
-    data: PipelineData,
+    data: PipelineData[MessageSchema],
     event: EventModel,
     context: LambdaContext,
     dependencies: FrozenDict[str, Any],
     logger: Logger,
-) -> PipelineData:
+) -> PipelineData[BodySchema]:
     """An example of a step that mutates the pipeline 'data' "body" field, which is used in the response"""
 
-    return PipelineData(
-        body={
+    return data.set(
+        "body",
+        {
             "id": 123,
             "content-type": "application/json",
             "message": data["something_for_later"],
-        }
+        },
     )
 
 
-def render_response(
-    data: PipelineData,
-    event: EventModel,
-    context: LambdaContext,
-    dependencies: FrozenDict[str, Any],
-    logger: Logger,
-) -> PipelineData:
-    """An example of a step that mutates the pipeline 'data' "body" field, which is used in the response"""
-    response = response_200(body=json.dumps(data["body"]))
-    return PipelineData(response)
-
-
 steps = [
-    authorise,
-    validate_x_request_url,
+    parallel(authorise, validate_x_request_url),
     a_flaky_step,
     intermediate_step,
     read_document_from_db,
-    render_response,
 ]
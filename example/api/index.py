@@ -1,4 +1,4 @@
-import json
+import time
 from logging import getLogger
 from example.api.handler import (
     EventModel,
@@ -6,29 +6,67 @@ from example.api.handler import (
     build_shared_dependencies,
     steps,
 )
-from example.api.response import response_500, response_400
-from lambda_pipeline.pipeline import make_pipeline
+from example.api.response import (
+    response_200,
+    response_400,
+    response_500,
+    response_503,
+)
+from lambda_pipeline.circuit_breaker import CircuitOpenError
+from lambda_pipeline.deadlines import PipelineTimeoutError
+from lambda_pipeline.events import parse_event_lazily
+from lambda_pipeline.pipeline import compile_pipeline
 from lambda_pipeline.types import PipelineData, LambdaContext
 
 
+# Abort the pipeline with a 503 this long before the Lambda would time out
+DEADLINE_MARGIN_MS = 500
+LOCAL_TIMEOUT_MS = 30_000
+
 shared_dependencies = build_shared_dependencies()
 
 
-def handler(event: dict, context: LambdaContext = None) -> dict[str, str]:
-    if context is None:
-        context = LambdaContext()
+class LocalContext(LambdaContext):
+    """A stand-in for the Lambda context when invoking the handler locally"""
+
+    def __init__(self, timeout_ms: int = LOCAL_TIMEOUT_MS):
+        self._deadline = time.monotonic() + timeout_ms / 1000
+
+    def get_remaining_time_in_millis(self) -> int:
+        return max(int((self._deadline - time.monotonic()) * 1000), 0)
+
 
-    pipeline = make_pipeline(
+def make_handler(steps: list):
+    compiled_pipeline = compile_pipeline(
         steps=steps,
-        event=EventModel(**event),
-        context=context,
-        dependencies=shared_dependencies,
-        logger=getLogger(__name__),
+        event_type=EventModel,
+        validation="boundary",
+        deadline_margin_ms=DEADLINE_MARGIN_MS,
     )
 
-    try:
-        return pipeline(data=PipelineData()).to_dict()
-    except HandlerError as exc:
-        return response_400(body=json.dumps({"message": str(exc)}))
-    except Exception as exc:
-        return response_500(details=f"{type(exc)}: {exc}")
+    def handler(event: dict, context: LambdaContext = None) -> dict:
+        if context is None:
+            context = LocalContext()
+
+        pipeline = compiled_pipeline.bind(
+            event=parse_event_lazily(event_type=EventModel, event=event),
+            context=context,
+            dependencies=shared_dependencies,
+            logger=getLogger(__name__),
+        )
+
+        try:
+            # A pipeline which was ended early may not have set the body
+            body = pipeline(data=PipelineData())["body"]
+        except HandlerError as exc:
+            return response_400(body={"message": str(exc)})
+        except (PipelineTimeoutError, CircuitOpenError) as exc:
+            return response_503(details=str(exc))
+        except Exception as exc:
+            return response_500(details=f"{type(exc)}: {exc}")
+        return response_200(body=body)
+
+    return handler
+
+
+handler = make_handler(steps=steps)
@@ -1,36 +1,29 @@
-import json
 from pathlib import Path
-from pydantic import BaseModel
 
 from aws_lambda_powertools import Logger
+from lambda_pipeline.response import render_response
 
 PKG_NAME = Path(__file__).parent.name
 logger = Logger(service_name=PKG_NAME)
 
 
-class Response(BaseModel):
-    status_code: str
-    body: str
+def response_200(body) -> dict:
+    response = render_response(body=body, status_code=200)
+    logger.info(response["body"])
+    return response
 
-    def __init__(self, status_code, body, details=""):
-        if int(status_code) >= 300:
-            logger.error(body if not details else details)
-        else:
-            logger.info(body)
-        return super().__init__(status_code=status_code, body=body)
 
+def response_400(body) -> dict:
+    response = render_response(body=body, status_code=400)
+    logger.error(response["body"])
+    return response
 
-def response_200(body: str) -> dict:
-    return Response(status_code=200, body=body).dict()
 
-
-def response_400(body: str) -> dict:
-    return Response(status_code=400, body=body).dict()
+def response_500(details: str) -> dict:
+    logger.error(details)
+    return render_response(body={"message": "Internal Server Error"}, status_code=500)
 
 
-def response_500(details: str) -> dict:
-    return Response(
-        status_code=500,
-        body=json.dumps({"message": "Internal Server Error"}),
-        details=details,
-    ).dict()
+def response_503(details: str) -> dict:
+    logger.warning(details)
+    return render_response(body={"message": "Service Unavailable"}, status_code=503)
@@ -11,9 +11,9 @@ HEADERS_BAD_AUTH_LEVEL = {"headers": {"auth_level": 1, "x-request-url": "example
 HEADERS_ILLEGAL_AUTH_LEVEL = {
     "headers": {"auth_level": "foo", "x-request-url": "example.com"}
 }
-STATUS_OK = "200"
-STATUS_BAD_REQUEST = "400"
-STATUS_INTERNAL_ERROR = "500"
+STATUS_OK = 200
+STATUS_BAD_REQUEST = 400
+STATUS_INTERNAL_ERROR = 500
 
 
 @pytest.fixture()
@@ -82,9 +82,9 @@ def test_api_lambda(
 
     aws_response = lambda_function(Payload=json.dumps(event).encode())
     lambda_response = json.loads(aws_response["Payload"].read())
-    assert "status_code" in lambda_response, lambda_response
+    assert "statusCode" in lambda_response, lambda_response
 
-    assert lambda_response["status_code"] == expected_status, lambda_response
+    assert lambda_response["statusCode"] == expected_status, lambda_response
 
     assert "body" in lambda_response, lambda_response
     body = json.loads(lambda_response["body"])
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import Executor
+from contextvars import copy_context
+from functools import partial, wraps
+from inspect import iscoroutinefunction
+from logging import Logger
+from types import FunctionType
+from typing import TYPE_CHECKING, Any, Optional
+
+from lambda_pipeline.events import get_event_type
+from lambda_pipeline.instrumentation import PipelineObserver
+from lambda_pipeline.parallel import ParallelGroup, make_async_parallel_step
+from lambda_pipeline.pipeline import CompiledPipeline, Step, Validation
+from lambda_pipeline.step_decorators import validate_arguments
+from lambda_pipeline.types import FrozenDict, PipelineData, PipelineResult
+
+if TYPE_CHECKING:
+    from pydantic import BaseModel
+
+    from lambda_pipeline.types import LambdaContext
+
+_EVENT_LOOP: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _run_in_executor(step: FunctionType, executor: Optional[Executor]) -> FunctionType:
+    """Turn a synchronous step into a coroutine function, by running it in an executor"""
+
+    @wraps(step)
+    async def wrapper(**kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            executor, partial(copy_context().run, step, **kwargs)
+        )
+
+    return wrapper
+
+
+class CompiledAsyncPipeline(CompiledPipeline):
+    """
+    A CompiledPipeline which accepts `async def` steps (with the same signature as
+    synchronous steps), and which is awaited, i.e. `await pipeline(data=...)`.
+    Synchronous steps are run in `executor` (the event loop's default executor
+    if not specified) so that they don't block the event loop.
+    """
+
+    _make_parallel_step = staticmethod(make_async_parallel_step)
+
+    def __init__(
+        self,
+        steps: list[Step],
+        event_type: type,
+        executor: Optional[Executor] = None,
+        **kwargs,
+    ):
+        self.executor = executor
+        super().__init__(steps=steps, event_type=event_type, **kwargs)
+
+    def _compile_step(
+        self, step: Step, step_decorators: list[FunctionType]
+    ) -> FunctionType:
+        decorated_step = super()._compile_step(
+            step=step, step_decorators=step_decorators
+        )
+        if isinstance(step, ParallelGroup) or iscoroutinefunction(step):
+            return decorated_step
+        return _run_in_executor(step=decorated_step, executor=self.executor)
+
+    def _chain(
+        self,
+        event: BaseModel,
+        context: LambdaContext,
+        dependencies: FrozenDict[str, Any],
+        logger: Logger,
+    ) -> FunctionType:
+        async def pipeline(data: PipelineData) -> PipelineData:
+            self._check_data(data=data)
+            for step in self.steps:
+                data = await step(
+                    data=data,
+                    event=event,
+                    context=context,
+                    dependencies=dependencies,
+                    logger=logger,
+                )
+                if type(data) is PipelineResult:
+                    return data.data
+            return data
+
+        return pipeline
+
+
+@validate_arguments
+def compile_async_pipeline(
+    steps: list[Step],
+    event_type: type,
+    validation: Validation = "full",
+    executor: Optional[Executor] = None,
+    initial_keys: tuple[str, ...] = (),
+    observers: tuple[PipelineObserver, ...] = (),
+    trace_memory: bool = False,
+    deadline_margin_ms: Optional[float] = None,
+) -> CompiledAsyncPipeline:
+    return CompiledAsyncPipeline(
+        steps=steps,
+        event_type=event_type,
+        validation=validation,
+        executor=executor,
+        initial_keys=initial_keys,
+        observers=observers,
+        trace_memory=trace_memory,
+        deadline_margin_ms=deadline_margin_ms,
+    )
+
+
+@validate_arguments
+def make_async_pipeline(
+    steps: list[Step],
+    event: BaseModel,
+    context: LambdaContext,
+    dependencies: FrozenDict[str, Any],
+    logger: Logger,
+    validation: Validation = "full",
+) -> FunctionType:
+    compiled_pipeline = CompiledAsyncPipeline(
+        steps=steps, event_type=get_event_type(event), validation=validation
+    )
+    return compiled_pipeline.bind(
+        event=event, context=context, dependencies=dependencies, logger=logger
+    )
+
+
+def _get_event_loop() -> asyncio.AbstractEventLoop:
+    global _EVENT_LOOP
+    if _EVENT_LOOP is None or _EVENT_LOOP.is_closed():
+        _EVENT_LOOP = asyncio.new_event_loop()
+    return _EVENT_LOOP
+
+
+def sync_handler(async_handler: FunctionType) -> FunctionType:
+    """
+    Drive an `async def` handler from the synchronous Lambda entry point.
+    The event loop is reused across warm invocations, so that resources bound
+    to it (e.g. async client sessions in `dependencies`) can be shared.
+    """
+
+    @wraps(async_handler)
+    def handler(*args, **kwargs):
+        return _get_event_loop().run_until_complete(async_handler(*args, **kwargs))
+
+    return handler
@@ -0,0 +1,447 @@
+from __future__ import annotations
+
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from logging import Logger
+from types import FunctionType
+from typing import TYPE_CHECKING, Any, Callable, Optional, Union
+
+from lambda_pipeline import types
+from lambda_pipeline.instrumentation import PipelineObserver
+from lambda_pipeline.parallel import ParallelGroup
+from lambda_pipeline.pipeline import (
+    CompiledPipeline,
+    Step,
+    Validation,
+    _chain_steps,
+    _decorate_step,
+    _make_step_decorators,
+)
+from lambda_pipeline.step_decorators import (
+    PipelineStepOutputError,
+    check_arguments,
+    validate_arguments,
+    validate_batch_output,
+)
+from lambda_pipeline.types import FrozenDict, PipelineData, PipelineResult
+
+if TYPE_CHECKING:
+    from pydantic import BaseModel
+
+    from lambda_pipeline.types import LambdaContext
+
+# The paths to the identifier of a record in SQS, Kinesis and DynamoDB Streams events
+_ITEM_IDENTIFIER_PATHS = (
+    ("messageId",),
+    ("kinesis", "sequenceNumber"),
+    ("dynamodb", "SequenceNumber"),
+)
+
+Record = Union[Mapping, "BaseModel"]
+Outcome = Union[PipelineData, Exception]
+
+
+class PipelineBatchError(Exception):
+    pass
+
+
+def _get(value: Any, key: str) -> Any:
+    if isinstance(value, Mapping):
+        return value.get(key)
+    return getattr(value, key, None)
+
+
+def get_item_identifier(record: Record) -> str:
+    """The identifier of an SQS, Kinesis or DynamoDB Streams record (raw or parsed)"""
+    for path in _ITEM_IDENTIFIER_PATHS:
+        value = record
+        for key in path:
+            value = _get(value, key)
+            if value is None:
+                break
+        else:
+            return value
+    raise PipelineBatchError(f"could not find the item identifier of record {record}")
+
+
+def _identify(
+    record: Record, index: int, item_identifier: Callable[[Record], str]
+) -> str:
+    """
+    The identifier of a record or, if it has none (e.g. it is malformed), its index
+    in the batch, so that one record can't fail the whole batch's response
+    """
+    try:
+        return item_identifier(record)
+    except Exception:
+        return str(index)
+
+
+def get_records(event: Union[Mapping, BaseModel]) -> list[Record]:
+    records = _get(event, "Records")
+    if records is None:
+        raise PipelineBatchError("the event does not contain any 'Records'")
+    return records
+
+
+def batch_step(batch_size: Optional[int] = None):
+    """
+    Mark a step as a batch step, which is called with chunks of up to 'batch_size'
+    records (the pipeline's batch_size by default) at a time, e.g. to make a single
+    BatchGetItem request for many records rather than a GetItem request per record:
+
+    @batch_step(batch_size=100)
+    def step(
+        records: list[tuple[PipelineData, EventModel]],
+        context: LambdaContext,
+        dependencies: FrozenDict[str, Any],
+        logger: Logger,
+    ) -> list[PipelineData]:
+
+    The step returns the PipelineData of each record, in the same order as 'records'.
+    """
+
+    def decorator(step: FunctionType) -> FunctionType:
+        step.__pipeline_batch_size__ = batch_size
+        return step
+
+    return decorator
+
+
+def is_batch_step(step: Step) -> bool:
+    return hasattr(step, "__pipeline_batch_size__")
+
+
+def _make_batch_template_step(event_type: type) -> FunctionType:
+    """A factory method for creating the template for batch steps"""
+
+    def _TEMPLATE_BATCH_STEP(records, context, dependencies, logger):
+        raise NotImplementedError
+
+    _TEMPLATE_BATCH_STEP.__annotations__ = {
+        "records": list[tuple[PipelineData, event_type]],
+        "context": types.LambdaContext,
+        "dependencies": FrozenDict[str, Any],
+        "logger": Logger,
+        "return": list[PipelineData],
+    }
+    return _TEMPLATE_BATCH_STEP
+
+
+class _BatchStep:
+    def __init__(self, step: Step, compiled_step: FunctionType, batch_size: int):
+        self.name = step.__name__
+        self.step = compiled_step
+        self.batch_size = step.__pipeline_batch_size__ or batch_size
+
+
+def _chunk(items: list, size: int) -> list[list]:
+    return [items[i : i + size] for i in range(0, len(items), size)]
+
+
+class CompiledBatchPipeline(CompiledPipeline):
+    """
+    A CompiledPipeline for events which are a batch of records, e.g. from SQS,
+    Kinesis or DynamoDB Streams. The 'event_type' is the type of a single record
+    (e.g. SqsRecordModel), and the steps are run for each record in the batch
+    with the record as the 'event'. Up to 'max_concurrency' records (or chunks of
+    records, for batch steps) are processed at a time, on a thread pool.
+
+    Steps marked with `batch_step` are called with chunks of up to 'batch_size'
+    records at a time, once all of the records have been through the steps listed
+    before them, and can be mixed with per-record steps.
+
+    An exception raised while parsing or processing a record fails that record
+    only (an exception raised by a batch step fails every record in the chunk),
+    and `process` returns a partial batch failure response with the identifiers
+    of the failed records (see `get_item_identifier`), so that only those records
+    are retried.
+
+    A step (or a batch step, for some of its records) which returns
+    `PipelineResult.done(data)` for a record ends the pipeline for that record
+    only: the remaining steps aren't run for it, and its outcome is the data.
+    """
+
+    def __init__(
+        self,
+        steps: list[Step],
+        event_type: type,
+        max_concurrency: int = 1,
+        batch_size: int = 100,
+        item_identifier: Callable[[Record], str] = get_item_identifier,
+        **kwargs,
+    ):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        self.batch_template_step = _make_batch_template_step(event_type=event_type)
+        self._batch_step_decorators = None
+        super().__init__(steps=steps, event_type=event_type, **kwargs)
+        self.max_concurrency = max_concurrency
+        self.item_identifier = item_identifier
+        self.executor = (
+            ThreadPoolExecutor(
+                max_workers=max_concurrency, thread_name_prefix="lambda_pipeline_batch"
+            )
+            if max_concurrency > 1
+            else None
+        )
+
+        self.segments = []
+        record_steps = []
+        for step, compiled_step in zip(steps, self.steps):
+            if not is_batch_step(step):
+                record_steps.append(compiled_step)
+                continue
+            if record_steps:
+                self.segments.append(tuple(record_steps))
+                record_steps = []
+            self.segments.append(
+                _BatchStep(
+                    step=step, compiled_step=compiled_step, batch_size=batch_size
+                )
+            )
+        if record_steps:
+            self.segments.append(tuple(record_steps))
+
+    def _compile_step(
+        self, step: Step, step_decorators: list[FunctionType]
+    ) -> FunctionType:
+        if not is_batch_step(step):
+            return super()._compile_step(step=step, step_decorators=step_decorators)
+        if self._batch_step_decorators is None:
+            self._batch_step_decorators = _make_step_decorators(
+                template_step=self.batch_template_step,
+                validation=self.validation,
+                instrumentation=self.instrumentation,
+                output_validator=validate_batch_output,
+                deadline_margin_ms=self.deadline_margin_ms,
+            )
+        return _decorate_step(step=step, decorators=self._batch_step_decorators)
+
+    def _compile_parallel_group(
+        self, group: ParallelGroup, step_decorators: list[FunctionType]
+    ) -> FunctionType:
+        if any(map(is_batch_step, group.steps)):
+            raise PipelineBatchError(f"{group.__name__}: batch steps can't be parallel")
+        return super()._compile_parallel_group(
+            group=group, step_decorators=step_decorators
+        )
+
+    def _map(self, func: FunctionType, items: list) -> list:
+        if self.executor is None or len(items) < 2:
+            return list(map(func, items))
+        futures = [
+            self.executor.submit(copy_context().run, func, item) for item in items
+        ]
+        return [future.result() for future in futures]
+
+    def _parse_record(self, record: Record) -> BaseModel:
+        if not isinstance(record, self.event_type):
+            if not isinstance(record, Mapping):
+                record = record.dict()
+            record = self.event_type.parse_obj(record)
+        record.__config__.allow_mutation = False
+        return record
+
+    def _run_record_steps(self, steps, outcomes, events, indices, logger, **kwargs):
+        def run(index: int) -> Outcome:
+            pipeline = _chain_steps(
+                steps=steps,
+                event=events[index],
+                logger=logger,
+                keep_result=True,
+                **kwargs,
+            )
+            try:
+                return pipeline(data=outcomes[index])
+            except Exception as exc:
+                logger.exception(
+                    "failed to process record %s",
+                    _identify(events[index], index, self.item_identifier),
+                )
+                return exc
+
+        for index, outcome in zip(indices, self._map(run, indices)):
+            outcomes[index] = outcome
+
+    def _run_batch_step(self, batch_step, outcomes, events, indices, logger, **kwargs):
+        def run(chunk: list[int]) -> Union[list[PipelineData], Exception]:
+            records = [(outcomes[index], events[index]) for index in chunk]
+            try:
+                results = batch_step.step(records=records, logger=logger, **kwargs)
+                if len(results) != len(records):
+                    raise PipelineStepOutputError(
+                        f"step {batch_step.name}: returned {len(results)} results "
+                        f"for {len(records)} records"
+                    )
+                return results
+            except Exception as exc:
+                logger.exception(
+                    "failed to process records %s",
+                    [
+                        _identify(events[index], index, self.item_identifier)
+                        for index in chunk
+                    ],
+                )
+                return exc
+
+        chunks = _chunk(indices, size=batch_step.batch_size)
+        for chunk, results in zip(chunks, self._map(run, chunks)):
+            if isinstance(results, Exception):
+                results = [results] * len(chunk)
+            for index, outcome in zip(chunk, results):
+                outcomes[index] = outcome
+
+    def _run_segments(
+        self, records: list[Record], data: PipelineData, logger: Logger, **kwargs
+    ) -> list[Outcome]:
+        outcomes, events = [], []
+        for index, record in enumerate(records):
+            try:
+                events.append(self._parse_record(record))
+                outcomes.append(data)
+            except Exception as exc:
+                logger.exception(
+                    "failed to parse record %s",
+                    _identify(record, index, self.item_identifier),
+                )
+                events.append(None)
+                outcomes.append(exc)
+
+        for segment in self.segments:
+            indices = [
+                index
+                for index, outcome in enumerate(outcomes)
+                if not isinstance(outcome, (Exception, PipelineResult))
+            ]
+            if not indices:
+                break
+            run_segment = (
+                self._run_record_steps
+                if isinstance(segment, tuple)
+                else self._run_batch_step
+            )
+            run_segment(
+                segment,
+                outcomes=outcomes,
+                events=events,
+                indices=indices,
+                logger=logger,
+                **kwargs,
+            )
+        return [
+            outcome.data if type(outcome) is PipelineResult else outcome
+            for outcome in outcomes
+        ]
+
+    def run(
+        self,
+        event: Union[Mapping, BaseModel],
+        context: LambdaContext,
+        dependencies: FrozenDict[str, Any],
+        logger: Logger,
+        data: Optional[PipelineData] = None,
+    ) -> list[Outcome]:
+        """
+        Process each record of the event, starting from 'data' (empty by default),
+        returning the PipelineData or the exception for each record, in order
+        """
+        if isinstance(dependencies, Mapping) and not isinstance(
+            dependencies, FrozenDict
+        ):
+            dependencies = FrozenDict(dependencies)
+        data = PipelineData() if data is None else data
+        if self.validation != "off":
+            check_arguments(
+                template_step=self.template_step,
+                context=context,
+                dependencies=dependencies,
+                logger=logger,
+            )
+            self._check_data(data=data)
+
+        records = get_records(event=event)
+
+        def pipeline(data: PipelineData) -> list[Outcome]:
+            return self._run_segments(
+                records=records,
+                data=data,
+                context=context,
+                dependencies=dependencies,
+                logger=logger,
+            )
+
+        if self.instrumentation:
+            pipeline = self.instrumentation.wrap_pipeline(pipeline=pipeline)
+        return pipeline(data=data)
+
+    def process(
+        self,
+        event: Union[Mapping, BaseModel],
+        context: LambdaContext,
+        dependencies: FrozenDict[str, Any],
+        logger: Logger,
+        data: Optional[PipelineData] = None,
+    ) -> dict:
+        """Process each record of the event, returning a partial batch failure response"""
+        records = get_records(event=event)
+        outcomes = self.run(
+            event=event,
+            context=context,
+            dependencies=dependencies,
+            logger=logger,
+            data=data,
+        )
+        return make_batch_response(
+            records=records, outcomes=outcomes, item_identifier=self.item_identifier
+        )
+
+
+def make_batch_response(
+    records: list[Record],
+    outcomes: list[Outcome],
+    item_identifier: Callable[[Record], str] = get_item_identifier,
+) -> dict:
+    """
+    The partial batch failure response for the records whose outcome is an
+    exception. A failed record without an identifier is reported by its index in
+    the batch, which Lambda treats as an invalid identifier (so the whole batch is
+    retried, rather than the record being lost)
+    """
+    return {
+        "batchItemFailures": [
+            {"itemIdentifier": _identify(record, index, item_identifier)}
+            for index, (record, outcome) in enumerate(zip(records, outcomes))
+            if isinstance(outcome, Exception)
+        ]
+    }
+
+
+@validate_arguments
+def compile_batch_pipeline(
+    steps: list[Step],
+    event_type: type,
+    validation: Validation = "full",
+    max_concurrency: int = 1,
+    batch_size: int = 100,
+    item_identifier: Callable = get_item_identifier,
+    initial_keys: tuple[str, ...] = (),
+    observers: tuple[PipelineObserver, ...] = (),
+    trace_memory: bool = False,
+    deadline_margin_ms: Optional[float] = None,
+) -> CompiledBatchPipeline:
+    return CompiledBatchPipeline(
+        steps=steps,
+        event_type=event_type,
+        validation=validation,
+        max_concurrency=max_concurrency,
+        batch_size=batch_size,
+        item_identifier=item_identifier,
+        initial_keys=initial_keys,
+        observers=observers,
+        trace_memory=trace_memory,
+        deadline_margin_ms=deadline_margin_ms,
+    )
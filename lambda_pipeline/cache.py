@@ -0,0 +1,418 @@
+import collections
+import json
+import pickle
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from functools import wraps
+from inspect import iscoroutinefunction
+from types import FunctionType
+from typing import Any, Callable, Hashable, Optional
+
+from lambda_pipeline.types import PipelineData, PipelineResult, Stream
+
+_MISSING = object()
+
+
+class PipelineCacheKeyError(Exception):
+    pass
+
+
+@dataclass
+class CacheInfo:
+    hits: int
+    misses: int
+    evictions: int
+    size: int
+    nbytes: int
+
+
+def _sizeof(value: Any, seen: Optional[set] = None) -> int:
+    """An estimate of the memory used by a value, including the values it contains"""
+    seen = set() if seen is None else seen
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, collections.abc.Mapping):
+        size += sum(_sizeof(k, seen) + _sizeof(v, seen) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(_sizeof(item, seen) for item in value)
+    return size
+
+
+def _canonical(value: Any) -> Any:
+    """
+    A representation of a key which pickles to the same bytes for equal keys,
+    i.e. independent of the order of the items of mappings and sets, and of the
+    type of sequences (since e.g. a FrozenList is equal to a tuple)
+    """
+    if isinstance(value, collections.abc.Mapping):
+        items = ((_canonical(k), _canonical(v)) for k, v in value.items())
+        return ("mapping", tuple(sorted(items, key=repr)))
+    if isinstance(value, (set, frozenset)):
+        return ("set", tuple(sorted(map(_canonical, value), key=repr)))
+    if isinstance(value, (list, tuple)):
+        return ("sequence", tuple(map(_canonical, value)))
+    return value
+
+
+class CacheBackend:
+    """
+    The interface for the storage of cached step outputs. Implementations must be
+    thread safe, since steps can be run concurrently.
+    """
+
+    def get(self, key: Hashable) -> Any:
+        """The value for the key, or _MISSING if it isn't cached or has expired"""
+        raise NotImplementedError
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float]):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def stats(self) -> tuple[int, int, int]:
+        """The number of evictions, and the current size and (estimated) nbytes"""
+        raise NotImplementedError
+
+
+class MemoryBackend(CacheBackend):
+    """
+    An in-process LRU cache, bounded by the number of entries ('maxsize') and by
+    their estimated memory use ('max_bytes'). Expired entries are evicted on access.
+    """
+
+    def __init__(
+        self,
+        maxsize: Optional[int] = 128,
+        max_bytes: Optional[int] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.evictions = 0
+        self.nbytes = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _MISSING
+            expires_at, nbytes, value = entry
+            if expires_at is not None and self.clock() >= expires_at:
+                self._remove(key)
+                return _MISSING
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float]):
+        nbytes = _sizeof(value) if self.max_bytes is not None else 0
+        if self.max_bytes is not None and nbytes > self.max_bytes:
+            return
+        expires_at = None if ttl is None else self.clock() + ttl
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (expires_at, nbytes, value)
+            self.nbytes += nbytes
+            while (self.maxsize is not None and len(self._entries) > self.maxsize) or (
+                self.max_bytes is not None and self.nbytes > self.max_bytes
+            ):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key: Hashable):
+        _, nbytes, _ = self._entries.pop(key)
+        self.nbytes -= nbytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def stats(self) -> tuple[int, int, int]:
+        return self.evictions, len(self._entries), self.nbytes
+
+
+class SqliteBackend(CacheBackend):
+    """
+    A cache in a local sqlite database, which can be shared by processes on the
+    same machine (and survives a process being recycled), as a stand-in for a
+    shared cache. Keys and values are pickled, and entries are evicted in LRU order
+    once there are more than 'maxsize'. The clock is wall-clock time by default,
+    since it is shared between processes.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        maxsize: Optional[int] = 1024,
+        clock: Callable[[], float] = time.time,
+    ):
+        import sqlite3
+
+        self.path = path
+        self.maxsize = maxsize
+        self.clock = clock
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value BLOB, expires_at REAL, accessed_at REAL)"
+        )
+
+    @staticmethod
+    def _key(key: Hashable) -> str:
+        import hashlib
+
+        return hashlib.sha256(pickle.dumps(_canonical(key))).hexdigest()
+
+    def get(self, key: Hashable) -> Any:
+        key, now = self._key(key), self.clock()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return _MISSING
+            value, expires_at = row
+            if expires_at is not None and now >= expires_at:
+                self._connection.execute("DELETE FROM cache WHERE key = ?", (key,))
+                return _MISSING
+            self._connection.execute(
+                "UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+        return pickle.loads(value)
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float]):
+        key, now = self._key(key), self.clock()
+        expires_at = None if ttl is None else now + ttl
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)",
+                (key, pickle.dumps(value), expires_at, now),
+            )
+            if self.maxsize is None:
+                return
+            evicted = self._connection.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache "
+                "ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.maxsize,),
+            ).rowcount
+            self.evictions += evicted
+
+    def clear(self):
+        with self._lock:
+            self._connection.execute("DELETE FROM cache")
+
+    def stats(self) -> tuple[int, int, int]:
+        with self._lock:
+            size, nbytes = self._connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM cache"
+            ).fetchone()
+        return self.evictions, size, nbytes
+
+
+def _changes(data: Any, output: Any) -> Optional[tuple[bool, dict]]:
+    """
+    What a step changed: whether it ended the pipeline, and the items of its output
+    which it added or changed (relative to its input 'data'), which are applied to
+    the data of later invocations on a cache hit, so that the rest of their data is
+    kept. None if the output can't be cached: it isn't a mapping, it removed keys
+    from the data, or the items it changed contain a Stream (which can only be
+    consumed once).
+    """
+    done = type(output) is PipelineResult
+    if done:
+        output = output.data
+    if not isinstance(output, collections.abc.Mapping) or any(
+        key not in output for key in data
+    ):
+        return None
+    changes = {}
+    for key, value in output.items():
+        if key in data:
+            old_value = data[key]
+            if old_value is value or old_value == value:
+                continue
+        if isinstance(value, Stream):
+            return None
+        changes[key] = value
+    return done, changes
+
+
+def _apply_changes(data: Any, cached: tuple[bool, dict]) -> Any:
+    done, changes = cached
+    if isinstance(data, PipelineData):
+        data = data.update(changes)
+    else:
+        data = PipelineData({**data, **changes})
+    return PipelineResult.done(data) if done else data
+
+
+# The parts of an event which differ between invocations for the same request, and
+# so are left out of the default cache key
+_VOLATILE_EVENT_FIELDS = frozenset({"requestContext"})
+_HEADER_FIELDS = frozenset({"headers", "multiValueHeaders"})
+_TRACING_HEADERS = frozenset(
+    {
+        "x-amzn-trace-id",
+        "x-request-id",
+        "x-correlation-id",
+        "traceparent",
+        "tracestate",
+        "b3",
+        "x-b3-traceid",
+        "x-b3-spanid",
+        "x-b3-parentspanid",
+        "x-b3-sampled",
+    }
+)
+
+
+def _event_key(event) -> str:
+    """
+    The event as JSON, without its request context (e.g. the request ID and time)
+    and tracing headers. A lazily parsed event's raw fields are used, so that it
+    isn't validated for the key.
+    """
+    raw = getattr(event, "__raw__", None)
+    if raw is None:
+        raw = event.dict(by_alias=True)
+    projection = {}
+    for name, value in raw.items():
+        if name in _VOLATILE_EVENT_FIELDS:
+            continue
+        if name in _HEADER_FIELDS and isinstance(value, collections.abc.Mapping):
+            value = {
+                header: header_value
+                for header, header_value in value.items()
+                if header.lower() not in _TRACING_HEADERS
+            }
+        projection[name] = value
+    return json.dumps(projection, sort_keys=True, default=str)
+
+
+def _default_key(data, event) -> Hashable:
+    return data, _event_key(event)
+
+
+def cached_step(
+    ttl: Optional[float] = None,
+    maxsize: Optional[int] = 128,
+    max_bytes: Optional[int] = None,
+    key: Callable[[Any, Any], Hashable] = _default_key,
+    backend: Optional[CacheBackend] = None,
+    clock: Callable[[], float] = time.monotonic,
+):
+    """
+    Memoise the output of a step across invocations (i.e. in a warm container),
+    for steps whose output only depends on the 'data' and the 'event'. The cache
+    key is `key(data, event)`, which by default is the data and the event's JSON
+    without its request context or tracing headers (which differ between
+    invocations): pass a cheaper key function if the step only depends on part
+    of them, e.g. `key=lambda data, event: event.headers.get("Authorization")`.
+    Only the items which the step added or changed are cached, and on a hit they
+    are applied to the current 'data', so the rest of the data is never taken
+    from an earlier invocation.
+
+    Entries expire after 'ttl' seconds (never, if None), and the least recently
+    used entries are evicted once there are more than 'maxsize' of them or they
+    are estimated to use more than 'max_bytes'. Pass a 'backend' (e.g. a
+    SqliteBackend) to store the entries elsewhere, in which case the backend is
+    responsible for its own bounds. The hits, misses and evictions are available
+    from `step.cache_info()` and from `CompiledPipeline.cache_info()`. Outputs
+    which add a Stream, or remove keys from the data, aren't cached.
+
+    The steps decorated by the same `cached_step(...)` share its backend (with
+    keys prefixed by the step's name), so `step.cache_clear()` empties the cache
+    of all of them.
+    """
+    if backend is None:
+        backend = MemoryBackend(maxsize=maxsize, max_bytes=max_bytes, clock=clock)
+
+    def decorator(step: FunctionType) -> FunctionType:
+        counts = {"hits": 0, "misses": 0}
+        counts_lock = threading.Lock()
+
+        def _get_key(data, event) -> Hashable:
+            cache_key = (step.__module__, step.__qualname__, key(data, event))
+            try:
+                hash(cache_key)
+            except TypeError as exc:
+                raise PipelineCacheKeyError(
+                    f"step {step.__name__}: the cache key is not hashable ({exc})"
+                ) from exc
+            return cache_key
+
+        def _get(cache_key: Hashable) -> Any:
+            cached = backend.get(cache_key)
+            with counts_lock:
+                counts["hits" if cached is not _MISSING else "misses"] += 1
+            return cached
+
+        def _set(cache_key: Hashable, data, output):
+            cached = _changes(data, output)
+            if cached is not None:
+                backend.set(cache_key, cached, ttl)
+
+        if iscoroutinefunction(step):
+
+            @wraps(step)
+            async def wrapper(data, event, **kwargs):
+                cache_key = _get_key(data, event)
+                cached = _get(cache_key)
+                if cached is not _MISSING:
+                    return _apply_changes(data, cached)
+                output = await step(data=data, event=event, **kwargs)
+                _set(cache_key, data, output)
+                return output
+
+        else:
+
+            @wraps(step)
+            def wrapper(data, event, **kwargs):
+                cache_key = _get_key(data, event)
+                cached = _get(cache_key)
+                if cached is not _MISSING:
+                    return _apply_changes(data, cached)
+                output = step(data=data, event=event, **kwargs)
+                _set(cache_key, data, output)
+                return output
+
+        def cache_info() -> CacheInfo:
+            evictions, size, nbytes = backend.stats()
+            with counts_lock:
+                hits, misses = counts["hits"], counts["misses"]
+            return CacheInfo(
+                hits=hits,
+                misses=misses,
+                evictions=evictions,
+                size=size,
+                nbytes=nbytes,
+            )
+
+        def cache_clear():
+            """Empty the backend, i.e. for every step decorated by the same cached_step(...)"""
+            backend.clear()
+            with counts_lock:
+                counts.update(hits=0, misses=0)
+
+        wrapper.cache_info = cache_info
+        wrapper.cache_clear = cache_clear
+        return wrapper
+
+    return decorator
+
+
+def is_cached_step(step: Any) -> bool:
+    return callable(getattr(step, "cache_info", None))
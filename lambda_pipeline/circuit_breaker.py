@@ -0,0 +1,247 @@
+import collections
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from functools import wraps
+from inspect import iscoroutinefunction
+from typing import Callable, Iterable, Optional
+
+from lambda_pipeline.instrumentation import (
+    CircuitStateChange,
+    PipelineObserver,
+    current_instrumentation,
+)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+LOGGER = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+@dataclass
+class CircuitInfo:
+    state: str
+    failure_rate: Optional[float]
+    calls: int
+    failures: int
+    rejected: int
+
+
+class CircuitBreaker:
+    """
+    Fail fast with CircuitOpenError, rather than waiting on a dependency which is
+    failing. Define the breaker at module level (or in the shared dependencies)
+    so that its state is kept in the warm container across invocations, and wrap
+    the steps (or the dependency's functions) which call the dependency:
+
+        table_breaker = CircuitBreaker("documents-table")
+
+        @table_breaker
+        def read_document(data: PipelineData, ...) -> PipelineData:
+
+    The breaker is "closed" until, of the calls in the last 'window_s' seconds (up
+    to 'window_size' calls, and at least 'min_calls'), the proportion that raised
+    one of the 'failure_on' exceptions reaches 'failure_rate_threshold'. It is then
+    "open", and calls raise CircuitOpenError without calling the dependency, for
+    'open_for_s' seconds. It is then "half_open": up to 'half_open_calls' trial
+    calls are let through, and the breaker is closed if they all succeed or opened
+    again if any of them fails.
+
+    State changes are logged with the step's logger (or this module's logger, for
+    a function that isn't a step) and passed to the 'observers', and to the
+    observers of the pipeline whose step made the call which changed the state.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate_threshold: float = 0.5,
+        window_size: int = 20,
+        window_s: float = 60.0,
+        min_calls: int = 10,
+        open_for_s: float = 30.0,
+        half_open_calls: int = 1,
+        failure_on: tuple[type[BaseException], ...] = (Exception,),
+        observers: Iterable[PipelineObserver] = (),
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if not 0 < failure_rate_threshold <= 1:
+            raise ValueError("failure_rate_threshold must be between 0 and 1")
+        if not 0 < min_calls <= window_size:
+            raise ValueError("min_calls must be between 1 and window_size")
+        if half_open_calls < 1:
+            raise ValueError("half_open_calls must be at least 1")
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.window_s = window_s
+        self.min_calls = min_calls
+        self.open_for_s = open_for_s
+        self.half_open_calls = half_open_calls
+        self.failure_on = failure_on
+        self.observers = tuple(observers)
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._outcomes = collections.deque(maxlen=window_size)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._trials = 0
+        self._trial_successes = 0
+        self._counts = {"calls": 0, "failures": 0, "rejected": 0}
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and self._open_for() <= 0:
+                return HALF_OPEN
+            return self._state
+
+    def _open_for(self) -> float:
+        """The time (in seconds) until an open breaker lets a trial call through"""
+        return self._opened_at + self.open_for_s - self.clock()
+
+    def _failure_rate(self) -> Optional[float]:
+        now = self.clock()
+        while self._outcomes and self._outcomes[0][0] <= now - self.window_s:
+            self._outcomes.popleft()
+        if not self._outcomes:
+            return None
+        return sum(failed for _, failed in self._outcomes) / len(self._outcomes)
+
+    def _transition(self, new_state: str) -> CircuitStateChange:
+        change = CircuitStateChange(
+            circuit=self.name,
+            old_state=self._state,
+            new_state=new_state,
+            failure_rate=self._failure_rate(),
+        )
+        self._state = new_state
+        if new_state == OPEN:
+            self._opened_at = self.clock()
+        elif new_state == HALF_OPEN:
+            self._trials = self._trial_successes = 0
+        else:
+            self._outcomes.clear()
+        return change
+
+    def _notify(self, change: Optional[CircuitStateChange], logger):
+        if change is None:
+            return
+        log = logger.warning if change.new_state == OPEN else logger.info
+        log(
+            "circuit %s changed from %s to %s (failure rate %s)",
+            change.circuit,
+            change.old_state,
+            change.new_state,
+            change.failure_rate,
+        )
+        for observer in self.observers:
+            observer.on_circuit_state_change(change)
+        instrumentation = current_instrumentation()
+        if instrumentation is not None:
+            instrumentation.on_circuit_state_change(change)
+
+    def _admit(self, logger):
+        """Raise CircuitOpenError, unless the call is let through"""
+        change = None
+        with self._lock:
+            if self._state == CLOSED:
+                self._counts["calls"] += 1
+                return
+            if self._state == OPEN and self._open_for() <= 0:
+                change = self._transition(HALF_OPEN)
+            if self._state == HALF_OPEN and self._trials < self.half_open_calls:
+                self._trials += 1
+                self._counts["calls"] += 1
+            else:
+                self._counts["rejected"] += 1
+                if self._state == OPEN:
+                    message = f"circuit {self.name} is open for another {self._open_for():.1f}s"
+                else:
+                    message = f"circuit {self.name} is half open, awaiting trial calls"
+                raise CircuitOpenError(message)
+        self._notify(change, logger)
+
+    def _record(self, failed: Optional[bool], logger):
+        """Record the outcome of a call, which is None if it didn't complete (e.g. it was cancelled)"""
+        change = None
+        with self._lock:
+            if failed is None:
+                self._trials -= self._state == HALF_OPEN
+                return
+            self._counts["failures"] += failed
+            if self._state == HALF_OPEN:
+                if failed:
+                    change = self._transition(OPEN)
+                else:
+                    self._trial_successes += 1
+                    if self._trial_successes >= self.half_open_calls:
+                        change = self._transition(CLOSED)
+            elif self._state == CLOSED:
+                self._outcomes.append((self.clock(), failed))
+                failure_rate = self._failure_rate()
+                if (
+                    failed
+                    and len(self._outcomes) >= self.min_calls
+                    and failure_rate >= self.failure_rate_threshold
+                ):
+                    change = self._transition(OPEN)
+        self._notify(change, logger)
+
+    def __call__(self, func: Callable) -> Callable:
+        """Wrap a step, or any other (sync or async) function which calls the dependency"""
+
+        if iscoroutinefunction(func):
+
+            @wraps(func)
+            async def wrapper(*args, **kwargs):
+                logger = kwargs.get("logger") or LOGGER
+                self._admit(logger)
+                try:
+                    result = await func(*args, **kwargs)
+                except Exception as exc:
+                    self._record(isinstance(exc, self.failure_on), logger)
+                    raise
+                except BaseException:
+                    self._record(None, logger)
+                    raise
+                self._record(False, logger)
+                return result
+
+        else:
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                logger = kwargs.get("logger") or LOGGER
+                self._admit(logger)
+                try:
+                    result = func(*args, **kwargs)
+                except Exception as exc:
+                    self._record(isinstance(exc, self.failure_on), logger)
+                    raise
+                except BaseException:
+                    self._record(None, logger)
+                    raise
+                self._record(False, logger)
+                return result
+
+        return wrapper
+
+    def info(self) -> CircuitInfo:
+        state = self.state
+        with self._lock:
+            return CircuitInfo(
+                state=state, failure_rate=self._failure_rate(), **self._counts
+            )
+
+    def reset(self):
+        """Close the breaker and forget its recent calls"""
+        with self._lock:
+            change = None if self._state == CLOSED else self._transition(CLOSED)
+            self._outcomes.clear()
+        self._notify(change, LOGGER)
@@ -0,0 +1,267 @@
+from __future__ import annotations
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextvars import copy_context
+from logging import Logger
+from types import FunctionType
+from typing import TYPE_CHECKING, Any, Optional
+
+from lambda_pipeline.instrumentation import PipelineObserver
+from lambda_pipeline.pipeline import CompiledPipeline, Step, Validation
+from lambda_pipeline.schema import get_schema_io
+from lambda_pipeline.step_decorators import PipelineStepOutputError, validate_arguments
+from lambda_pipeline.types import FrozenDict, PipelineData, PipelineResult
+
+if TYPE_CHECKING:
+    from pydantic import BaseModel
+
+    from lambda_pipeline.types import LambdaContext
+
+
+class PipelineGraphError(Exception):
+    pass
+
+
+def declare_io(reads: tuple[str, ...] = (), writes: tuple[str, ...] = ()):
+    """Declare the PipelineData keys that a step reads and writes"""
+
+    def decorator(step: FunctionType) -> FunctionType:
+        step.__pipeline_reads__ = frozenset(reads)
+        step.__pipeline_writes__ = frozenset(writes)
+        return step
+
+    return decorator
+
+
+def get_declared_io(step: Step) -> Optional[tuple[frozenset, frozenset]]:
+    """
+    The keys declared with `declare_io`, or else the required keys of the step's
+    input and output schemas (if it has both)
+    """
+    try:
+        return step.__pipeline_reads__, step.__pipeline_writes__
+    except AttributeError:
+        return get_schema_io(step)
+
+
+class _Node:
+    def __init__(self, index: int, step: Step, compiled_step: FunctionType):
+        self.index = index
+        self.name = step.__name__
+        self.step = compiled_step
+        self.reads, self.writes = get_declared_io(step) or (None, None)
+        self.dependencies = set()
+        self.dependents = set()
+
+
+def _build_graph(nodes: list[_Node], available_keys: Optional[frozenset]):
+    """
+    Link each node to the producers of the keys that it reads. Each key can only
+    have one producer, and the keys that are not produced by a node must be in
+    'available_keys' (if this is known)
+    """
+    producers = {}
+    for node in nodes:
+        for key in node.writes:
+            if key in producers:
+                raise PipelineGraphError(
+                    f"steps {producers[key].name} and {node.name} both write '{key}'"
+                )
+            producers[key] = node
+
+    for node in nodes:
+        for key in node.reads:
+            producer = producers.get(key)
+            if producer is node or (producer is None and available_keys is None):
+                continue
+            if producer is None:
+                if key not in available_keys:
+                    raise PipelineGraphError(
+                        f"step {node.name} reads '{key}', which is not written by "
+                        "any step or provided in the initial keys"
+                    )
+                continue
+            node.dependencies.add(producer)
+            producer.dependents.add(node)
+
+    _check_for_cycles(nodes=nodes)
+
+
+def _check_for_cycles(nodes: list[_Node]):
+    n_dependencies = {node: len(node.dependencies) for node in nodes}
+    ready = [node for node, n in n_dependencies.items() if n == 0]
+    n_visited = 0
+    while ready:
+        node = ready.pop()
+        n_visited += 1
+        for dependent in node.dependents:
+            n_dependencies[dependent] -= 1
+            if n_dependencies[dependent] == 0:
+                ready.append(dependent)
+
+    if n_visited != len(nodes):
+        cycle = sorted(node.name for node, n in n_dependencies.items() if n > 0)
+        raise PipelineGraphError(f"steps {', '.join(cycle)} have cyclic dependencies")
+
+
+class CompiledDagPipeline(CompiledPipeline):
+    """
+    A CompiledPipeline whose steps can declare the PipelineData keys that they read
+    and write with `declare_io`. Each step is run on a bounded thread pool as soon as
+    the steps that write the keys it reads have completed, rather than in the order
+    in which the steps are listed. The graph is checked once on compilation, raising
+    PipelineGraphError for keys without a producer, keys with more than one producer
+    and cyclic dependencies.
+
+    Steps annotated with input and output schemas (`PipelineData[Schema]`) are
+    treated as declaring the required keys of their schemas.
+
+    Only the declared 'writes' of a step's output are merged into the data. Steps
+    which don't declare their keys are run alone, with all of the data, once all of
+    the steps listed before them have completed, and their output replaces the data.
+
+    A step which returns `PipelineResult.done(data)` ends the pipeline: no more
+    steps are started, and the pipeline returns the data once the steps which are
+    already running have completed (and their writes have been merged).
+    """
+
+    def __init__(
+        self,
+        steps: list[Step],
+        event_type: type,
+        initial_keys: tuple[str, ...] = (),
+        max_workers: Optional[int] = None,
+        **kwargs,
+    ):
+        super().__init__(
+            steps=steps, event_type=event_type, initial_keys=initial_keys, **kwargs
+        )
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="lambda_pipeline_dag"
+        )
+
+        self.stages = []
+        graph_nodes = []
+        available_keys = self.initial_keys
+        nodes = map(_Node, range(len(steps)), steps, self.steps)
+        for node in nodes:
+            if node.reads is not None:
+                graph_nodes.append(node)
+                continue
+            if graph_nodes:
+                _build_graph(nodes=graph_nodes, available_keys=available_keys)
+                self.stages.append(tuple(graph_nodes))
+                graph_nodes = []
+            self.stages.append(node)
+            available_keys = None
+        if graph_nodes:
+            _build_graph(nodes=graph_nodes, available_keys=available_keys)
+            self.stages.append(tuple(graph_nodes))
+
+    def _check_schemas(self, steps: list[Step]):
+        # The keys read by each step are checked when the graph is built, since
+        # the steps aren't run in the order in which they are listed
+        pass
+
+    def _run_graph(self, nodes: tuple[_Node], data: PipelineData, **kwargs):
+        n_dependencies = {node: len(node.dependencies) for node in nodes}
+        running = {}
+        errors = []
+        ended = False
+
+        def submit(node: _Node):
+            future = self.executor.submit(
+                copy_context().run, node.step, data=data, **kwargs
+            )
+            running[future] = node
+
+        for node in nodes:
+            if not node.dependencies:
+                submit(node)
+
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                node = running.pop(future)
+                try:
+                    result = future.result()
+                except Exception as exc:
+                    errors.append((node.index, exc))
+                    continue
+
+                writes = node.writes
+                if type(result) is PipelineResult:
+                    # The step ends the pipeline, so later steps don't need its writes
+                    ended, result = True, result.data
+                    writes = writes.intersection(result)
+                missing_keys = sorted(writes.difference(result))
+                if missing_keys:
+                    errors.append(
+                        (
+                            node.index,
+                            PipelineStepOutputError(
+                                f"step {node.name}: did not write {missing_keys}"
+                            ),
+                        )
+                    )
+                    continue
+
+                data = data.update({key: result[key] for key in writes})
+                if errors or ended:
+                    continue
+                for dependent in node.dependents:
+                    n_dependencies[dependent] -= 1
+                    if n_dependencies[dependent] == 0:
+                        submit(dependent)
+
+        if errors:
+            _, exc = min(errors, key=lambda error: error[0])
+            raise exc
+        return PipelineResult.done(data) if ended else data
+
+    def _chain(
+        self,
+        event: BaseModel,
+        context: LambdaContext,
+        dependencies: FrozenDict[str, Any],
+        logger: Logger,
+    ) -> FunctionType:
+        kwargs = dict(
+            event=event, context=context, dependencies=dependencies, logger=logger
+        )
+
+        def pipeline(data: PipelineData) -> PipelineData:
+            self._check_data(data=data)
+            for stage in self.stages:
+                if isinstance(stage, tuple):
+                    data = self._run_graph(nodes=stage, data=data, **kwargs)
+                else:
+                    data = stage.step(data=data, **kwargs)
+                if type(data) is PipelineResult:
+                    return data.data
+            return data
+
+        return pipeline
+
+
+@validate_arguments
+def compile_dag_pipeline(
+    steps: list[Step],
+    event_type: type,
+    validation: Validation = "full",
+    initial_keys: tuple[str, ...] = (),
+    max_workers: Optional[int] = None,
+    observers: tuple[PipelineObserver, ...] = (),
+    trace_memory: bool = False,
+    deadline_margin_ms: Optional[float] = None,
+) -> CompiledDagPipeline:
+    return CompiledDagPipeline(
+        steps=steps,
+        event_type=event_type,
+        validation=validation,
+        initial_keys=initial_keys,
+        max_workers=max_workers,
+        observers=observers,
+        trace_memory=trace_memory,
+        deadline_margin_ms=deadline_margin_ms,
+    )
@@ -0,0 +1,150 @@
+import math
+from dataclasses import dataclass
+from functools import wraps
+from inspect import iscoroutinefunction, unwrap
+from types import FunctionType
+from typing import Optional
+
+
+class PipelineTimeoutError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class StepBudget:
+    ms: Optional[float] = None
+    optional: bool = False
+
+
+_NO_BUDGET = StepBudget()
+
+
+def budget(ms: Optional[float] = None, optional: bool = False):
+    """
+    Declare the time (in milliseconds) that a step needs, for pipelines compiled
+    with a 'deadline_margin_ms' (see `enforce_deadline`). The step isn't started
+    unless it has at least 'ms' before the deadline. An 'optional' step is skipped
+    (its input data is passed on as its output) rather than raising
+    PipelineTimeoutError, e.g.
+
+        @budget(ms=200, optional=True)
+        def enrich_document(data: PipelineData, ...) -> PipelineData:
+    """
+    if ms is not None and ms < 0:
+        raise ValueError("ms must not be negative")
+
+    def decorator(step: FunctionType) -> FunctionType:
+        step.__budget__ = StepBudget(ms=ms, optional=optional)
+        return step
+
+    return decorator
+
+
+def get_budget(step: FunctionType) -> StepBudget:
+    return getattr(step, "__budget__", _NO_BUDGET)
+
+
+def get_remaining_ms(context) -> Optional[float]:
+    """
+    The time remaining before the Lambda times out, or None if the context doesn't
+    know it: it has no (callable) get_remaining_time_in_millis, or it reports no
+    time remaining, as powertools' LambdaContext (a stub which returns 0) does
+    """
+    get_remaining_time_in_millis = getattr(
+        context, "get_remaining_time_in_millis", None
+    )
+    if not callable(get_remaining_time_in_millis):
+        return None
+    remaining_ms = get_remaining_time_in_millis()
+    if remaining_ms is None or remaining_ms <= 0:
+        return None
+    return remaining_ms
+
+
+def remaining_ms(context, margin_ms: float) -> Optional[float]:
+    """
+    The time before the deadline, i.e. margin_ms before the Lambda times out, or
+    None if the context doesn't know the remaining time (see `get_remaining_ms`)
+    """
+    remaining = get_remaining_ms(context)
+    return None if remaining is None else remaining - margin_ms
+
+
+def _skip(kwargs: dict):
+    """The output of a skipped step: its input data (or the data of each record)"""
+    if "data" in kwargs:
+        return kwargs["data"]
+    return [data for data, _ in kwargs["records"]]
+
+
+def enforce_deadline(step: FunctionType, margin_ms: float) -> FunctionType:
+    """
+    Check the time remaining before the deadline (which is 'margin_ms' before the
+    Lambda times out, according to `context.get_remaining_time_in_millis()`) before
+    the step is started. If it is less than the step's budget (see `budget`), or
+    the deadline has passed, then PipelineTimeoutError is raised, or the step is
+    skipped if it is optional. There is no deadline if the context doesn't know
+    the remaining time (e.g. powertools' LambdaContext, in tests).
+
+    Synchronous steps can't be interrupted, so a step which overruns is caught
+    by the check before the next step. Async steps are cancelled when they
+    overrun their budget or the deadline.
+    """
+    step_budget = get_budget(step)
+    needed_ms = step_budget.ms or 0
+
+    def admit(kwargs: dict) -> Optional[float]:
+        """
+        The time remaining (infinite if it isn't known), or None if the step is to
+        be skipped
+        """
+        remaining = remaining_ms(context=kwargs["context"], margin_ms=margin_ms)
+        if remaining is None:
+            return math.inf
+        if remaining > 0 and remaining >= needed_ms:
+            return remaining
+        if remaining <= 0:
+            message = f"step {step.__name__} wasn't started, the deadline has passed"
+        else:
+            message = (
+                f"step {step.__name__} needs {needed_ms}ms, but {remaining:.0f}ms "
+                "remain before the deadline"
+            )
+        if step_budget.optional:
+            kwargs["logger"].warning("skipped optional %s", message)
+            return None
+        raise PipelineTimeoutError(message)
+
+    if iscoroutinefunction(unwrap(step)):
+
+        @wraps(step)
+        async def async_wrapper(**kwargs):
+            import asyncio
+
+            remaining = admit(kwargs)
+            if remaining is None:
+                return _skip(kwargs)
+            timeout_ms = min(step_budget.ms or remaining, remaining)
+            if timeout_ms == math.inf:
+                return await step(**kwargs)
+            try:
+                return await asyncio.wait_for(step(**kwargs), timeout=timeout_ms / 1000)
+            except asyncio.TimeoutError:
+                message = f"step {step.__name__} was cancelled after {timeout_ms:.0f}ms"
+                if step_budget.optional:
+                    kwargs["logger"].warning("skipped optional %s", message)
+                    return _skip(kwargs)
+                raise PipelineTimeoutError(message) from None
+
+        return async_wrapper
+
+    @wraps(step)
+    def wrapper(**kwargs):
+        remaining = remaining_ms(context=kwargs["context"], margin_ms=margin_ms)
+        if (remaining is not None and remaining > 0 and remaining >= needed_ms) or (
+            admit(kwargs) is not None
+        ):
+            return step(**kwargs)
+        return _skip(kwargs)
+
+    return wrapper
@@ -0,0 +1,333 @@
+import threading
+import time
+from collections.abc import Mapping
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from queue import Empty, LifoQueue
+from typing import Any, Callable, Optional
+
+from lambda_pipeline.types import FrozenDict, freeze
+
+
+class PipelineDependencyError(Exception):
+    pass
+
+
+@dataclass
+class DependencyInfo:
+    initialised: bool
+    inits: int
+    init_seconds: float
+    last_init_seconds: float
+    refreshes: int
+
+
+class LazyDependency:
+    """
+    A dependency which is constructed by calling 'factory' on first access (see
+    `lazy`), rather than when the DependencyContainer is built.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], Any],
+        pool_size: Optional[int] = None,
+        health_check: Optional[Callable[[Any], bool]] = None,
+        refresh: Optional[Callable[[Any], Any]] = None,
+        max_age: Optional[float] = None,
+        check_interval: float = 60.0,
+    ):
+        if pool_size is not None and pool_size < 1:
+            raise ValueError("pool_size must be at least 1")
+        self.factory = factory
+        self.pool_size = pool_size
+        self.health_check = health_check
+        self.refresh = refresh
+        self.max_age = max_age
+        self.check_interval = check_interval
+
+    @property
+    def is_checked(self) -> bool:
+        return self.health_check is not None or self.max_age is not None
+
+
+def lazy(
+    factory: Callable[[], Any],
+    pool_size: Optional[int] = None,
+    health_check: Optional[Callable[[Any], bool]] = None,
+    refresh: Optional[Callable[[Any], Any]] = None,
+    max_age: Optional[float] = None,
+    check_interval: float = 60.0,
+) -> LazyDependency:
+    """
+    Declare a dependency of a DependencyContainer which is constructed by 'factory'
+    on first access, e.g. `lazy(lambda: boto3.client("s3"))`.
+
+    pool_size: construct up to this many resources (on demand), to be acquired by
+        one step at a time from the ResourcePool, for steps run in parallel groups
+        or as async steps. Set it to the number of steps which use it concurrently.
+    health_check: called with the resource on access, at most every
+        'check_interval' seconds. If it returns False (or raises) the resource is
+        refreshed.
+    refresh: called with an unhealthy (or expired) resource to return a new one,
+        e.g. by reconnecting. By default the resource is constructed again by 'factory'.
+    max_age: refresh the resource when it is older than this many seconds.
+    """
+    return LazyDependency(
+        factory=factory,
+        pool_size=pool_size,
+        health_check=health_check,
+        refresh=refresh,
+        max_age=max_age,
+        check_interval=check_interval,
+    )
+
+
+class _Resource:
+    """A constructed resource, and when it was constructed and last checked"""
+
+    __slots__ = ("value", "created", "checked")
+
+    def __init__(self, value: Any, created: float):
+        self.value = value
+        self.created = created
+        self.checked = created
+
+
+def _is_healthy(health_check: Callable[[Any], bool], value: Any) -> bool:
+    try:
+        return bool(health_check(value))
+    except Exception:
+        return False
+
+
+class _Dependency:
+    """Constructs, checks and refreshes the resources of a LazyDependency"""
+
+    def __init__(self, name: str, spec: LazyDependency, clock: Callable[[], float]):
+        self.name = name
+        self.spec = spec
+        self.clock = clock
+        self.resource: Optional[_Resource] = None
+        self.info = DependencyInfo(
+            initialised=False,
+            inits=0,
+            init_seconds=0.0,
+            last_init_seconds=0.0,
+            refreshes=0,
+        )
+        self._lock = threading.Lock()
+        self._info_lock = threading.Lock()
+
+    def _construct(self, func: Callable, *args) -> _Resource:
+        started = time.perf_counter()
+        try:
+            value = func(*args)
+        except Exception as exc:
+            raise PipelineDependencyError(
+                f"dependency '{self.name}' could not be constructed: {exc}"
+            ) from exc
+        seconds = time.perf_counter() - started
+        with self._info_lock:
+            self.info.initialised = True
+            self.info.inits += 1
+            self.info.init_seconds += seconds
+            self.info.last_init_seconds = seconds
+        return _Resource(value=value, created=self.clock())
+
+    def create(self) -> _Resource:
+        return self._construct(self.spec.factory)
+
+    def renew(self, resource: _Resource) -> _Resource:
+        """The resource, or a refreshed resource if it has expired or is unhealthy"""
+        spec = self.spec
+        now = self.clock()
+        if spec.max_age is None or now - resource.created < spec.max_age:
+            if (
+                spec.health_check is None
+                or now - resource.checked < spec.check_interval
+            ):
+                return resource
+            resource.checked = now
+            if _is_healthy(health_check=spec.health_check, value=resource.value):
+                return resource
+
+        with self._info_lock:
+            self.info.refreshes += 1
+        if spec.refresh is None:
+            return self.create()
+        return self._construct(spec.refresh, resource.value)
+
+    def get(self) -> Any:
+        with self._lock:
+            if self.resource is None:
+                self.resource = self.create()
+            elif self.spec.is_checked:
+                self.resource = self.renew(self.resource)
+            return self.resource.value
+
+
+class ResourcePool:
+    """
+    Up to 'size' resources of a dependency (e.g. database connections), which are
+    constructed on demand and are used by one step at a time:
+
+        with dependencies["db"].acquire() as connection:
+            ...
+
+    or `async with dependencies["db"].acquire_async() as connection:` in async
+    steps. Released resources are kept for later invocations, and the most recently
+    released resource is acquired first.
+    """
+
+    def __init__(self, dependency: _Dependency, size: int):
+        self.size = size
+        self._dependency = dependency
+        self._idle = LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _acquire(self, block: bool) -> Optional[_Resource]:
+        try:
+            resource = self._idle.get_nowait()
+        except Empty:
+            with self._lock:
+                create = self._created < self.size
+                if create:
+                    self._created += 1
+            if create:
+                resource = None
+            elif block:
+                resource = self._idle.get()
+            else:
+                return None
+
+        try:
+            if resource is None:
+                return self._dependency.create()
+            return self._dependency.renew(resource)
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+    def _release(self, resource: _Resource):
+        self._idle.put(resource)
+
+    @contextmanager
+    def acquire(self):
+        """Acquire a resource, waiting for one to be released if they are all in use"""
+        resource = self._acquire(block=True)
+        try:
+            yield resource.value
+        finally:
+            self._release(resource)
+
+    @asynccontextmanager
+    async def acquire_async(self):
+        """As `acquire`, but waits for a resource without blocking the event loop"""
+        resource = self._acquire(block=False)
+        if resource is None:
+            import asyncio
+
+            resource = await asyncio.get_running_loop().run_in_executor(
+                None, self._acquire, True
+            )
+        try:
+            yield resource.value
+        finally:
+            self._release(resource)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self._dependency.name!r}, size={self.size})"
+
+
+class DependencyContainer(Mapping):
+    """
+    The dependencies of a pipeline, to be passed to `bind` in place of a dict.
+    Build it once, at module level, so that its resources are reused by warm
+    invocations:
+
+        dependencies = DependencyContainer(
+            {
+                "s3": lazy(lambda: boto3.client("s3")),
+                "db": lazy(connect, pool_size=4, health_check=ping),
+                "table_name": os.environ["TABLE_NAME"],
+            }
+        )
+
+    Dependencies declared with `lazy` are constructed on first access by a step
+    (`dependencies["s3"]`), so a cold start only pays for the dependencies that the
+    invocation uses. Those with a 'pool_size' are a ResourcePool. The resources are
+    handles (e.g. clients) rather than data, so they are left as the factory
+    returned them, whereas other values are frozen. `info()` returns the
+    DependencyInfo (e.g. the time taken to construct them) of each lazy dependency.
+
+    It is registered as a FrozenDict, so that pipelines use it as it is rather than
+    freezing (i.e. constructing) all of its dependencies.
+    """
+
+    __slots__ = ("_names", "_values", "_dependencies")
+
+    def __init__(
+        self,
+        dependencies: Mapping[str, Any] = (),
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        dependencies = dict(dependencies)
+        self._names = tuple(dependencies)
+        self._values = {}
+        self._dependencies = {}
+        for name, value in dependencies.items():
+            if not isinstance(value, LazyDependency):
+                self._values[name] = freeze(value)
+                continue
+            dependency = _Dependency(name=name, spec=value, clock=clock)
+            if value.pool_size is not None:
+                self._values[name] = ResourcePool(
+                    dependency=dependency, size=value.pool_size
+                )
+            self._dependencies[name] = dependency
+
+    def __getitem__(self, key):
+        try:
+            return self._values[key]
+        except KeyError:
+            pass
+        dependency = self._dependencies[key]
+        value = dependency.get()
+        if not dependency.spec.is_checked:
+            self._values[key] = value
+        return value
+
+    def __contains__(self, key):
+        return key in self._values or key in self._dependencies
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def __len__(self):
+        return len(self._names)
+
+    def __eq__(self, other: object) -> bool:
+        return self is other
+
+    def __hash__(self):
+        return id(self)
+
+    def __reduce__(self):
+        raise TypeError("a DependencyContainer can't be pickled")
+
+    def __repr__(self):
+        return f"{type(self).__name__}({list(self)})"
+
+    __str__ = __repr__
+
+    def info(self) -> dict[str, DependencyInfo]:
+        """The DependencyInfo of each of the lazy dependencies, by name"""
+        return {
+            name: dependency.info for name, dependency in self._dependencies.items()
+        }
+
+
+FrozenDict.register(DependencyContainer)
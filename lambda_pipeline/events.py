@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+from collections.abc import Mapping
+from functools import cache
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from pydantic import BaseModel
+    from pydantic.fields import ModelField
+
+
+class PipelineEventError(Exception):
+    pass
+
+
+class _LazyEvent:
+    """
+    The methods of a lazily parsed event (see `lazy_event_type`). The fields of the
+    event are validated on first access and are then cached in the model's __dict__,
+    which is where pydantic keeps the fields of a model.
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def parse_lazily(cls, event: Mapping) -> BaseModel:
+        if any(alias not in event for alias in cls.__required_aliases__):
+            # Let pydantic raise the ValidationError for the missing fields
+            cls.__event_type__.parse_obj(event)
+        instance = cls.__new__(cls)
+        object.__setattr__(instance, "__dict__", {})
+        object.__setattr__(
+            instance,
+            "__fields_set__",
+            {name for name, field in cls.__fields__.items() if field.alias in event},
+        )
+        # A shallow copy, so that changes to the caller's event (after it has
+        # been parsed) don't change the fields which haven't been accessed yet
+        object.__setattr__(instance, "__raw__", dict(event))
+        return instance
+
+    def __getattr__(self, name: str) -> Any:
+        field = type(self).__fields__.get(name)
+        if field is None:
+            raise AttributeError(
+                f"{type(self).__name__!r} object has no attribute {name!r}"
+            )
+        value = self._validate_field(field=field)
+        self.__dict__[name] = value
+        return value
+
+    def _validate_field(self, field: ModelField) -> Any:
+        from pydantic import ValidationError
+
+        raw = self.__raw__
+        if field.alias not in raw:
+            return field.get_default()
+        value, errors = field.validate(
+            raw[field.alias], self.__dict__, loc=field.alias, cls=type(self)
+        )
+        if errors:
+            raise ValidationError([errors], type(self))
+        return value
+
+    def _validate_all(self):
+        """Validate the fields which haven't been accessed yet, in the order of the fields"""
+        if len(self.__dict__) == len(self.__fields__):
+            return
+        values = {name: getattr(self, name) for name in self.__fields__}
+        self.__dict__.update(values)
+        if list(self.__dict__) != list(values):
+            self.__dict__.clear()
+            self.__dict__.update(values)
+
+    def _iter(self, *args, **kwargs):
+        self._validate_all()
+        return super()._iter(*args, **kwargs)
+
+    def __iter__(self):
+        self._validate_all()
+        return super().__iter__()
+
+    def __repr_args__(self):
+        self._validate_all()
+        return super().__repr_args__()
+
+    def __reduce__(self):
+        return _unpickle_lazy_event, (
+            self.__event_type__,
+            self.__raw__,
+            dict(self.__dict__),
+        )
+
+    def _copy_and_set_values(self, values, fields_set, *, deep: bool):
+        if values is self.__dict__:
+            # e.g. by pydantic, when validating the event as an argument of a step.
+            # The event is immutable, so a shallow copy can share the same fields
+            if not deep:
+                return self
+            self._validate_all()
+        copy = super()._copy_and_set_values(values, fields_set, deep=deep)
+        object.__setattr__(copy, "__raw__", self.__raw__)
+        return copy
+
+
+@cache
+def lazy_event_type(event_type: type) -> type:
+    """
+    A subclass of the (pydantic) event type, whose instances are created with
+    `parse_lazily(event)` and validate each field on first access rather than
+    validating the whole event up front. The presence of required fields is
+    checked up front. Lazy events are immutable, and are instances of 'event_type'
+    so they can be passed to steps which expect an 'event_type'. The top level of
+    the raw event is copied when it is parsed, but (as the fields are validated on
+    first access) nested values mustn't be changed until they have been accessed.
+
+    Models with root validators or which allow extra fields aren't supported.
+    """
+    from pydantic import Extra
+
+    if (
+        event_type.__pre_root_validators__
+        or event_type.__post_root_validators__
+        or event_type.__config__.extra == Extra.allow
+    ):
+        raise PipelineEventError(
+            f"{event_type.__name__} can't be parsed lazily, since it has root "
+            "validators or allows extra fields"
+        )
+
+    class Config:
+        allow_mutation = False
+
+    return type(
+        f"Lazy{event_type.__name__}",
+        (_LazyEvent, event_type),
+        {
+            "__slots__": ("__raw__",),
+            "__event_type__": event_type,
+            "__required_aliases__": tuple(
+                field.alias
+                for field in event_type.__fields__.values()
+                if field.required
+            ),
+            "Config": Config,
+        },
+    )
+
+
+def parse_event_lazily(event_type: type, event: Mapping) -> BaseModel:
+    """
+    Parse the event as an 'event_type', validating each field of the event on first
+    access (see `lazy_event_type`), e.g. `parse_event_lazily(EventModel, event)`
+    """
+    return lazy_event_type(event_type).parse_lazily(event)
+
+
+def _unpickle_lazy_event(event_type: type, event: Mapping, values: dict) -> BaseModel:
+    instance = parse_event_lazily(event_type=event_type, event=event)
+    instance.__dict__.update(values)
+    return instance
+
+
+def get_event_type(event: BaseModel) -> type:
+    """The type of the event, or the type that a lazy event was parsed as"""
+    return getattr(type(event), "__event_type__", type(event))
@@ -0,0 +1,187 @@
+"""
+Report the import cost of modules, which for Lambda is part of the cold start.
+Each module is imported in a fresh interpreter with `-X importtime`, and the
+output is parsed into a tree of the modules that the import pulled in:
+
+    python -m lambda_pipeline.importtime [MODULE ...] [--min-ms 1] [--repeat 3]
+        [--budget-ms N] [--forbid MODULE ...]
+
+MODULE defaults to lambda_pipeline.pipeline, and can be a handler module
+(e.g. example.api.index) importable from the current directory. The exit
+status is non-zero if any module takes longer than the budget to import, or
+imports any of the forbidden modules (or their submodules).
+"""
+import argparse
+import re
+import subprocess
+import sys
+from dataclasses import dataclass, field
+from typing import Iterator, Optional
+
+DEFAULT_MODULE = "lambda_pipeline.pipeline"
+
+_MARKER = "lambda_pipeline.importtime: start"
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+
+
+class ImportBudgetError(Exception):
+    pass
+
+
+@dataclass
+class ImportNode:
+    """A module and the modules that were first imported by it (times in seconds)"""
+
+    name: str
+    self_time: float
+    cumulative_time: float
+    children: list["ImportNode"] = field(default_factory=list)
+
+    def walk(self) -> Iterator["ImportNode"]:
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+
+@dataclass
+class ImportProfile:
+    """The modules that were imported by `import <module>`"""
+
+    module: str
+    nodes: list[ImportNode]
+
+    @property
+    def total_time(self) -> float:
+        return sum(node.cumulative_time for node in self.nodes)
+
+    @property
+    def modules(self) -> set[str]:
+        return {node.name for root in self.nodes for node in root.walk()}
+
+    def imports(self, module: str) -> bool:
+        """Whether the module, or any of its submodules, was imported"""
+        return any(
+            name == module or name.startswith(f"{module}.") for name in self.modules
+        )
+
+
+def parse_importtime(output: str) -> list[ImportNode]:
+    """
+    Parse the output of `-X importtime` into trees. A module is reported after
+    the modules that it imports, which are indented by one more level.
+    """
+    pending: list[tuple[int, ImportNode]] = []
+    for line in output.splitlines():
+        match = _LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        depth = len(indent) // 2
+        node = ImportNode(
+            name=name,
+            self_time=int(self_us) / 1e6,
+            cumulative_time=int(cumulative_us) / 1e6,
+        )
+        while pending and pending[-1][0] > depth:
+            _, child = pending.pop()
+            node.children.insert(0, child)
+        pending.append((depth, node))
+    return [node for _, node in pending]
+
+
+def _profile_once(module: str) -> ImportProfile:
+    code = (
+        f"import sys; print({_MARKER!r}, file=sys.stderr, flush=True); import {module}"
+    )
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+    )
+    if process.returncode != 0:
+        raise ImportError(f"failed to import {module}:\n{process.stderr[-2000:]}")
+    _, _, output = process.stderr.partition(_MARKER)
+    return ImportProfile(module=module, nodes=parse_importtime(output))
+
+
+def profile_import(module: str, repeat: int = 3) -> ImportProfile:
+    """The fastest of 'repeat' imports of the module, each in a fresh interpreter"""
+    profiles = [_profile_once(module=module) for _ in range(repeat)]
+    return min(profiles, key=lambda profile: profile.total_time)
+
+
+def _budget_errors(
+    profile: ImportProfile, budget_ms: Optional[float], forbid: tuple[str, ...]
+) -> list[str]:
+    errors = []
+    forbidden = sorted(name for name in forbid if profile.imports(name))
+    if forbidden:
+        errors.append(f"importing {profile.module} imports {forbidden}")
+    if budget_ms is not None and profile.total_time * 1000 > budget_ms:
+        errors.append(
+            f"importing {profile.module} took {profile.total_time * 1000:.1f} ms, "
+            f"which is over the budget of {budget_ms:.1f} ms"
+        )
+    return errors
+
+
+def check_import_budget(
+    module: str,
+    budget_ms: Optional[float] = None,
+    forbid: tuple[str, ...] = (),
+    repeat: int = 3,
+) -> ImportProfile:
+    """Profile the import of the module, raising ImportBudgetError if it is over budget"""
+    profile = profile_import(module=module, repeat=repeat)
+    errors = _budget_errors(profile=profile, budget_ms=budget_ms, forbid=forbid)
+    if errors:
+        raise ImportBudgetError("\n".join(errors))
+    return profile
+
+
+def format_tree(nodes: list[ImportNode], min_ms: float = 1.0, depth: int = 0) -> str:
+    lines = []
+    for node in nodes:
+        if node.cumulative_time * 1000 < min_ms:
+            continue
+        lines.append(
+            f"{node.cumulative_time * 1000:>9.1f} ms {node.self_time * 1000:>9.1f} ms"
+            f"  {'  ' * depth}{node.name}"
+        )
+        subtree = format_tree(nodes=node.children, min_ms=min_ms, depth=depth + 1)
+        if subtree:
+            lines.append(subtree)
+    return "\n".join(lines)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m lambda_pipeline.importtime")
+    parser.add_argument("modules", nargs="*", default=[DEFAULT_MODULE])
+    parser.add_argument("--min-ms", type=float, default=1.0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--budget-ms", type=float)
+    parser.add_argument("--forbid", nargs="*", default=())
+    args = parser.parse_args(argv)
+
+    status = 0
+    for module in args.modules:
+        try:
+            profile = profile_import(module=module, repeat=args.repeat)
+        except ImportError as exc:
+            print(exc, file=sys.stderr)
+            return 2
+        print(f"{module}: {profile.total_time * 1000:.1f} ms")
+        print(f"{'cumulative':>12} {'self':>12}  module")
+        print(format_tree(nodes=profile.nodes, min_ms=args.min_ms))
+        errors = _budget_errors(
+            profile=profile, budget_ms=args.budget_ms, forbid=tuple(args.forbid)
+        )
+        for error in errors:
+            print(error)
+            status = 1
+        print()
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
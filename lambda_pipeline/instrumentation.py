@@ -0,0 +1,395 @@
+import json
+import logging
+import sys
+import time
+import tracemalloc
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from functools import wraps
+from inspect import iscoroutinefunction, unwrap
+from types import FunctionType
+from typing import Optional, TextIO
+
+from lambda_pipeline.types import PipelineResult
+
+_CURRENT_REPORT: ContextVar[Optional["InvocationReport"]] = ContextVar(
+    "lambda_pipeline_report", default=None
+)
+_CURRENT_RECORD: ContextVar[Optional["StepRecord"]] = ContextVar(
+    "lambda_pipeline_step_record", default=None
+)
+_CURRENT_INSTRUMENTATION: ContextVar[Optional["Instrumentation"]] = ContextVar(
+    "lambda_pipeline_instrumentation", default=None
+)
+
+
+@dataclass
+class StepRecord:
+    """
+    Timings (in seconds) for a single step. 'wall_time' includes the framework's
+    step decorators, whereas 'user_time' and 'cpu_time' only cover the step itself.
+    'ended_pipeline' is set if the step returned `PipelineResult.done(...)`.
+    """
+
+    name: str
+    wall_time: float = 0.0
+    user_time: float = 0.0
+    cpu_time: float = 0.0
+    memory_delta: Optional[int] = None
+    memory_peak: Optional[int] = None
+    error: Optional[str] = None
+    ended_pipeline: bool = False
+
+    @property
+    def framework_time(self) -> float:
+        return self.wall_time - self.user_time
+
+    def to_dict(self) -> dict:
+        return dict(asdict(self), framework_time=self.framework_time)
+
+
+@dataclass
+class InvocationReport:
+    """Timings (in seconds) for a single invocation of a pipeline"""
+
+    steps: list[StepRecord] = field(default_factory=list)
+    wall_time: float = 0.0
+    cpu_time: float = 0.0
+    error: Optional[str] = None
+
+    @property
+    def user_time(self) -> float:
+        return sum(record.user_time for record in self.steps)
+
+    @property
+    def framework_time(self) -> float:
+        return sum(record.framework_time for record in self.steps)
+
+    @property
+    def ended_by(self) -> Optional[str]:
+        """The name of the step which ended the pipeline early, if any"""
+        for record in reversed(self.steps):
+            if record.ended_pipeline:
+                return record.name
+        return None
+
+    def to_dict(self) -> dict:
+        return {
+            "steps": [record.to_dict() for record in self.steps],
+            "wall_time": self.wall_time,
+            "cpu_time": self.cpu_time,
+            "user_time": self.user_time,
+            "framework_time": self.framework_time,
+            "ended_by": self.ended_by,
+            "error": self.error,
+        }
+
+
+@dataclass
+class CircuitStateChange:
+    """A change in the state of a CircuitBreaker (see lambda_pipeline.circuit_breaker)"""
+
+    circuit: str
+    old_state: str
+    new_state: str
+    failure_rate: Optional[float]
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+class PipelineObserver:
+    """Base class for observers of pipeline invocations, all hooks are no-ops"""
+
+    def before_step(self, name: str, report: InvocationReport):
+        pass
+
+    def after_step(self, record: StepRecord, report: InvocationReport):
+        pass
+
+    def after_pipeline(self, report: InvocationReport):
+        pass
+
+    def on_circuit_state_change(self, change: CircuitStateChange):
+        pass
+
+
+class LoggingObserver(PipelineObserver):
+    """Log the report of each invocation as JSON"""
+
+    def __init__(self, logger: logging.Logger, level: int = logging.INFO):
+        self.logger = logger
+        self.level = level
+
+    def after_pipeline(self, report: InvocationReport):
+        self.logger.log(self.level, "pipeline report: %s", json.dumps(report.to_dict()))
+
+    def on_circuit_state_change(self, change: CircuitStateChange):
+        level = logging.WARNING if change.new_state == "open" else self.level
+        self.logger.log(level, "circuit state change: %s", json.dumps(change.to_dict()))
+
+
+class EmbeddedMetricsObserver(PipelineObserver):
+    """
+    Print the report of each invocation to 'stream' (stdout by default) in the
+    CloudWatch Embedded Metric Format: one line per step, with dimensions
+    (Pipeline, Step), and one line for the whole invocation, with dimension (Pipeline).
+    A change in the state of a circuit breaker is one line, with dimensions
+    (Pipeline, Circuit, State).
+    """
+
+    def __init__(
+        self,
+        pipeline: str,
+        namespace: str = "LambdaPipeline",
+        stream: Optional[TextIO] = None,
+    ):
+        self.pipeline = pipeline
+        self.namespace = namespace
+        self.stream = stream
+
+    def _emit(self, dimensions: dict, metrics: dict, units: dict):
+        document = {
+            "_aws": {
+                "Timestamp": int(time.time() * 1000),
+                "CloudWatchMetrics": [
+                    {
+                        "Namespace": self.namespace,
+                        "Dimensions": [list(dimensions)],
+                        "Metrics": [
+                            {"Name": name, "Unit": units[name]} for name in metrics
+                        ],
+                    }
+                ],
+            },
+            **dimensions,
+            **metrics,
+        }
+        print(json.dumps(document), file=self.stream or sys.stdout)
+
+    def after_pipeline(self, report: InvocationReport):
+        for record in report.steps:
+            metrics = {
+                "StepWallTime": record.wall_time * 1000,
+                "StepUserTime": record.user_time * 1000,
+                "StepCpuTime": record.cpu_time * 1000,
+                "StepFrameworkTime": record.framework_time * 1000,
+            }
+            units = dict.fromkeys(metrics, "Milliseconds")
+            if record.memory_delta is not None:
+                metrics["StepMemoryDelta"] = record.memory_delta
+                metrics["StepMemoryPeak"] = record.memory_peak
+                units.update(StepMemoryDelta="Bytes", StepMemoryPeak="Bytes")
+            self._emit(
+                dimensions={"Pipeline": self.pipeline, "Step": record.name},
+                metrics=metrics,
+                units=units,
+            )
+
+        metrics = {
+            "PipelineWallTime": report.wall_time * 1000,
+            "PipelineCpuTime": report.cpu_time * 1000,
+            "PipelineUserTime": report.user_time * 1000,
+            "PipelineFrameworkTime": report.framework_time * 1000,
+        }
+        self._emit(
+            dimensions={"Pipeline": self.pipeline},
+            metrics=metrics,
+            units=dict.fromkeys(metrics, "Milliseconds"),
+        )
+
+    def on_circuit_state_change(self, change: CircuitStateChange):
+        self._emit(
+            dimensions={
+                "Pipeline": self.pipeline,
+                "Circuit": change.circuit,
+                "State": change.new_state,
+            },
+            metrics={"CircuitStateChange": 1},
+            units={"CircuitStateChange": "Count"},
+        )
+
+
+def current_instrumentation() -> Optional["Instrumentation"]:
+    """The Instrumentation of the pipeline being invoked (in this context), if any"""
+    return _CURRENT_INSTRUMENTATION.get()
+
+
+def _ends_pipeline(result) -> bool:
+    """Whether a step (or a batch step, for any of its records) ended the pipeline"""
+    if type(result) is list:
+        return any(type(item) is PipelineResult for item in result)
+    return type(result) is PipelineResult
+
+
+def _is_async(step: FunctionType) -> bool:
+    return iscoroutinefunction(unwrap(step))
+
+
+class Instrumentation:
+    """
+    Records a StepRecord for each step of each invocation of a pipeline, and
+    an InvocationReport for the invocation, which are passed to the observers.
+    The step is timed twice: once outside of the framework's step decorators
+    (time_step) and once around the step itself (time_user_step), so that the
+    framework's overhead can be reported separately. While a pipeline is invoked,
+    it is also the current instrumentation (see `current_instrumentation`), to
+    which circuit breakers report their state changes.
+    """
+
+    def __init__(self, observers: list[PipelineObserver], trace_memory: bool = False):
+        self.observers = tuple(observers)
+        self.trace_memory = trace_memory
+
+    def _start_step(self, name: str) -> tuple[Optional[InvocationReport], object]:
+        report = _CURRENT_REPORT.get()
+        if report is None:
+            return None, None
+        for observer in self.observers:
+            observer.before_step(name=name, report=report)
+        record = StepRecord(name=name)
+        return report, _CURRENT_RECORD.set(record)
+
+    def _finish_step(self, report, token, started, error=None, result=None):
+        record = _CURRENT_RECORD.get()
+        _CURRENT_RECORD.reset(token)
+        record.wall_time = time.perf_counter() - started
+        record.error = error
+        record.ended_pipeline = _ends_pipeline(result)
+        report.steps.append(record)
+        for observer in self.observers:
+            observer.after_step(record=record, report=report)
+
+    def time_step(self, step: FunctionType) -> FunctionType:
+        if _is_async(step):
+
+            @wraps(step)
+            async def async_wrapper(*args, **kwargs):
+                report, token = self._start_step(name=step.__name__)
+                if report is None:
+                    return await step(*args, **kwargs)
+                started, error, result = time.perf_counter(), None, None
+                try:
+                    result = await step(*args, **kwargs)
+                    return result
+                except Exception as exc:
+                    error = type(exc).__name__
+                    raise
+                finally:
+                    self._finish_step(report, token, started, error, result)
+
+            return async_wrapper
+
+        @wraps(step)
+        def wrapper(*args, **kwargs):
+            report, token = self._start_step(name=step.__name__)
+            if report is None:
+                return step(*args, **kwargs)
+            started, error, result = time.perf_counter(), None, None
+            try:
+                result = step(*args, **kwargs)
+                return result
+            except Exception as exc:
+                error = type(exc).__name__
+                raise
+            finally:
+                self._finish_step(report, token, started, error, result)
+
+        return wrapper
+
+    def _start_user_step(self):
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            memory = tracemalloc.get_traced_memory()[0]
+        else:
+            memory = None
+        return memory, time.thread_time(), time.perf_counter()
+
+    def _finish_user_step(self, record, memory, cpu_started, started):
+        record.user_time = time.perf_counter() - started
+        record.cpu_time = time.thread_time() - cpu_started
+        if memory is not None:
+            current, peak = tracemalloc.get_traced_memory()
+            record.memory_delta = current - memory
+            record.memory_peak = peak - memory
+
+    def time_user_step(self, step: FunctionType) -> FunctionType:
+        if _is_async(step):
+
+            @wraps(step)
+            async def async_wrapper(*args, **kwargs):
+                record = _CURRENT_RECORD.get()
+                if record is None:
+                    return await step(*args, **kwargs)
+                started = self._start_user_step()
+                try:
+                    return await step(*args, **kwargs)
+                finally:
+                    self._finish_user_step(record, *started)
+
+            return async_wrapper
+
+        @wraps(step)
+        def wrapper(*args, **kwargs):
+            record = _CURRENT_RECORD.get()
+            if record is None:
+                return step(*args, **kwargs)
+            started = self._start_user_step()
+            try:
+                return step(*args, **kwargs)
+            finally:
+                self._finish_user_step(record, *started)
+
+        return wrapper
+
+    def _start_pipeline(self) -> tuple[InvocationReport, object]:
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        report = InvocationReport()
+        tokens = _CURRENT_REPORT.set(report), _CURRENT_INSTRUMENTATION.set(self)
+        return report, tokens
+
+    def _finish_pipeline(self, report, tokens, started, cpu_started, error=None):
+        report.wall_time = time.perf_counter() - started
+        report.cpu_time = time.process_time() - cpu_started
+        report.error = error
+        report_token, instrumentation_token = tokens
+        _CURRENT_REPORT.reset(report_token)
+        _CURRENT_INSTRUMENTATION.reset(instrumentation_token)
+        for observer in self.observers:
+            observer.after_pipeline(report=report)
+
+    def on_circuit_state_change(self, change: CircuitStateChange):
+        for observer in self.observers:
+            observer.on_circuit_state_change(change)
+
+    def wrap_pipeline(self, pipeline: FunctionType) -> FunctionType:
+        if iscoroutinefunction(pipeline):
+
+            async def async_instrumented_pipeline(data):
+                report, tokens = self._start_pipeline()
+                started, cpu_started = time.perf_counter(), time.process_time()
+                error = None
+                try:
+                    return await pipeline(data=data)
+                except Exception as exc:
+                    error = type(exc).__name__
+                    raise
+                finally:
+                    self._finish_pipeline(report, tokens, started, cpu_started, error)
+
+            return async_instrumented_pipeline
+
+        def instrumented_pipeline(data):
+            report, tokens = self._start_pipeline()
+            started, cpu_started = time.perf_counter(), time.process_time()
+            error = None
+            try:
+                return pipeline(data=data)
+            except Exception as exc:
+                error = type(exc).__name__
+                raise
+            finally:
+                self._finish_pipeline(report, tokens, started, cpu_started, error)
+
+        return instrumented_pipeline
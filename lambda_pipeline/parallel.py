@@ -0,0 +1,185 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from types import FunctionType
+from typing import Literal, Optional
+
+from lambda_pipeline.types import PipelineData, PipelineResult
+
+Conflict = Literal["error", "first", "last"]
+
+_EXECUTOR: Optional[ThreadPoolExecutor] = None
+_WORKER = threading.local()
+
+
+class PipelineMergeConflictError(Exception):
+    pass
+
+
+class ParallelGroup:
+    """
+    A group of independent steps, which are given the same input data and are run
+    concurrently. The data that they return is merged: keys added or changed by
+    any step are set, and keys removed by any step are removed. If more than one step
+    sets the same key to different values then `conflict` decides the outcome:
+
+    conflict="error": raise PipelineMergeConflictError
+    conflict="first": the step listed first wins
+    conflict="last": the step listed last wins
+
+    A key which one step sets and another removes is also a conflict.
+
+    If any steps raise then the exception from the step listed first is raised,
+    which is the exception that would have been raised if the steps were run in order.
+    If any steps return `PipelineResult.done(...)` then the merged data ends the
+    pipeline.
+
+    A group which is nested in another group (i.e. run on the thread pool) runs
+    its steps in turn, in the pool's thread, rather than waiting on the pool.
+    """
+
+    def __init__(self, steps: list[FunctionType], conflict: Conflict = "error"):
+        if not steps:
+            raise ValueError("a parallel group must have at least one step")
+        if conflict not in Conflict.__args__:
+            raise ValueError(f"conflict must be one of {Conflict.__args__}")
+        self.steps = tuple(steps)
+        self.conflict = conflict
+        self.__name__ = f"parallel({', '.join(step.__name__ for step in steps)})"
+
+    def __repr__(self):
+        return self.__name__
+
+
+def parallel(*steps: FunctionType, conflict: Conflict = "error") -> ParallelGroup:
+    return ParallelGroup(steps=steps, conflict=conflict)
+
+
+def _mark_worker():
+    _WORKER.is_worker = True
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _EXECUTOR
+    if _EXECUTOR is None:
+        _EXECUTOR = ThreadPoolExecutor(
+            thread_name_prefix="lambda_pipeline", initializer=_mark_worker
+        )
+    return _EXECUTOR
+
+
+def _is_worker() -> bool:
+    """Whether this thread is one of the pool's, which mustn't wait on the pool"""
+    return getattr(_WORKER, "is_worker", False)
+
+
+def _current_wins(key: str, conflict: Conflict, action: str) -> bool:
+    """Whether the current step wins a conflict over the key with an earlier step"""
+    if conflict == "error":
+        raise PipelineMergeConflictError(f"steps run in parallel {action} '{key}'")
+    return conflict == "last"
+
+
+def merge_results(
+    data: PipelineData, results: list[PipelineData], conflict: Conflict = "error"
+) -> PipelineData:
+    changes = {}
+    removed = set()
+    for result in results:
+        if result is data:
+            continue
+        for key in data:
+            if key in result or key in removed:
+                continue
+            if key in changes and not _current_wins(key, conflict, "set and removed"):
+                continue
+            changes.pop(key, None)
+            removed.add(key)
+        for key, value in result.items():
+            if key in data and data[key] is value:
+                continue
+            if key in removed:
+                if not _current_wins(key, conflict, "set and removed"):
+                    continue
+                removed.discard(key)
+            elif key in changes and changes[key] != value:
+                if not _current_wins(key, conflict, "set different values for"):
+                    continue
+            changes[key] = value
+
+    if not removed:
+        return data.update(changes)
+    return PipelineData(
+        {key: value for key, value in data.items() if key not in removed}, **changes
+    )
+
+
+def _raise_first_exception(outcomes: list):
+    for outcome in outcomes:
+        if isinstance(outcome, BaseException):
+            raise outcome
+
+
+def _merge_outcomes(
+    data: PipelineData, outcomes: list, conflict: Conflict
+) -> PipelineData:
+    _raise_first_exception(outcomes)
+    if not any(type(outcome) is PipelineResult for outcome in outcomes):
+        return merge_results(data=data, results=outcomes, conflict=conflict)
+    results = [
+        outcome.data if type(outcome) is PipelineResult else outcome
+        for outcome in outcomes
+    ]
+    return PipelineResult.done(
+        merge_results(data=data, results=results, conflict=conflict)
+    )
+
+
+def make_parallel_step(group: ParallelGroup, steps: list[FunctionType]) -> FunctionType:
+    """
+    Run (decorated) steps on a thread pool, the first step is run in the calling
+    thread. In one of the pool's threads (i.e. in a nested group) the steps are run
+    in turn, since waiting on the pool from the pool can deadlock once it is full.
+    """
+    first_step, *other_steps = steps
+
+    def _run(step, kwargs):
+        try:
+            return step(**kwargs)
+        except Exception as exc:
+            return exc
+
+    def parallel_step(data: PipelineData, **kwargs) -> PipelineData:
+        kwargs["data"] = data
+        if _is_worker():
+            outcomes = [_run(step, kwargs) for step in steps]
+            return _merge_outcomes(
+                data=data, outcomes=outcomes, conflict=group.conflict
+            )
+        executor = _get_executor()
+        futures = [
+            executor.submit(copy_context().run, _run, step, kwargs)
+            for step in other_steps
+        ]
+        outcomes = [_run(first_step, kwargs)]
+        outcomes.extend(future.result() for future in futures)
+        return _merge_outcomes(data=data, outcomes=outcomes, conflict=group.conflict)
+
+    parallel_step.__name__ = group.__name__
+    return parallel_step
+
+
+def make_async_parallel_step(
+    group: ParallelGroup, steps: list[FunctionType]
+) -> FunctionType:
+    """Run (decorated, coroutine) steps concurrently on the running event loop"""
+    import asyncio
+
+    async def parallel_step(data: PipelineData, **kwargs) -> PipelineData:
+        outcomes = await asyncio.gather(
+            *(step(data=data, **kwargs) for step in steps), return_exceptions=True
+        )
+        return _merge_outcomes(data=data, outcomes=outcomes, conflict=group.conflict)
+
+    parallel_step.__name__ = group.__name__
+    return parallel_step
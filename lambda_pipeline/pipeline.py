@@ -1,35 +1,102 @@
-from functools import reduce
+from __future__ import annotations
+
+from collections.abc import Mapping
 from logging import Logger
 from types import FunctionType
-from typing import Any
-
-
-from pydantic import BaseModel
+from typing import TYPE_CHECKING, Any, Literal, Optional, Union
 
+from lambda_pipeline.cache import CacheInfo, is_cached_step
+from lambda_pipeline.deadlines import enforce_deadline
+from lambda_pipeline.events import get_event_type
+from lambda_pipeline.instrumentation import (
+    Instrumentation,
+    LoggingObserver,
+    PipelineObserver,
+)
+from lambda_pipeline.parallel import ParallelGroup, make_parallel_step
+from lambda_pipeline.schema import check_schemas
 from lambda_pipeline.step_decorators import (
+    PipelineArgumentError,
+    check_arguments,
     do_not_persist_changes_to_context,
     enforce_step_signature,
     validate_arguments,
     validate_output,
 )
-from lambda_pipeline.types import FrozenDict, PipelineData, LambdaContext
+from lambda_pipeline import types
+from lambda_pipeline.types import FrozenDict, PipelineData, PipelineResult
+
+if TYPE_CHECKING:
+    from pydantic import BaseModel
+
+    from lambda_pipeline.types import LambdaContext
+
+Validation = Literal["full", "boundary", "off"]
+Step = Union[FunctionType, ParallelGroup]
 
 
 def _make_template_step(event_type: type) -> FunctionType:
     """A factory method for creating the template for steps"""
 
-    def _TEMPLATE_STEP(
-        data: PipelineData,
-        event: event_type,
-        context: LambdaContext,
-        dependencies: FrozenDict[str, Any],
-        logger: Logger,
-    ) -> PipelineData:
+    def _TEMPLATE_STEP(data, event, context, dependencies, logger):
         raise NotImplementedError
 
+    # Set explicitly (rather than annotated) since annotations are postponed in
+    # this module, and so that LambdaContext is only resolved on compilation
+    _TEMPLATE_STEP.__annotations__ = {
+        "data": PipelineData,
+        "event": event_type,
+        "context": types.LambdaContext,
+        "dependencies": FrozenDict[str, Any],
+        "logger": Logger,
+        "return": PipelineData,
+    }
     return _TEMPLATE_STEP
 
 
+def _make_step_decorators(
+    template_step: FunctionType,
+    validation: Validation = "full",
+    instrumentation: Optional[Instrumentation] = None,
+    output_validator: FunctionType = validate_output,
+    deadline_margin_ms: Optional[float] = None,
+) -> list[FunctionType]:
+    """
+    validation="full": validate the arguments and output of every step, including the
+        required keys of its output schema
+    validation="boundary": check the type of the output of every step, arguments are
+        checked on entry to the pipeline and output schemas on compilation
+    validation="off": only enforce the step signature
+
+    If 'deadline_margin_ms' is set then every step is checked against the deadline
+    (see `enforce_deadline`) before it is validated.
+    """
+    step_decorators = [
+        lambda step: enforce_step_signature(step=step, template_step=template_step),
+    ]
+    if deadline_margin_ms is not None:
+        step_decorators.insert(
+            0, lambda step: enforce_deadline(step=step, margin_ms=deadline_margin_ms)
+        )
+    if instrumentation:
+        step_decorators.insert(0, instrumentation.time_step)
+    if validation == "full":
+        step_decorators.append(validate_arguments)
+    if validation != "off":
+        check_required_keys = validation == "full"
+        step_decorators.append(
+            lambda step: output_validator(
+                step=step,
+                template_step=template_step,
+                check_required_keys=check_required_keys,
+            )
+        )
+    step_decorators.append(do_not_persist_changes_to_context)
+    if instrumentation:
+        step_decorators.append(instrumentation.time_user_step)
+    return step_decorators
+
+
 def _decorate_step(step: FunctionType, decorators: list[FunctionType]) -> FunctionType:
     for deco in reversed(decorators):
         step = deco(step)
@@ -42,52 +109,279 @@ def _chain_steps(
     context: LambdaContext,
     dependencies: FrozenDict[str, Any],
     logger: Logger,
+    keep_result: bool = False,
 ) -> FunctionType:
-    return lambda data: reduce(
-        lambda _data, step: step(
-            data=_data,
+    """
+    Call the steps in turn, each with the output of the last. A step which returns
+    `PipelineResult.done(data)` ends the pipeline: the remaining steps are skipped
+    and the data is returned (or the PipelineResult itself, with 'keep_result')
+    """
+
+    def pipeline(data: PipelineData) -> PipelineData:
+        for step in steps:
+            data = step(
+                data=data,
+                event=event,
+                context=context,
+                dependencies=dependencies,
+                logger=logger,
+            )
+            if type(data) is PipelineResult:
+                return data if keep_result else data.data
+        return data
+
+    return pipeline
+
+
+def _flatten_steps(steps: list[Step]) -> list[FunctionType]:
+    """The steps, with the steps of parallel groups in place of the groups"""
+    flat_steps = []
+    for step in steps:
+        if isinstance(step, ParallelGroup):
+            flat_steps.extend(_flatten_steps(steps=step.steps))
+        else:
+            flat_steps.append(step)
+    return flat_steps
+
+
+class CompiledPipeline:
+    """
+    A pipeline whose steps have been checked and decorated up front, so that
+    binding it to an invocation's event, context, dependencies and logger is cheap.
+    Build one at module level (i.e. during the cold start) with `compile_pipeline`.
+
+    If any 'observers' are given then each invocation is instrumented, and the
+    observers are given a per-step and per-invocation report of timings (and
+    memory allocations, if 'trace_memory' is set).
+
+    Steps annotated with `PipelineData[Schema]` (where Schema is a TypedDict) are
+    checked on compilation: every required key of a step's input schema must be a
+    required key of the output schema of an earlier step, or be one of the
+    'initial_keys' (which the data passed to the pipeline must contain), otherwise
+    PipelineSchemaError is raised.
+
+    If 'deadline_margin_ms' is set then the pipeline has a deadline of that many
+    milliseconds before the Lambda times out (according to the context), and
+    raises PipelineTimeoutError rather than starting a step after the deadline, or
+    a step whose budget (see `budget`) exceeds the time remaining. Optional steps
+    are skipped instead.
+
+    A step can end the pipeline early by returning `PipelineResult.done(data)`, in
+    which case the remaining steps are skipped and the pipeline returns the data.
+
+    Pipelines compiled with the same options can share a 'step_cache' (a dict), so
+    that a step which is listed in more than one of them (e.g. a common `authorise`
+    step) is only decorated once (see `Router`). The steps of instrumented pipelines
+    aren't shared, since they report to the pipeline's own observers.
+    """
+
+    _make_parallel_step = staticmethod(make_parallel_step)
+
+    def __init__(
+        self,
+        steps: list[Step],
+        event_type: type,
+        validation: Validation = "full",
+        initial_keys: tuple[str, ...] = (),
+        observers: tuple[PipelineObserver, ...] = (),
+        trace_memory: bool = False,
+        deadline_margin_ms: Optional[float] = None,
+        step_cache: Optional[dict] = None,
+    ):
+        self.event_type = event_type
+        self.validation = validation
+        self.initial_keys = frozenset(initial_keys)
+        self.deadline_margin_ms = deadline_margin_ms
+        self.instrumentation = (
+            Instrumentation(observers=observers, trace_memory=trace_memory)
+            if observers
+            else None
+        )
+        self.template_step = _make_template_step(event_type=event_type)
+        step_decorators = _make_step_decorators(
+            template_step=self.template_step,
+            validation=validation,
+            instrumentation=self.instrumentation,
+            deadline_margin_ms=deadline_margin_ms,
+        )
+        self.steps = tuple(
+            self._compile_cached_step(
+                step=step, step_decorators=step_decorators, step_cache=step_cache
+            )
+            for step in steps
+        )
+        self._check_schemas(steps=steps)
+        self.cached_steps = {
+            step.__name__: step
+            for step in _flatten_steps(steps=steps)
+            if is_cached_step(step)
+        }
+
+    def _compile_cached_step(
+        self,
+        step: Step,
+        step_decorators: list[FunctionType],
+        step_cache: Optional[dict],
+    ) -> FunctionType:
+        if step_cache is None or self.instrumentation is not None:
+            return self._compile_step(step=step, step_decorators=step_decorators)
+        key = (
+            type(self),
+            self.event_type,
+            self.validation,
+            self.deadline_margin_ms,
+            step,
+        )
+        compiled_step = step_cache.get(key)
+        if compiled_step is None:
+            compiled_step = step_cache[key] = self._compile_step(
+                step=step, step_decorators=step_decorators
+            )
+        return compiled_step
+
+    def _compile_step(
+        self, step: Step, step_decorators: list[FunctionType]
+    ) -> FunctionType:
+        if isinstance(step, ParallelGroup):
+            return self._compile_parallel_group(
+                group=step, step_decorators=step_decorators
+            )
+        return _decorate_step(step=step, decorators=step_decorators)
+
+    def _compile_parallel_group(
+        self, group: ParallelGroup, step_decorators: list[FunctionType]
+    ) -> FunctionType:
+        steps = [
+            self._compile_step(step=step, step_decorators=step_decorators)
+            for step in group.steps
+        ]
+        return self._make_parallel_step(group=group, steps=steps)
+
+    def cache_info(self) -> dict[str, CacheInfo]:
+        """The CacheInfo of each of the steps decorated with cached_step, by name"""
+        return {name: step.cache_info() for name, step in self.cached_steps.items()}
+
+    def _check_schemas(self, steps: list[Step]):
+        check_schemas(steps=steps, initial_keys=self.initial_keys)
+
+    def _check_data(self, data: PipelineData):
+        if self.validation == "off":
+            return
+        check_arguments(template_step=self.template_step, data=data)
+        if self.initial_keys:
+            missing_keys = sorted(self.initial_keys.difference(data))
+            if missing_keys:
+                raise PipelineArgumentError(
+                    f"argument 'data': missing initial keys {missing_keys}"
+                )
+
+    def _chain(
+        self,
+        event: BaseModel,
+        context: LambdaContext,
+        dependencies: FrozenDict[str, Any],
+        logger: Logger,
+    ) -> FunctionType:
+        pipeline = _chain_steps(
+            steps=self.steps,
             event=event,
             context=context,
             dependencies=dependencies,
             logger=logger,
-        ),
-        steps,
-        data,
+        )
+        if self.validation == "off":
+            return pipeline
+
+        def checked_pipeline(data: PipelineData) -> PipelineData:
+            self._check_data(data=data)
+            return pipeline(data=data)
+
+        return checked_pipeline
+
+    def bind(
+        self,
+        event: BaseModel,
+        context: LambdaContext,
+        dependencies: FrozenDict[str, Any],
+        logger: Logger,
+    ) -> FunctionType:
+        if isinstance(dependencies, Mapping) and not isinstance(
+            dependencies, FrozenDict
+        ):
+            dependencies = FrozenDict(dependencies)
+
+        if self.validation != "off":
+            check_arguments(
+                template_step=self.template_step,
+                event=event,
+                context=context,
+                dependencies=dependencies,
+                logger=logger,
+            )
+
+        event.__config__.allow_mutation = False
+        pipeline = self._chain(
+            event=event, context=context, dependencies=dependencies, logger=logger
+        )
+        if self.instrumentation:
+            return self.instrumentation.wrap_pipeline(pipeline=pipeline)
+        return pipeline
+
+
+@validate_arguments
+def compile_pipeline(
+    steps: list[Step],
+    event_type: type,
+    validation: Validation = "full",
+    initial_keys: tuple[str, ...] = (),
+    observers: tuple[PipelineObserver, ...] = (),
+    trace_memory: bool = False,
+    deadline_margin_ms: Optional[float] = None,
+) -> CompiledPipeline:
+    return CompiledPipeline(
+        steps=steps,
+        event_type=event_type,
+        validation=validation,
+        initial_keys=initial_keys,
+        observers=observers,
+        trace_memory=trace_memory,
+        deadline_margin_ms=deadline_margin_ms,
     )
 
 
 @validate_arguments
 def make_pipeline(
-    steps: list[FunctionType],
+    steps: list[Step],
     event: BaseModel,
     context: LambdaContext,
     dependencies: FrozenDict[str, Any],
     logger: Logger,
     verbose=False,
+    validation: Validation = "full",
 ) -> FunctionType:
+    """
+    Decorate and chain the steps for a single invocation. The steps are only
+    decorated when the pipeline is called, and are decorated again on every call
+    to make_pipeline, so prefer compile_pipeline in handlers. The event can be
+    parsed lazily with `parse_event_lazily` from lambda_pipeline.events.
+    """
 
-    event.__config__.allow_mutation = False
-    dependencies = FrozenDict(dependencies)
+    def pipeline(data: PipelineData) -> PipelineData:
+        compiled_pipeline = CompiledPipeline(
+            steps=steps,
+            event_type=get_event_type(event),
+            validation=validation,
+            observers=[LoggingObserver(logger=logger)] if verbose else (),
+        )
+        _pipeline = compiled_pipeline.bind(
+            event=event, context=context, dependencies=dependencies, logger=logger
+        )
+        return _pipeline(data=data)
 
-    template_step = _make_template_step(event_type=type(event))
-    step_decorators = [
-        lambda step: enforce_step_signature(step=step, template_step=template_step),
-        validate_arguments,
-        lambda step: validate_output(step=step, template_step=template_step),
-        lambda step: do_not_persist_changes_to_context(
-            step=step, initial_context=context
-        ),
-    ]
+    return pipeline
 
-    decorated_steps = map(
-        lambda step: _decorate_step(step=step, decorators=step_decorators),
-        steps,
-    )
 
-    return _chain_steps(
-        steps=decorated_steps,
-        event=event,
-        context=context,
-        dependencies=dependencies,
-        logger=logger,
-    )
+def __getattr__(name: str):
+    if name == "LambdaContext":
+        return types.LambdaContext
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,184 @@
+import json
+from collections.abc import Iterator, Mapping
+from functools import cache
+from typing import Any, Callable, Optional
+
+from lambda_pipeline.types import FrozenDict, FrozenList, FrozenSet, Stream
+
+Serializer = Callable[[Any], str]
+
+SERIALIZERS = ("json", "orjson")
+DEFAULT_HEADERS = {"Content-Type": "application/json"}
+CHUNK_SIZE = 64 * 1024
+ARRAY_BATCH_SIZE = 32
+# Separates the JSON prelude (status code and headers) of a streamed response from its body
+STREAMING_PRELUDE_DELIMITER = b"\x00" * 8
+
+
+def _default(value: Any) -> Any:
+    """Serialise frozen values as they are, rather than thawing (i.e. copying) them first"""
+    if isinstance(value, FrozenDict):
+        return value._d
+    if isinstance(value, (FrozenList, FrozenSet, set, frozenset, Stream)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def json_serializer(value: Any) -> str:
+    return json.dumps(value, default=_default)
+
+
+def _make_orjson_serializer() -> Serializer:
+    import orjson
+
+    def orjson_serializer(value: Any) -> str:
+        return orjson.dumps(
+            value, default=_default, option=orjson.OPT_NON_STR_KEYS
+        ).decode()
+
+    return orjson_serializer
+
+
+@cache
+def get_serializer(name: Optional[str] = None) -> Serializer:
+    """
+    A function which serialises a value (including PipelineData and the other
+    frozen types) to a JSON string: 'json' (the standard library) or 'orjson'.
+    By default this is orjson if it is installed, and json otherwise.
+    """
+    if name not in (None, *SERIALIZERS):
+        raise ValueError(f"serializer must be one of {SERIALIZERS}, not {name!r}")
+    if name == "json":
+        return json_serializer
+    try:
+        return _make_orjson_serializer()
+    except ModuleNotFoundError:
+        if name == "orjson":
+            raise
+        return json_serializer
+
+
+def render_response(
+    body: Any,
+    status_code: int = 200,
+    headers: Optional[Mapping[str, str]] = None,
+    serializer: Optional[Serializer] = None,
+) -> dict:
+    """
+    An API Gateway (Lambda proxy integration) response, with the body serialised to
+    JSON (unless it is already a string), e.g. `render_response(body=data["body"])`.
+    The body is serialised directly from the PipelineData (or FrozenDict, etc.), so
+    there is no need to call `to_dict` or `thaw` on it first.
+    """
+    if not isinstance(body, str):
+        body = (serializer or get_serializer())(body)
+    return {
+        "statusCode": status_code,
+        "headers": dict(DEFAULT_HEADERS if headers is None else headers),
+        "body": body,
+        "isBase64Encoded": False,
+    }
+
+
+# Types which are never streamed, checked before the (slower) isinstance checks
+_NON_STREAMING_TYPES = frozenset(
+    (str, int, float, bool, type(None), list, tuple, FrozenList, FrozenSet)
+)
+
+
+def _is_streaming(value: Any) -> bool:
+    if type(value) in _NON_STREAMING_TYPES:
+        return False
+    if isinstance(value, (dict, FrozenDict, Mapping)):
+        return any(map(_is_streaming, value.values()))
+    return isinstance(value, (Stream, Iterator))
+
+
+def _iter_json_array(items: Iterator, serializer: Serializer) -> Iterator[str]:
+    """
+    Serialise the items as a JSON array, serialising up to ARRAY_BATCH_SIZE items
+    at a time (rather than calling the serializer for each item)
+    """
+    yield "["
+    separator, batch = "", []
+    for item in items:
+        if not _is_streaming(item):
+            batch.append(item)
+            if len(batch) < ARRAY_BATCH_SIZE:
+                continue
+            yield separator + serializer(batch)[1:-1]
+        else:
+            if batch:
+                yield separator + serializer(batch)[1:-1]
+                separator = ","
+            yield separator
+            yield from iter_json(item, serializer=serializer)
+        separator, batch = ",", []
+    if batch:
+        yield separator + serializer(batch)[1:-1]
+    yield "]"
+
+
+def iter_json(value: Any, serializer: Optional[Serializer] = None) -> Iterator[str]:
+    """
+    Serialise the value to JSON piece by piece: Streams (and other iterators) are
+    serialised as arrays, one item at a time, and so are consumed. Streams can be the
+    value itself, or values of (nested) mappings. Anything else is serialised whole.
+    """
+    serializer = serializer or get_serializer()
+    if isinstance(value, (Stream, Iterator)):
+        yield from _iter_json_array(items=value, serializer=serializer)
+    elif isinstance(value, Mapping) and _is_streaming(value):
+        yield "{"
+        for i, (key, item) in enumerate(value.items()):
+            yield f"{',' if i else ''}{serializer(str(key))}:"
+            yield from iter_json(item, serializer=serializer)
+        yield "}"
+    else:
+        yield serializer(value)
+
+
+def stream_body(
+    body: Any,
+    serializer: Optional[Serializer] = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> Iterator[bytes]:
+    """
+    The body serialised to JSON (see `iter_json`) as chunks of at least 'chunk_size'
+    bytes (apart from the last), without building the whole body
+    """
+    if isinstance(body, str):
+        yield body.encode()
+        return
+
+    chunk, size = [], 0
+    for part in iter_json(body, serializer=serializer):
+        part = part.encode()
+        chunk.append(part)
+        size += len(part)
+        if size >= chunk_size:
+            yield b"".join(chunk)
+            chunk, size = [], 0
+    if chunk:
+        yield b"".join(chunk)
+
+
+def stream_response(
+    body: Any,
+    status_code: int = 200,
+    headers: Optional[Mapping[str, str]] = None,
+    serializer: Optional[Serializer] = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> Iterator[bytes]:
+    """
+    A streamed HTTP response in the format of Lambda response streaming, i.e. a JSON
+    prelude with the status code and headers, the prelude delimiter, and then the
+    chunks of the body (see `stream_body`), e.g. for a body which contains a Stream
+    that is too large to be rendered in memory with `render_response`
+    """
+    prelude = {
+        "statusCode": status_code,
+        "headers": dict(DEFAULT_HEADERS if headers is None else headers),
+    }
+    yield json.dumps(prelude).encode() + STREAMING_PRELUDE_DELIMITER
+    yield from stream_body(body, serializer=serializer, chunk_size=chunk_size)
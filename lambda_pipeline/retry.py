@@ -0,0 +1,281 @@
+import collections
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextvars import copy_context
+from dataclasses import dataclass
+from functools import wraps
+from inspect import iscoroutinefunction
+from types import FunctionType
+from typing import Callable, Optional
+
+from lambda_pipeline.deadlines import get_budget, get_remaining_ms
+
+_HEDGE_EXECUTOR: Optional[ThreadPoolExecutor] = None
+
+
+@dataclass
+class HedgeInfo:
+    calls: int
+    hedged: int
+    hedge_wins: int
+    threshold_ms: Optional[float]
+
+
+def _backoff_ms(
+    attempt: int, backoff_ms: float, max_backoff_ms: float, jitter: bool
+) -> float:
+    """Exponential backoff with "full jitter" (a random delay up to the backoff)"""
+    delay_ms = min(max_backoff_ms, backoff_ms * 2 ** (attempt - 1))
+    return random.uniform(0, delay_ms) if jitter else delay_ms
+
+
+def retry(
+    max_attempts: int = 3,
+    backoff_ms: float = 50,
+    max_backoff_ms: float = 2000,
+    jitter: bool = True,
+    retry_on: tuple[type[BaseException], ...] = (Exception,),
+    min_remaining_ms: Optional[float] = 0,
+    sleep: Callable[[float], None] = time.sleep,
+):
+    """
+    Retry a step (e.g. one which makes a flaky I/O call) which raises one of the
+    'retry_on' exceptions, up to 'max_attempts' attempts in total. Before attempt n
+    the step waits for an exponential backoff of up to `backoff_ms * 2 ** (n - 2)`
+    milliseconds (capped at 'max_backoff_ms'), which with 'jitter' is a random delay
+    up to the backoff, so that retries from concurrent invocations are spread out.
+
+    A retry isn't attempted unless the Lambda has more than 'min_remaining_ms' (plus
+    the step's budget, see `budget`) remaining after the backoff, according to
+    `context.get_remaining_time_in_millis()`, in which case the last exception is
+    raised. If the context doesn't know the remaining time (e.g. powertools'
+    LambdaContext, in tests) the step is retried, as it is for any context with
+    `min_remaining_ms=None`.
+
+    Only retry steps which are safe to repeat, i.e. are idempotent.
+    """
+    if max_attempts < 1:
+        raise ValueError("max_attempts must be at least 1")
+
+    def decorator(step: FunctionType) -> FunctionType:
+        def _next_backoff_ms(attempt: int, exc: Exception, kwargs: dict):
+            """The backoff before the next attempt, or None if it isn't to be retried"""
+            if attempt >= max_attempts or not isinstance(exc, retry_on):
+                return None
+            delay_ms = _backoff_ms(
+                attempt=attempt,
+                backoff_ms=backoff_ms,
+                max_backoff_ms=max_backoff_ms,
+                jitter=jitter,
+            )
+            if min_remaining_ms is not None:
+                remaining_ms = get_remaining_ms(kwargs.get("context"))
+                needed_ms = min_remaining_ms + delay_ms + (get_budget(step).ms or 0)
+                if remaining_ms is not None and remaining_ms <= needed_ms:
+                    return None
+            kwargs["logger"].warning(
+                "step %s failed (attempt %d of %d), retrying in %.0fms: %r",
+                step.__name__,
+                attempt,
+                max_attempts,
+                delay_ms,
+                exc,
+            )
+            return delay_ms
+
+        if iscoroutinefunction(step):
+
+            @wraps(step)
+            async def wrapper(**kwargs):
+                import asyncio
+
+                attempt = 1
+                while True:
+                    try:
+                        return await step(**kwargs)
+                    except Exception as exc:
+                        delay_ms = _next_backoff_ms(attempt, exc, kwargs)
+                        if delay_ms is None:
+                            raise
+                    await asyncio.sleep(delay_ms / 1000)
+                    attempt += 1
+
+        else:
+
+            @wraps(step)
+            def wrapper(**kwargs):
+                attempt = 1
+                while True:
+                    try:
+                        return step(**kwargs)
+                    except Exception as exc:
+                        delay_ms = _next_backoff_ms(attempt, exc, kwargs)
+                        if delay_ms is None:
+                            raise
+                    sleep(delay_ms / 1000)
+                    attempt += 1
+
+        return wrapper
+
+    return decorator
+
+
+def _get_hedge_executor() -> ThreadPoolExecutor:
+    global _HEDGE_EXECUTOR
+    if _HEDGE_EXECUTOR is None:
+        _HEDGE_EXECUTOR = ThreadPoolExecutor(thread_name_prefix="lambda_pipeline_hedge")
+    return _HEDGE_EXECUTOR
+
+
+def _pick_attempt(done: set, pending: set):
+    """A successful attempt, or (once both attempts are done) a failed one"""
+    for attempt in done:
+        if attempt.exception() is None:
+            return attempt
+    return None if pending else next(iter(done))
+
+
+class _LatencyWindow:
+    """The latencies of the most recent calls, and a percentile of them"""
+
+    def __init__(self, size: int, percentile: float):
+        self.percentile = percentile
+        self._latencies = collections.deque(maxlen=size)
+        self._threshold_ms = None
+        self._n_since_update = 0
+        self._lock = threading.Lock()
+
+    def add(self, latency_ms: float):
+        with self._lock:
+            self._latencies.append(latency_ms)
+            self._n_since_update += 1
+
+    def threshold_ms(self, min_samples: int) -> Optional[float]:
+        """The percentile, which is only recalculated every 10 samples"""
+        with self._lock:
+            if len(self._latencies) < min_samples:
+                return None
+            if self._threshold_ms is None or self._n_since_update >= 10:
+                latencies = sorted(self._latencies)
+                index = min(int(self.percentile * len(latencies)), len(latencies) - 1)
+                self._threshold_ms = latencies[index]
+                self._n_since_update = 0
+            return self._threshold_ms
+
+
+def hedge(
+    after_ms: Optional[float] = None,
+    percentile: float = 0.95,
+    window: int = 100,
+    min_samples: int = 20,
+):
+    """
+    Hedge the requests of an idempotent (read) step: if the step hasn't returned
+    after the 'percentile' (p95, by default) of its latency over the last 'window'
+    calls then a second attempt is started, and the output of whichever attempt
+    completes first is returned. Until there are 'min_samples' latencies the
+    threshold is 'after_ms' (and the step isn't hedged if it is None).
+
+    Hedging trades extra load on the dependency (about 1 - 'percentile' of calls
+    are made twice) for a shorter tail latency. A synchronous step is run on a
+    thread pool (since the slower attempt can't be cancelled, it runs to completion
+    and its output is discarded), whereas the slower attempt of an async step is
+    cancelled. `step.hedge_info()` returns the number of calls, hedged calls, calls
+    won by the second attempt and the current threshold.
+    """
+    if not 0 < percentile < 1:
+        raise ValueError("percentile must be between 0 and 1")
+
+    def decorator(step: FunctionType) -> FunctionType:
+        latencies = _LatencyWindow(size=window, percentile=percentile)
+        counts = {"calls": 0, "hedged": 0, "hedge_wins": 0}
+        counts_lock = threading.Lock()
+
+        def _count(name: str, n: int = 1):
+            with counts_lock:
+                counts[name] += n
+
+        def _threshold_ms() -> Optional[float]:
+            threshold_ms = latencies.threshold_ms(min_samples=min_samples)
+            return after_ms if threshold_ms is None else threshold_ms
+
+        def _timed(func: FunctionType, kwargs: dict):
+            started = time.perf_counter()
+            result = func(**kwargs)
+            latencies.add((time.perf_counter() - started) * 1000)
+            return result
+
+        if iscoroutinefunction(step):
+
+            @wraps(step)
+            async def wrapper(**kwargs):
+                import asyncio
+
+                _count("calls")
+                threshold_ms = _threshold_ms()
+
+                async def attempt():
+                    started = time.perf_counter()
+                    result = await step(**kwargs)
+                    latencies.add((time.perf_counter() - started) * 1000)
+                    return result
+
+                first = asyncio.ensure_future(attempt())
+                if threshold_ms is None:
+                    return await first
+                done, _ = await asyncio.wait({first}, timeout=threshold_ms / 1000)
+                if done:
+                    return first.result()
+
+                _count("hedged")
+                second = asyncio.ensure_future(attempt())
+                pending = {first, second}
+                try:
+                    while True:
+                        done, pending = await asyncio.wait(
+                            pending, return_when=asyncio.FIRST_COMPLETED
+                        )
+                        task = _pick_attempt(done=done, pending=pending)
+                        if task is not None:
+                            _count("hedge_wins", task is second)
+                            return task.result()
+                finally:
+                    for task in pending:
+                        task.cancel()
+
+        else:
+
+            @wraps(step)
+            def wrapper(**kwargs):
+                _count("calls")
+                threshold_ms = _threshold_ms()
+                if threshold_ms is None:
+                    return _timed(step, kwargs)
+
+                executor = _get_hedge_executor()
+                first = executor.submit(copy_context().run, _timed, step, kwargs)
+                done, _ = wait({first}, timeout=threshold_ms / 1000)
+                if done:
+                    return first.result()
+
+                _count("hedged")
+                second = executor.submit(copy_context().run, _timed, step, kwargs)
+                pending = {first, second}
+                while True:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    future = _pick_attempt(done=done, pending=pending)
+                    if future is not None:
+                        _count("hedge_wins", future is second)
+                        return future.result()
+
+        def hedge_info() -> HedgeInfo:
+            with counts_lock:
+                info = dict(counts)
+            return HedgeInfo(**info, threshold_ms=_threshold_ms())
+
+        wrapper.hedge_info = hedge_info
+        return wrapper
+
+    return decorator
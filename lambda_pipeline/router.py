@@ -0,0 +1,240 @@
+import re
+from collections.abc import Mapping
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from lambda_pipeline.pipeline import CompiledPipeline, Step
+from lambda_pipeline.types import FrozenDict
+
+ANY = "ANY"
+
+# A parameter of a path template, e.g. {id}, or a greedy parameter, e.g. {proxy+}
+_PARAMETER = re.compile(r"\{([^{}/]+?)(\+?)\}")
+_NO_PARAMETERS = FrozenDict()
+
+
+class RouteNotFoundError(Exception):
+    pass
+
+
+@dataclass
+class RouteMatch:
+    route: str
+    pipeline: CompiledPipeline
+    path_parameters: FrozenDict
+
+
+def _get(value: Any, key: str) -> Any:
+    if type(value) is dict or isinstance(value, Mapping):
+        return value.get(key)
+    return getattr(value, key, None)
+
+
+def get_event_source(event: Any) -> Optional[str]:
+    """
+    The source of an event which isn't from API Gateway: the 'eventSource' of its
+    records (e.g. "aws:sqs", "aws:kinesis" or "aws:dynamodb"), or the 'source' of
+    an EventBridge event (e.g. "aws.events")
+    """
+    records = _get(event, "Records")
+    if records:
+        return _get(records[0], "eventSource") or _get(records[0], "EventSource")
+    return _get(event, "source")
+
+
+def _template_pattern(resource: str) -> tuple[str, tuple[str, ...]]:
+    """A regex for a path template, e.g. /documents/{id}, and its parameter names"""
+    pattern, names, position = [], [], 0
+    for match in _PARAMETER.finditer(resource):
+        name, greedy = match.groups()
+        pattern.append(re.escape(resource[position : match.start()]))
+        pattern.append("(.+)" if greedy else "([^/]+)")
+        names.append(name)
+        position = match.end()
+    pattern.append(re.escape(resource[position:]))
+    return "".join(pattern), tuple(names)
+
+
+def _specificity(resource: str) -> tuple[int, int]:
+    """Templates with fewer (greedy) parameters are tried first"""
+    return resource.count("+}"), resource.count("{")
+
+
+def _first_segment(path: str) -> Optional[str]:
+    """The first segment of a path, or None for a template whose first segment has a parameter"""
+    segment = path.split("/", 2)[1] if path.startswith("/") else path
+    return None if "{" in segment else segment
+
+
+class _Templates:
+    """Path templates, as a single compiled regex"""
+
+    def __init__(self, routes: dict[str, CompiledPipeline]):
+        alternatives = []
+        self.routes = {}
+        group = 1
+        for resource in sorted(routes, key=_specificity):
+            pattern, names = _template_pattern(resource)
+            alternatives.append(f"({pattern})")
+            self.routes[group] = (resource, routes[resource], names)
+            group += len(names) + 1
+        self.regex = re.compile("|".join(alternatives))
+
+    def match(self, path: str) -> Optional[tuple[str, CompiledPipeline, FrozenDict]]:
+        match = self.regex.fullmatch(path)
+        if match is None:
+            return None
+        # The group of the matching template is the last to close
+        group = match.lastindex
+        resource, pipeline, names = self.routes[group]
+        values = match.groups()[group : group + len(names)]
+        return resource, pipeline, FrozenDict(zip(names, values))
+
+
+class _PathMatcher:
+    """
+    The path templates of the routes for one method, indexed by their first
+    segment, so that a path is only matched against the templates which start
+    with its first segment (then those which start with a parameter)
+    """
+
+    def __init__(self):
+        self.routes = {}
+        self.templates = {}
+
+    def add(self, resource: str, pipeline: CompiledPipeline):
+        """Add a template, recompiling the regex of the templates for its first segment"""
+        segment = _first_segment(resource)
+        routes = self.routes.setdefault(segment, {})
+        routes[resource] = pipeline
+        self.templates[segment] = _Templates(routes=routes)
+
+    def match(self, path: str) -> Optional[tuple[str, CompiledPipeline, FrozenDict]]:
+        for segment in (_first_segment(path), None):
+            templates = self.templates.get(segment)
+            match = templates and templates.match(path)
+            if match:
+                return match
+        return None
+
+
+class Router:
+    """
+    Dispatch the events of a Lambda with many routes (e.g. behind an API Gateway
+    proxy) to pipelines which are compiled when the routes are added, i.e. during
+    the cold start:
+
+        router = Router(event_type=EventModel, common_steps=[authorise])
+        router.add_route("GET", "/documents/{id}", steps=[read_document])
+        router.add_route("POST", "/documents", steps=[create_document])
+        router.add_event_source("aws:sqs", pipeline=compile_batch_pipeline(...))
+
+        match = router.resolve(event)
+        pipeline = match.pipeline.bind(event=..., context=..., ...)
+        data = pipeline(data=PipelineData(path_parameters=match.path_parameters))
+
+    An API Gateway event is routed by its (httpMethod, resource), with a dict
+    lookup. An event for a greedy proxy resource (e.g. /{proxy+}), or whose resource
+    has no route, is routed by its path instead: with a dict lookup for the routes
+    without parameters, and otherwise by matching the path templates of the routes
+    for its method, which are indexed by their first segment and compiled (as the
+    routes are added) into a regex per segment, which tries the templates with fewer
+    parameters first. Routes for the method "ANY" match any method. Other events are routed by
+    their source (see `get_event_source`). RouteNotFoundError is raised if no route
+    matches.
+
+    The 'common_steps' are listed before the steps of every route, and every route
+    is compiled with the same 'options' (e.g. 'validation', 'observers' or
+    'deadline_margin_ms') by 'pipeline_type' (e.g. CompiledAsyncPipeline), sharing
+    a step cache so that steps which are listed in more than one route (such as the
+    common steps) are only decorated once, unless the routes are instrumented.
+    """
+
+    def __init__(
+        self,
+        event_type: type,
+        common_steps: tuple[Step, ...] = (),
+        pipeline_type: type = CompiledPipeline,
+        **options,
+    ):
+        self.event_type = event_type
+        self.common_steps = tuple(common_steps)
+        self.pipeline_type = pipeline_type
+        self.options = options
+        self.step_cache = {}
+        self._routes = {}
+        self._matchers = {}
+        self._event_sources = {}
+
+    def add_route(
+        self, method: str, resource: str, steps: list[Step]
+    ) -> CompiledPipeline:
+        """Compile a pipeline of the common steps and 'steps' for the route"""
+        key = (method.upper(), resource)
+        if key in self._routes:
+            raise ValueError(f"route {key[0]} {resource} has already been added")
+        pipeline = self.pipeline_type(
+            steps=[*self.common_steps, *steps],
+            event_type=self.event_type,
+            step_cache=self.step_cache,
+            **self.options,
+        )
+        self._routes[key] = pipeline
+        if _PARAMETER.search(resource):
+            self._matchers.setdefault(key[0], _PathMatcher()).add(resource, pipeline)
+        return pipeline
+
+    def add_event_source(self, source: str, pipeline: CompiledPipeline):
+        """Route events from 'source' (see `get_event_source`) to the pipeline"""
+        if source in self._event_sources:
+            raise ValueError(f"event source {source} has already been added")
+        self._event_sources[source] = pipeline
+
+    def _match_path(self, method: str, path: str) -> Optional[RouteMatch]:
+        for _method in (method, ANY):
+            matcher = self._matchers.get(_method)
+            match = matcher and matcher.match(path)
+            if match:
+                resource, pipeline, path_parameters = match
+                return RouteMatch(
+                    route=f"{_method} {resource}",
+                    pipeline=pipeline,
+                    path_parameters=path_parameters,
+                )
+        return None
+
+    def resolve(self, event: Any) -> RouteMatch:
+        """The route for a (raw or parsed) event, and the parameters of its path"""
+        method = _get(event, "httpMethod")
+        if method is None:
+            source = get_event_source(event)
+            pipeline = self._event_sources.get(source)
+            if pipeline is None:
+                raise RouteNotFoundError(f"no route for events from {source}")
+            return RouteMatch(
+                route=source, pipeline=pipeline, path_parameters=_NO_PARAMETERS
+            )
+
+        resource, path = _get(event, "resource"), _get(event, "path")
+        if resource is not None and "+}" not in resource:
+            for _method in (method, ANY):
+                pipeline = self._routes.get((_method, resource))
+                if pipeline is not None:
+                    return RouteMatch(
+                        route=f"{_method} {resource}",
+                        pipeline=pipeline,
+                        path_parameters=FrozenDict(_get(event, "pathParameters") or ()),
+                    )
+        for _method in (method, ANY):
+            pipeline = self._routes.get((_method, path))
+            if pipeline is not None:
+                return RouteMatch(
+                    route=f"{_method} {path}",
+                    pipeline=pipeline,
+                    path_parameters=_NO_PARAMETERS,
+                )
+
+        match = self._match_path(method=method, path=path or "")
+        if match is None:
+            raise RouteNotFoundError(f"no route for {method} {path}")
+        return match
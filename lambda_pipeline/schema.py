@@ -0,0 +1,89 @@
+from types import FunctionType
+from typing import Optional, get_args, get_origin
+
+from lambda_pipeline.parallel import ParallelGroup
+from lambda_pipeline.types import PipelineData
+
+
+class PipelineSchemaError(Exception):
+    pass
+
+
+def _is_typeddict(value) -> bool:
+    # typing.is_typeddict is only available from Python 3.10
+    return (
+        isinstance(value, type)
+        and issubclass(value, dict)
+        and hasattr(value, "__required_keys__")
+    )
+
+
+def get_schema(annotation) -> Optional[type]:
+    """The schema (a TypedDict) of a `PipelineData[Schema]` annotation, if any"""
+    if get_origin(annotation) is not PipelineData:
+        return None
+    args = get_args(annotation)
+    if len(args) != 1 or not _is_typeddict(args[0]):
+        raise PipelineSchemaError(
+            f"was expecting PipelineData[Schema] where Schema is a TypedDict, but got {annotation}"
+        )
+    return args[0]
+
+
+def get_step_schemas(step: FunctionType) -> tuple[Optional[type], Optional[type]]:
+    """The input ('data') and output schemas of a step"""
+    annotations = getattr(step, "__annotations__", {})
+    return get_schema(annotations.get("data")), get_schema(annotations.get("return"))
+
+
+def erase_schemas(annotations: dict) -> dict:
+    """The annotations, with `PipelineData[Schema]` replaced by `PipelineData`"""
+    return {
+        name: PipelineData if get_origin(value) is PipelineData else value
+        for name, value in annotations.items()
+    }
+
+
+def get_schema_io(step: FunctionType) -> Optional[tuple[frozenset, frozenset]]:
+    """
+    The keys that a step reads and writes according to its schemas, i.e. the
+    required keys of its input and output schemas, if it has both
+    """
+    input_schema, output_schema = get_step_schemas(step)
+    if input_schema is None or output_schema is None:
+        return None
+    return input_schema.__required_keys__, output_schema.__required_keys__
+
+
+def _check_step(step, available_keys: frozenset) -> frozenset:
+    """Check the keys that the step reads are available, returning the keys it writes"""
+    if isinstance(step, ParallelGroup):
+        return frozenset().union(
+            *(
+                _check_step(step=_step, available_keys=available_keys)
+                for _step in step.steps
+            )
+        )
+
+    input_schema, output_schema = get_step_schemas(step)
+    if input_schema is not None:
+        missing_keys = sorted(input_schema.__required_keys__.difference(available_keys))
+        if missing_keys:
+            raise PipelineSchemaError(
+                f"step {step.__name__} reads {missing_keys}, which are not written "
+                "by an earlier step (with an output schema) or provided in the initial keys"
+            )
+    return frozenset() if output_schema is None else output_schema.__required_keys__
+
+
+def check_schemas(steps: list, initial_keys: frozenset = frozenset()) -> frozenset:
+    """
+    Check that the required keys of the input schema of each step are written by
+    an earlier step (i.e. are required keys of its output schema), or are in
+    'initial_keys'. Steps without an output schema are assumed to keep the keys of
+    their input. Returns the keys that are available at the end of the steps.
+    """
+    available_keys = frozenset(initial_keys)
+    for step in steps:
+        available_keys |= _check_step(step=step, available_keys=available_keys)
+    return available_keys
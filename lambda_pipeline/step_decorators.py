@@ -1,9 +1,12 @@
-from copy import deepcopy
 from functools import wraps
+from inspect import iscoroutinefunction, unwrap
 from types import FunctionType
+from typing import get_args, get_origin, get_type_hints
 
-from aws_lambda_powertools.utilities.typing import LambdaContext
-from pydantic import validate_arguments as _validate_arguments
+from lambda_pipeline import types
+from lambda_pipeline.dependencies import DependencyContainer
+from lambda_pipeline.schema import erase_schemas, get_step_schemas
+from lambda_pipeline.types import ContextView, PipelineResult
 
 
 class PipelineSignatureError(Exception):
@@ -14,43 +17,179 @@ class PipelineStepOutputError(Exception):
     pass
 
 
+class PipelineArgumentError(Exception):
+    pass
+
+
 def enforce_step_signature(
     step: FunctionType, template_step: FunctionType
 ) -> FunctionType:
-    if step.__annotations__ != template_step.__annotations__:
+    if step.__annotations__ == template_step.__annotations__:
+        return step
+    # PipelineData[Schema] meets the signature, as long as the schema is valid
+    if erase_schemas(step.__annotations__) != template_step.__annotations__:
         raise PipelineSignatureError(
             f"step {step.__name__} does not meet the expected signature:\n"
             f"{template_step.__annotations__}\nGot:\n{step.__annotations__}"
         )
+    get_step_schemas(step)
     return step
 
 
+def _resolve_annotations(step: FunctionType):
+    """
+    Resolve postponed (string) annotations, which may refer to the types that are
+    only imported on first use (i.e. pydantic's BaseModel and LambdaContext)
+    """
+    if not any(isinstance(value, str) for value in step.__annotations__.values()):
+        return
+    from pydantic import BaseModel
+
+    step.__annotations__ = get_type_hints(
+        step, localns={"BaseModel": BaseModel, "LambdaContext": types.LambdaContext}
+    )
+
+
+def _erase_schemas(step: FunctionType, lazy_dependencies: bool = False) -> FunctionType:
+    """
+    A shim of the step without the schemas in its annotations, which pydantic
+    can't validate (the keys of the schemas are checked on compilation instead).
+    With 'lazy_dependencies', 'dependencies' is annotated as a DependencyContainer,
+    which pydantic checks with isinstance rather than copying it as a mapping
+    (which would construct all of its dependencies).
+    """
+    annotations = erase_schemas(step.__annotations__)
+    if lazy_dependencies and "dependencies" in annotations:
+        annotations["dependencies"] = DependencyContainer
+    if annotations == step.__annotations__:
+        return step
+
+    @wraps(step)
+    def shim(*args, **kwargs):
+        return step(*args, **kwargs)
+
+    shim.__annotations__ = annotations
+    return shim
+
+
 def validate_arguments(step: FunctionType):
-    return _validate_arguments(config=dict(arbitrary_types_allowed=True))(step)
+    """
+    pydantic's validate_arguments, which is applied on the first call to the step
+    so that pydantic (and the types in the annotations) are imported on first use
+    """
+    validated_steps = {}
+
+    @wraps(step)
+    def wrapper(*args, **kwargs):
+        lazy_dependencies = isinstance(kwargs.get("dependencies"), DependencyContainer)
+        validated_step = validated_steps.get(lazy_dependencies)
+        if validated_step is None:
+            from pydantic import validate_arguments as _validate_arguments
+
+            _resolve_annotations(step=step)
+            validated_step = validated_steps[lazy_dependencies] = _validate_arguments(
+                config=dict(arbitrary_types_allowed=True)
+            )(_erase_schemas(step, lazy_dependencies=lazy_dependencies))
+        return validated_step(*args, **kwargs)
+
+    return wrapper
+
+
+def check_arguments(template_step: FunctionType, **arguments):
+    """A cheap, isinstance-based alternative to validate_arguments"""
+    for name, value in arguments.items():
+        expected_type = template_step.__annotations__[name]
+        expected_type = get_origin(expected_type) or expected_type
+        if not isinstance(value, expected_type):
+            raise PipelineArgumentError(
+                f"argument '{name}': was expecting type '{expected_type}', but got '{type(value)}'"
+            )
+
 
+def validate_output(
+    step: FunctionType, template_step: FunctionType, check_required_keys: bool = True
+) -> FunctionType:
+    """
+    Check the type of the output of the step and, with 'check_required_keys', that
+    it contains the required keys of the step's output schema (if it has one).
+    Without it the schema is trusted, as declared (the schemas of the steps are
+    checked against each other on compilation). The data of a PipelineResult (which
+    ends the pipeline) is checked, but needn't contain the required keys.
+    """
+    expected_type = template_step.__annotations__["return"]
+    _, output_schema = get_step_schemas(step)
+    required_keys = (
+        output_schema.__required_keys__
+        if check_required_keys and output_schema is not None
+        else ()
+    )
+
+    def _validate_output(result):
+        if type(result) is PipelineResult:
+            if not isinstance(result.data, expected_type):
+                raise PipelineStepOutputError(
+                    f"step {step.__name__}: was expecting PipelineResult.done to be given a '{expected_type}', but got '{type(result.data)}'"
+                )
+            return result
+        if not isinstance(result, expected_type):
+            raise PipelineStepOutputError(
+                f"step {step.__name__}: was expecting a return type '{expected_type}', but got '{type(result)}'"
+            )
+        for key in required_keys:
+            if key not in result:
+                raise PipelineStepOutputError(
+                    f"step {step.__name__}: did not write '{key}', which is required by {output_schema.__name__}"
+                )
+        return result
+
+    if iscoroutinefunction(unwrap(step)):
+
+        @wraps(step)
+        async def async_wrapper(*args, **kwargs):
+            return _validate_output(await step(*args, **kwargs))
+
+        return async_wrapper
 
-def validate_output(step: FunctionType, template_step: FunctionType) -> FunctionType:
+    @wraps(step)
+    def wrapper(*args, **kwargs):
+        return _validate_output(step(*args, **kwargs))
+
+    return wrapper
+
+
+def validate_batch_output(
+    step: FunctionType, template_step: FunctionType, check_required_keys: bool = True
+) -> FunctionType:
+    """
+    validate_output for batch steps, which return a list of PipelineData (or
+    PipelineResult). Batch steps don't have schemas, so 'check_required_keys' has
+    no effect.
+    """
     expected_type = template_step.__annotations__["return"]
+    container_type, (item_type,) = get_origin(expected_type), get_args(expected_type)
 
     @wraps(step)
     def wrapper(*args, **kwargs):
         result = step(*args, **kwargs)
-        if type(result) != expected_type:
+        if type(result) != container_type:
             raise PipelineStepOutputError(
                 f"step {step.__name__}: was expecting a return type '{expected_type}', but got '{type(result)}'"
             )
+        for item in result:
+            if type(item) is PipelineResult:
+                item = item.data
+            if not isinstance(item, item_type):
+                raise PipelineStepOutputError(
+                    f"step {step.__name__}: was expecting a return type '{expected_type}', but got an item of type '{type(item)}'"
+                )
         return result
 
     return wrapper
 
 
-def do_not_persist_changes_to_context(
-    step: FunctionType, initial_context: LambdaContext
-) -> FunctionType:
-    initial_context = deepcopy(initial_context)
-
+def do_not_persist_changes_to_context(step: FunctionType) -> FunctionType:
     @wraps(step)
-    def wrapper(context: LambdaContext, *args, **kwargs):
-        return step(context=initial_context, *args, **kwargs)
+    def wrapper(context, *args, **kwargs):
+        return step(context=ContextView(context), *args, **kwargs)
 
     return wrapper
@@ -0,0 +1,30 @@
+import json
+from functools import cache
+from pathlib import Path
+
+import pytest
+from aws_lambda_powertools.utilities.parser.models import (
+    APIGatewayProxyEventModel as EventModel,
+)
+
+
+class FakeClock:
+    """A clock (for the 'clock' arguments) whose time is set by the test"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@cache
+def get_event() -> dict:
+    """The raw API Gateway event in event.json, which mustn't be changed"""
+    with open(Path(__file__).parent / "event.json") as f:
+        return json.load(f)
+
+
+@pytest.fixture()
+def event():
+    return EventModel(**get_event())
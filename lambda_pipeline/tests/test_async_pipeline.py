@@ -0,0 +1,187 @@
+import asyncio
+import threading
+from logging import Logger, getLogger
+from typing import Any
+
+import pytest
+from aws_lambda_powertools.utilities.parser.models import (
+    APIGatewayProxyEventModel as EventModel,
+)
+from lambda_pipeline.async_pipeline import (
+    CompiledAsyncPipeline,
+    compile_async_pipeline,
+    make_async_pipeline,
+    sync_handler,
+)
+from lambda_pipeline.step_decorators import (
+    PipelineSignatureError,
+    PipelineStepOutputError,
+)
+from lambda_pipeline.types import (
+    FrozenDict,
+    LambdaContext,
+    PipelineData,
+    PipelineResult,
+)
+
+LOGGER = getLogger(__name__)
+
+
+@pytest.fixture()
+def context():
+    return LambdaContext()
+
+
+@pytest.fixture
+def steps():
+    async def first_step(
+        data: PipelineData,
+        event: EventModel,
+        context: LambdaContext,
+        dependencies: FrozenDict[str, Any],
+        logger: Logger,
+    ) -> PipelineData:
+        await asyncio.sleep(0)
+        return PipelineData(first_step_result=data["input_data"].title())
+
+    def second_step(
+        data: PipelineData,
+        event: EventModel,
+        context: LambdaContext,
+        dependencies: FrozenDict[str, Any],
+        logger: Logger,
+    ) -> PipelineData:
+        assert threading.current_thread() is not threading.main_thread()
+        return data.set("second_step_result", data["first_step_result"].upper())
+
+    async def third_step(
+        data: PipelineData,
+        event: EventModel,
+        context: LambdaContext,
+        dependencies: FrozenDict[str, Any],
+        logger: Logger,
+    ) -> PipelineData:
+        return data.set("third_step_result", data["second_step_result"] + " bar")
+
+    return [first_step, second_step, third_step]
+
+
+@pytest.mark.parametrize("validation", ["full", "boundary", "off"])
+def test_compile_async_pipeline(steps, event, context, validation):
+    compiled_pipeline = compile_async_pipeline(
+        steps=steps, event_type=EventModel, validation=validation
+    )
+    assert isinstance(compiled_pipeline, CompiledAsyncPipeline)
+
+    pipeline = compiled_pipeline.bind(
+        event=event, context=context, dependencies={}, logger=LOGGER
+    )
+    result = asyncio.run(pipeline(data=PipelineData(input_data="foo")))
+    assert result.to_dict() == {
+        "first_step_result": "Foo",
+        "second_step_result": "FOO",
+        "third_step_result": "FOO bar",
+    }
+
+
+def test_make_async_pipeline(steps, event, context):
+    pipeline = make_async_pipeline(
+        steps=steps, event=event, context=context, dependencies={}, logger=LOGGER
+    )
+    result = asyncio.run(pipeline(data=PipelineData(input_data="foo")))
+    assert result["third_step_result"] == "FOO bar"
+
+
+def test_compile_async_pipeline__step_signature_enforced():
+    async def bad_step(data: PipelineData) -> PipelineData:
+        return data
+
+    with pytest.raises(PipelineSignatureError):
+        compile_async_pipeline(steps=[bad_step], event_type=EventModel)
+
+
+@pytest.mark.parametrize("validation", ["full", "boundary"])
+def test_compile_async_pipeline__output_is_data_pipeline(event, context, validation):
+    async def bad_step(
+        data: PipelineData,
+        event: EventModel,
+        context: LambdaContext,
+        dependencies: FrozenDict[str, Any],
+        logger: Logger,
+    ) -> PipelineData:
+        return "not a data pipeline"
+
+    pipeline = compile_async_pipeline(
+        steps=[bad_step], event_type=EventModel, validation=validation
+    ).bind(event=event, context=context, dependencies={}, logger=LOGGER)
+    with pytest.raises(PipelineStepOutputError):
+        asyncio.run(pipeline(data=PipelineData()))
+
+
+def test_compile_async_pipeline__context_mutations_not_persisted(event):
+    async def mutate_some_state(
+        data: PipelineData,
+        event: EventModel,
+        context: LambdaContext,
+        dependencies: FrozenDict[str, Any],
+        logger: Logger,
+    ) -> PipelineData:
+        context._function_name = "foo, bar"
+        return PipelineData()
+
+    context = LambdaContext()
+    context._function_name = "spam, eggs"
+    pipeline = compile_async_pipeline(
+        steps=[mutate_some_state], event_type=EventModel
+    ).bind(event=event, context=context, dependencies={}, logger=LOGGER)
+    asyncio.run(pipeline(data=PipelineData()))
+    assert context._function_name == "spam, eggs"
+
+
+def test_sync_handler(steps, event, context):
+    compiled_pipeline = compile_async_pipeline(steps=steps, event_type=EventModel)
+    event_loops = []
+
+    @sync_handler
+    async def handler(event: EventModel, context: LambdaContext) -> dict:
+        event_loops.append(asyncio.get_running_loop())
+        pipeline = compiled_pipeline.bind(
+            event=event, context=context, dependencies={}, logger=LOGGER
+        )
+        result = await pipeline(data=PipelineData(input_data="foo"))
+        return result.to_dict()
+
+    assert handler(event, context)["third_step_result"] == "FOO bar"
+    assert handler(event=event, context=context)["third_step_result"] == "FOO bar"
+    assert event_loops[0] is event_loops[1]
+
+
+@pytest.mark.parametrize("validation", ["full", "boundary", "off"])
+def test_compile_async_pipeline__early_exit(event, context, validation):
+    calls = []
+
+    async def cache_hit(
+        data: PipelineData,
+        event: EventModel,
+        context: LambdaContext,
+        dependencies: FrozenDict[str, Any],
+        logger: Logger,
+    ) -> PipelineData:
+        calls.append("cache_hit")
+        return PipelineResult.done(data.set("cached", True))
+
+    def read_document(
+        data: PipelineData,
+        event: EventModel,
+        context: LambdaContext,
+        dependencies: FrozenDict[str, Any],
+        logger: Logger,
+    ) -> PipelineData:
+        calls.append("read_document")
+        return data
+
+    pipeline = compile_async_pipeline(
+        steps=[cache_hit, read_document], event_type=EventModel, validation=validation
+    ).bind(event=event, context=context, dependencies={}, logger=LOGGER)
+    assert asyncio.run(pipeline(data=PipelineData())) == PipelineData(cached=True)
+    assert calls == ["cache_hit"]
@@ -0,0 +1,467 @@
+import base64
+import threading
+from logging import Logger, getLogger
+from typing import Any
+
+import pytest
+from aws_lambda_powertools.utilities.parser.models import (
+    KinesisDataStreamRecord,
+    SqsModel,
+    SqsRecordModel,
+)
+from lambda_pipeline.batch import (
+    CompiledBatchPipeline,
+    PipelineBatchError,
+    batch_step,
+    compile_batch_pipeline,
+    get_item_identifier,
+)
+from lambda_pipeline.deadlines import budget
+from lambda_pipeline.parallel import parallel
+from lambda_pipeline.step_decorators import (
+    PipelineSignatureError,
+    PipelineStepOutputError,
+)
+from lambda_pipeline.types import (
+    FrozenDict,
+    LambdaContext,
+    PipelineData,
+    PipelineResult,
+)
+
+LOGGER = getLogger(__name__)
+
+
+class StepError(Exception):
+    pass
+
+
+def _sqs_record(message_id: str, body: str) -> dict:
+    return {
+        "messageId": message_id,
+        "receiptHandle": "receipt-handle",
+        "body": body,
+        "attributes": {
+            "ApproximateReceiveCount": "1",
+            "SentTimestamp": "1545082649183",
+            "SenderId": "AIDAIENQZJOLO23YVJ4VO",
+            "ApproximateFirstReceiveTimestamp": "1545082649185",
+        },
+        "messageAttributes": {},
+        "md5OfBody": "e4e68fb7bd0e697a0ae8f1bb342846b3",
+        "eventSource": "aws:sqs",
+        "eventSourceARN": "arn:aws:sqs:eu-west-2:123456789012:my-queue",
+        "awsRegion": "eu-west-2",
+    }
+
+
+def _kinesis_record(sequence_number: str, data: str) -> dict:
+    return {
+        "eventSource": "aws:kinesis",
+        "eventVersion": "1.0",
+        "eventID": f"shardId-000000000000:{sequence_number}",
+        "eventName": "aws:kinesis:record",
+        "invokeIdentityArn": "arn:aws:iam::123456789012:role/lambda-role",
+        "awsRegion": "eu-west-2",
+        "eventSourceARN": "arn:aws:kinesis:eu-west-2:123456789012:stream/my-stream",
+        "kinesis": {
+            "kinesisSchemaVersion": "1.0",
+            "partitionKey": "1",
+            "sequenceNumber": sequence_number,
+            "data": data,
+            "approximateArrivalTimestamp": 1545084650.987,
+        },
+    }
+
+
+def _sqs_event(*bodies: str) -> dict:
+    return {
+        "Records": [
+            _sqs_record(message_id=f"message-{i}", body=body)
+            for i, body in enumerate(bodies)
+        ]
+    }
+
+
+def echo_body(
+    data: PipelineData,
+    event: SqsRecordModel,
+    context: LambdaContext,
+    dependencies: FrozenDict[str, Any],
+    logger: Logger,
+) -> PipelineData:
+    if event.body == "bad":
+        raise StepError(event.body)
+    return data.set("body", data.get("prefix", "") + event.body)
+
+
+def _process(compiled_pipeline, event, **kwargs):
+    return compiled_pipeline.process(
+        event=event, context=LambdaContext(), dependencies={}, logger=LOGGER, **kwargs
+    )
+
+
+def test_compile_batch_pipeline():
+    compiled_pipeline = compile_batch_pipeline(
+        steps=[echo_body], event_type=SqsRecordModel, max_concurrency=2
+    )
+    assert isinstance(compiled_pipeline, CompiledBatchPipeline)
+    assert compiled_pipeline.executor is not None
+
+
+@pytest.mark.parametrize("max_concurrency", [1, 3])
+def test_batch_pipeline_run(max_concurrency):
+    compiled_pipeline = compile_batch_pipeline(
+        steps=[echo_body], event_type=SqsRecordModel, max_concurrency=max_concurrency
+    )
+    outcomes = compiled_pipeline.run(
+        event=_sqs_event("a", "bad", "c"),
+        context=LambdaContext(),
+        dependencies={},
+        logger=LOGGER,
+        data=PipelineData(prefix="x-"),
+    )
+    assert outcomes[0] == PipelineData(prefix="x-", body="x-a")
+    assert isinstance(outcomes[1], StepError)
+    assert outcomes[2] == PipelineData(prefix="x-", body="x-c")
+
+
+@pytest.mark.parametrize("max_concurrency", [1, 3])
+def test_batch_pipeline_partial_batch_failure(max_concurrency):
+    compiled_pipeline = compile_batch_pipeline(
+        steps=[echo_body], event_type=SqsRecordModel, max_concurrency=max_concurrency
+    )
+    response = _process(compiled_pipeline, event=_sqs_event("a", "bad", "c", "bad"))
+    assert response == {
+        "batchItemFailures": [
+            {"itemIdentifier": "message-1"},
+            {"itemIdentifier": "message-3"},
+        ]
+    }
+
+
+def test_batch_pipeline_accepts_a_parsed_event():
+    compiled_pipeline = compile_batch_pipeline(
+        steps=[echo_body], event_type=SqsRecordModel
+    )
+    event = SqsModel.parse_obj(_sqs_event("a", "bad"))
+    response = _process(compiled_pipeline, event=event)
+    assert response == {"batchItemFailures": [{"itemIdentifier": "message-1"}]}
+
+
+def test_batch_pipeline_records_that_cannot_be_parsed_fail():
+    def decode(
+        data: PipelineData,
+        event: KinesisDataStreamRecord,
+        context: LambdaContext,
+        dependencies: FrozenDict[str, Any],
+        logger: Logger,
+    ) -> PipelineData:
+        return data.set("data", event.kinesis.data)
+
+    compiled_pipeline = compile_batch_pipeline(
+        steps=[decode], event_type=KinesisDataStreamRecord
+    )
+    good = _kinesis_record(sequence_number="1", data=base64.b64encode(b"a").decode())
+    bad = _kinesis_record(sequence_number="2", data="not base64!")
+    response = _process(compiled_pipeline, event={"Records": [good, bad]})
+    assert response == {"batchItemFailures": [{"itemIdentifier": "2"}]}
+
+
+def test_batch_pipeline_records_without_an_identifier_fail():
+    compiled_pipeline = compile_batch_pipeline(
+        steps=[echo_body], event_type=SqsRecordModel
+    )
+    event = _sqs_event("a", "bad")
+    event["Records"].insert(1, {"body": "no identifier"})
+    response = _process(compiled_pipeline, event=event)
+    assert response == {
+        "batchItemFailures": [{"itemIdentifier": "1"}, {"itemIdentifier": "message-1"}]
+    }
+
+
+def test_batch_pipeline_bounded_concurrency():
+    barrier = threading.Barrier(2, timeout=5)
+    n_running = 0
+    max_running = 0
+    lock = threading.Lock()
+
+    def wait_for_another_record(
+        data: PipelineData,
+        event: SqsRecordModel,
+        context: LambdaContext,
+        dependencies: FrozenDict[str, Any],
+        logger: Logger,
+    ) -> PipelineData:
+        nonlocal n_running, max_running
+        with lock:
+            n_running += 1
+            max_running = max(max_running, n_running)
+        barrier.wait()
+        with lock:
+            n_running -= 1
+        return data
+
+    compiled_pipeline = compile_batch_pipeline(
+        steps=[wait_for_another_record], event_type=SqsRecordModel, max_concurrency=2
+    )
+    response = _process(compiled_pipeline, event=_sqs_event("a", "b", "c", "d"))
+    assert response == {"batchItemFailures": []}
+    assert max_running == 2
+
+
+def test_get_item_identifier():
+    assert get_item_identifier(_sqs_record(message_id="abc", body="")) == "abc"
+    assert get_item_identifier(SqsRecordModel(**_sqs_record("abc", body=""))) == "abc"
+    assert get_item_identifier(_kinesis_record(sequence_number="123", data="")) == "123"
+    assert get_item_identifier({"dynamodb": {"SequenceNumber": "456"}}) == "456"
+    with pytest.raises(PipelineBatchError):
+        get_item_identifier({"body": "no identifier"})
+
+
+def test_batch_pipeline_without_records():
+    compiled_pipeline = compile_batch_pipeline(
+        steps=[echo_body], event_type=SqsRecordModel
+    )
+    with pytest.raises(PipelineBatchError):
+        _process(compiled_pipeline, event={})
+
+
+def _make_batch_step(batch_size=None, calls=None, error_on=None, n_results=None):
+    @batch_step(batch_size=batch_size)
+    def uppercase_bodies(
+        records: list[tuple[PipelineData, SqsRecordModel]],
+        context: LambdaContext,
+        dependencies: FrozenDict[str, Any],
+        logger: Logger,
+    ) -> list[PipelineData]:
+        if calls is not None:
+            calls.append([event.messageId for _, event in records])
+        if error_on and any(data["body"] == error_on for data, _ in records):
+            raise StepError(error_on)
+        results = [data.set("body", data["body"].upper()) for data, _ in records]
+        return results[:n_results]
+
+    return uppercase_bodies
+
+
+def add_suffix(
+    data: PipelineData,
+    event: SqsRecordModel,
+    context: LambdaContext,
+    dependencies: FrozenDict[str, Any],
+    logger: Logger,
+) -> PipelineData:
+    return data.set("body", data["body"] + "!")
+
+
+@pytest.mark.parametrize("max_concurrency", [1, 3])
+def test_batch_steps_are_chunked_and_mixed_with_record_steps(max_concurrency):
+    calls = []
+    compiled_pipeline = compile_batch_pipeline(
+        steps=[echo_body, _make_batch_step(calls=calls), add_suffix],
+        event_type=SqsRecordModel,
+        max_concurrency=max_concurrency,
+        batch_size=2,
+    )
+    outcomes = compiled_pipeline.run(
+        event=_sqs_event("a", "bad", "c", "d", "e", "f"),
+        context=LambdaContext(),
+        dependencies={},
+        logger=LOGGER,
+    )
+    assert sorted(calls) == [
+        ["message-0", "message-2"],
+        ["message-3", "message-4"],
+        ["message-5"],
+    ]
+    assert isinstance(outcomes[1], StepError)
+    assert [outcome["body"] for i, outcome in enumerate(outcomes) if i != 1] == [
+        "A!",
+        "C!",
+        "D!",
+        "E!",
+        "F!",
+    ]
+
+
+def test_batch_step_batch_size_overrides_the_pipeline():
+    calls = []
+    compiled_pipeline = compile_batch_pipeline(
+        steps=[echo_body, _make_batch_step(batch_size=3, calls=calls)],
+        event_type=SqsRecordModel,
+        batch_size=2,
+    )
+    _process(compiled_pipeline, event=_sqs_event("a", "b", "c", "d"))
+    assert list(map(len, calls)) == [3, 1]
+
+
+def test_batch_step_exception_fails_the_chunk():
+    compiled_pipeline = compile_batch_pipeline(
+        steps=[echo_body, _make_batch_step(error_on="c")],
+        event_type=SqsRecordModel,
+        batch_size=2,
+    )
+    response = _process(compiled_pipeline, event=_sqs_event("a", "b", "c", "d", "e"))
+    assert response == {
+        "batchItemFailures": [
+            {"itemIdentifier": "message-2"},
+            {"itemIdentifier": "message-3"},
+        ]
+    }
+
+
+@pytest.mark.parametrize("validation", ["full", "boundary", "off"])
+def test_batch_step_must_return_a_result_per_record(validation):
+    compiled_pipeline = compile_batch_pipeline(
+        steps=[echo_body, _make_batch_step(n_results=1)],
+        event_type=SqsRecordModel,
+        validation=validation,
+    )
+    outcomes = compiled_pipeline.run(
+        event=_sqs_event("a", "b"),
+        context=LambdaContext(),
+        dependencies={},
+        logger=LOGGER,
+    )
+    assert all(isinstance(outcome, PipelineStepOutputError) for outcome in outcomes)
+
+
+def test_batch_step_output_is_validated():
+    @batch_step()
+    def bad_output(
+        records: list[tuple[PipelineData, SqsRecordModel]],
+        context: LambdaContext,
+        dependencies: FrozenDict[str, Any],
+        logger: Logger,
+    ) -> list[PipelineData]:
+        return [data.to_dict() for data, _ in records]
+
+    compiled_pipeline = compile_batch_pipeline(
+        steps=[bad_output], event_type=SqsRecordModel, validation="boundary"
+    )
+    (outcome,) = compiled_pipeline.run(
+        event=_sqs_event("a"), context=LambdaContext(), dependencies={}, logger=LOGGER
+    )
+    assert isinstance(outcome, PipelineStepOutputError)
+
+
+def test_batch_step_signature_is_enforced():
+    @batch_step()
+    def wrong_signature(
+        records: list[PipelineData],
+        context: LambdaContext,
+        dependencies: FrozenDict[str, Any],
+        logger: Logger,
+    ) -> list[PipelineData]:
+        return [data for data in records]
+
+    with pytest.raises(PipelineSignatureError):
+        compile_batch_pipeline(steps=[wrong_signature], event_type=SqsRecordModel)
+
+
+def test_batch_steps_cannot_be_parallel():
+    with pytest.raises(PipelineBatchError):
+        compile_batch_pipeline(
+            steps=[parallel(echo_body, _make_batch_step())],
+            event_type=SqsRecordModel,
+        )
+
+
+def test_batch_step_deadline():
+    class Context(LambdaContext):
+        def get_remaining_time_in_millis(self) -> int:
+            return 50
+
+    @batch_step()
+    def save(
+        records: list[tuple[PipelineData, SqsRecordModel]],
+        context: LambdaContext,
+        dependencies: FrozenDict[str, Any],
+        logger: Logger,
+    ) -> list[PipelineData]:
+        return [data.set("saved", True) for data, _ in records]
+
+    @budget(ms=100, optional=True)
+    def enrich(
+        data: PipelineData,
+        event: SqsRecordModel,
+        context: LambdaContext,
+        dependencies: FrozenDict[str, Any],
+        logger: Logger,
+    ) -> PipelineData:
+        return data.set("enriched", True)
+
+    compiled_pipeline = compile_batch_pipeline(
+        steps=[enrich, budget(ms=100)(save)],
+        event_type=SqsRecordModel,
+        deadline_margin_ms=0,
+    )
+    response = compiled_pipeline.process(
+        event=_sqs_event("a", "b"),
+        context=Context(),
+        dependencies={},
+        logger=LOGGER,
+    )
+    assert response == {
+        "batchItemFailures": [
+            {"itemIdentifier": "message-0"},
+            {"itemIdentifier": "message-1"},
+        ]
+    }
+
+
+def skip_cached(
+    data: PipelineData,
+    event: SqsRecordModel,
+    context: LambdaContext,
+    dependencies: FrozenDict[str, Any],
+    logger: Logger,
+) -> PipelineData:
+    if event.body == "cached":
+        return PipelineResult.done(data.set("body", "from cache"))
+    return data
+
+
+@pytest.mark.parametrize("max_concurrency", [1, 3])
+def test_batch_pipeline_early_exit(max_concurrency):
+    calls = []
+    compiled_pipeline = compile_batch_pipeline(
+        steps=[skip_cached, echo_body, _make_batch_step(calls=calls), add_suffix],
+        event_type=SqsRecordModel,
+        max_concurrency=max_concurrency,
+    )
+    outcomes = compiled_pipeline.run(
+        event=_sqs_event("a", "cached", "c"),
+        context=LambdaContext(),
+        dependencies={},
+        logger=LOGGER,
+    )
+    # The record which ended early isn't passed to the later (batch) steps
+    assert calls == [["message-0", "message-2"]]
+    assert [outcome["body"] for outcome in outcomes] == ["A!", "from cache", "C!"]
+
+
+def test_batch_step_early_exit():
+    @batch_step()
+    def read_cache(
+        records: list[tuple[PipelineData, SqsRecordModel]],
+        context: LambdaContext,
+        dependencies: FrozenDict[str, Any],
+        logger: Logger,
+    ) -> list[PipelineData]:
+        return [
+            PipelineResult.done(data) if event.body == "cached" else data
+            for data, event in records
+        ]
+
+    compiled_pipeline = compile_batch_pipeline(
+        steps=[echo_body, read_cache, add_suffix], event_type=SqsRecordModel
+    )
+    outcomes = compiled_pipeline.run(
+        event=_sqs_event("a", "cached"),
+        context=LambdaContext(),
+        dependencies={},
+        logger=LOGGER,
+    )
+    assert [outcome["body"] for outcome in outcomes] == ["a!", "cached"]
@@ -0,0 +1,372 @@
+import asyncio
+from copy import deepcopy
+from functools import cache
+from logging import Logger, getLogger
+from typing import Any
+
+import pytest
+from aws_lambda_powertools.utilities.parser.models import (
+    APIGatewayProxyEventModel as EventModel,
+)
+from lambda_pipeline.async_pipeline import compile_async_pipeline
+from lambda_pipeline.cache import (
+    CacheInfo,
+    MemoryBackend,
+    PipelineCacheKeyError,
+    SqliteBackend,
+    _MISSING,
+    cached_step,
+)
+from lambda_pipeline.events import parse_event_lazily
+from lambda_pipeline.parallel import parallel
+from lambda_pipeline.pipeline import compile_pipeline
+from lambda_pipeline.tests.conftest import FakeClock, get_event
+from lambda_pipeline.types import (
+    FrozenDict,
+    LambdaContext,
+    PipelineData,
+    PipelineResult,
+)
+
+LOGGER = getLogger(__name__)
+
+
+def _make_step(calls: list, **cache_kwargs):
+    @cached_step(**cache_kwargs)
+    def introspect_token(
+        data: PipelineData,
+        event: EventModel,
+        context: LambdaContext,
+        dependencies: FrozenDict[str, Any],
+        logger: Logger,
+    ) -> PipelineData:
+        calls.append(data)
+        return data.set("token", f"token-{len(calls)}")
+
+    return introspect_token
+
+
+def _call(step, event, data=None):
+    return step(
+        data=PipelineData() if data is None else data,
+        event=event,
+        context=LambdaContext(),
+        dependencies=FrozenDict(),
+        logger=LOGGER,
+    )
+
+
+def test_cached_step(event):
+    calls = []
+    step = _make_step(calls=calls)
+
+    assert _call(step, event)["token"] == "token-1"
+    assert _call(step, event)["token"] == "token-1"
+    assert _call(step, event, data=PipelineData(a=1))["token"] == "token-2"
+    assert _call(step, event, data=PipelineData().set("a", 1))["token"] == "token-2"
+    assert len(calls) == 2
+    assert step.cache_info() == CacheInfo(
+        hits=2, misses=2, evictions=0, size=2, nbytes=0
+    )
+
+    step.cache_clear()
+    assert _call(step, event)["token"] == "token-3"
+    assert step.cache_info().hits == 0
+
+
+def test_cached_step_ttl(event):
+    clock = FakeClock()
+    calls = []
+    step = _make_step(calls=calls, ttl=10, clock=clock)
+
+    _call(step, event)
+    clock.now = 9.9
+    _call(step, event)
+    assert len(calls) == 1
+
+    clock.now = 10
+    assert _call(step, event)["token"] == "token-2"
+    assert len(calls) == 2
+
+
+def test_cached_step_lru_eviction(event):
+    calls = []
+    step = _make_step(calls=calls, maxsize=2)
+
+    _call(step, event, data=PipelineData(a=1))
+    _call(step, event, data=PipelineData(a=2))
+    _call(step, event, data=PipelineData(a=1))
+    _call(step, event, data=PipelineData(a=3))
+    assert step.cache_info().evictions == 1
+
+    _call(step, event, data=PipelineData(a=1))
+    assert len(calls) == 3
+    _call(step, event, data=PipelineData(a=2))
+    assert len(calls) == 4
+
+
+def test_memory_backend_max_bytes():
+    backend = MemoryBackend(maxsize=None, max_bytes=2000)
+    backend.set("small", "x" * 100, ttl=None)
+    backend.set("too big", "x" * 5000, ttl=None)
+    assert backend.stats()[1] == 1
+
+    for i in range(20):
+        backend.set(i, "x" * 100, ttl=None)
+    evictions, size, nbytes = backend.stats()
+    assert evictions > 0
+    assert nbytes <= 2000
+    assert backend.get(19) == "x" * 100
+
+
+def test_cached_step_key(event):
+    calls = []
+    step = _make_step(calls=calls, key=lambda data, event: event.headers.get("auth"))
+
+    _call(step, event, data=PipelineData(a=1))
+    _call(step, event, data=PipelineData(a=2))
+    assert len(calls) == 1
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_cached_step_default_key_ignores_the_request_context(lazy):
+    def parse(request_id: str, body: str):
+        raw_event = deepcopy(get_event())
+        raw_event["requestContext"]["requestId"] = request_id
+        raw_event["requestContext"]["requestTimeEpoch"] = len(request_id)
+        raw_event["headers"]["X-Amzn-Trace-Id"] = f"Root={request_id}"
+        raw_event["body"] = body
+        if lazy:
+            return parse_event_lazily(event_type=EventModel, event=raw_event)
+        return EventModel(**raw_event)
+
+    calls = []
+    step = _make_step(calls=calls)
+
+    event = parse(request_id="request-1", body="a")
+    _call(step, event)
+    # A lazily parsed event isn't validated to build the key
+    assert not lazy or not event.__dict__
+    _call(step, parse(request_id="request-2", body="a"))
+    assert len(calls) == 1
+    _call(step, parse(request_id="request-3", body="b"))
+    assert len(calls) == 2
+
+
+def test_cached_step_only_caches_changes(event):
+    calls = []
+    step = _make_step(calls=calls, key=lambda data, event: event.headers.get("auth"))
+
+    first = _call(step, event, data=PipelineData(doc_id="request-1-doc"))
+    second = _call(step, event, data=PipelineData(doc_id="request-2-doc"))
+    assert len(calls) == 1
+    assert first == PipelineData(doc_id="request-1-doc", token="token-1")
+    assert second == PipelineData(doc_id="request-2-doc", token="token-1")
+
+
+def test_cached_step_does_not_cache_removed_keys(event):
+    calls = []
+
+    @cached_step()
+    def drop_token(
+        data: PipelineData,
+        event: EventModel,
+        context: LambdaContext,
+        dependencies: FrozenDict[str, Any],
+        logger: Logger,
+    ) -> PipelineData:
+        calls.append(data)
+        return PipelineData(id=data["id"])
+
+    for _ in range(2):
+        result = _call(drop_token, event, data=PipelineData(id=1, token="t"))
+        assert result == PipelineData(id=1)
+    assert len(calls) == 2
+    assert drop_token.cache_info().size == 0
+
+
+def test_cached_step_unhashable_key(event):
+    step = _make_step(calls=[], key=lambda data, event: {"not": "hashable"})
+
+    with pytest.raises(PipelineCacheKeyError):
+        _call(step, event)
+
+
+def test_cached_steps_with_a_shared_backend_do_not_collide(event):
+    backend = MemoryBackend()
+    first_calls, second_calls = [], []
+    first_step = _make_step(calls=first_calls, backend=backend)
+
+    @cached_step(backend=backend)
+    def second_step(
+        data: PipelineData,
+        event: EventModel,
+        context: LambdaContext,
+        dependencies: FrozenDict[str, Any],
+        logger: Logger,
+    ) -> PipelineData:
+        second_calls.append(data)
+        return data.set("second", True)
+
+    assert "token" in _call(first_step, event)
+    assert "second" in _call(second_step, event)
+    assert len(first_calls) == len(second_calls) == 1
+
+
+@pytest.mark.parametrize("validation", ["full", "boundary", "off"])
+def test_compiled_pipeline_cache_info(event, validation):
+    calls = []
+    step = _make_step(calls=calls)
+    compiled_pipeline = compile_pipeline(
+        steps=[parallel(step)], event_type=EventModel, validation=validation
+    )
+
+    for _ in range(3):
+        pipeline = compiled_pipeline.bind(
+            event=event, context=LambdaContext(), dependencies={}, logger=LOGGER
+        )
+        assert pipeline(data=PipelineData())["token"] == "token-1"
+
+    assert compiled_pipeline.cache_info() == {
+        "introspect_token": CacheInfo(hits=2, misses=1, evictions=0, size=1, nbytes=0)
+    }
+
+
+def test_cached_async_step(event):
+    calls = []
+
+    @cached_step()
+    async def introspect_token(
+        data: PipelineData,
+        event: EventModel,
+        context: LambdaContext,
+        dependencies: FrozenDict[str, Any],
+        logger: Logger,
+    ) -> PipelineData:
+        calls.append(data)
+        return data.set("token", "token")
+
+    compiled_pipeline = compile_async_pipeline(
+        steps=[introspect_token], event_type=EventModel
+    )
+    pipeline = compiled_pipeline.bind(
+        event=event, context=LambdaContext(), dependencies={}, logger=LOGGER
+    )
+    for _ in range(2):
+        assert asyncio.run(pipeline(data=PipelineData()))["token"] == "token"
+    assert len(calls) == 1
+
+
+def test_cached_step_does_not_cache_streams(event):
+    calls = []
+
+    @cached_step()
+    def read_pages(
+        data: PipelineData,
+        event: EventModel,
+        context: LambdaContext,
+        dependencies: FrozenDict[str, Any],
+        logger: Logger,
+    ) -> PipelineData:
+        calls.append(data)
+        return data.set("pages", iter([1, 2]))
+
+    for _ in range(2):
+        assert list(_call(read_pages, event)["pages"]) == [1, 2]
+    assert len(calls) == 2
+    assert read_pages.cache_info().size == 0
+
+
+def test_sqlite_backend(tmp_path, event):
+    path = str(tmp_path / "cache.sqlite")
+    clock = FakeClock()
+    calls = []
+    step = _make_step(
+        calls=calls, ttl=10, backend=SqliteBackend(path=path, clock=clock)
+    )
+    _call(step, event, data=PipelineData(a=(1, 2), c=2))
+
+    # A new backend, e.g. in another process, on the same file
+    step = _make_step(
+        calls=calls, ttl=10, backend=SqliteBackend(path=path, clock=clock)
+    )
+    result = _call(step, event, data=PipelineData(c=2).set("a", (1, 2)))
+    assert result == PipelineData(a=(1, 2), c=2, token="token-1")
+    assert len(calls) == 1
+
+    clock.now = 10
+    _call(step, event, data=PipelineData(a=(1, 2), c=2))
+    assert len(calls) == 2
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_cached_step_keys_of_equal_data_match(tmp_path, event, backend):
+    calls = []
+    step = _make_step(
+        calls=calls,
+        backend=SqliteBackend(path=str(tmp_path / "cache.sqlite"))
+        if backend == "sqlite"
+        else None,
+    )
+    _call(step, event, data=PipelineData(a=[1, 2], b={3}))
+    # A FrozenList is equal to a tuple, and a FrozenSet to a frozenset
+    _call(step, event, data=PipelineData(a=(1, 2), b=frozenset({3})))
+    assert len(calls) == 1
+    _call(step, event, data=PipelineData(a=[2, 1], b={3}))
+    assert len(calls) == 2
+
+
+def test_sqlite_backend_lru_eviction(tmp_path):
+    clock = FakeClock()
+    backend = SqliteBackend(path=str(tmp_path / "cache.sqlite"), maxsize=2, clock=clock)
+    backend.set("a", "A", ttl=None)
+    clock.now = 1
+    backend.set("b", "B", ttl=None)
+    clock.now = 2
+    assert backend.get("a") == "A"
+    clock.now = 3
+    backend.set("c", "C", ttl=None)
+
+    evictions, size, _ = backend.stats()
+    assert (evictions, size) == (1, 2)
+    assert backend.get("b") is _MISSING
+    assert backend.get("a") == "A"
+    assert backend.get("c") == "C"
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_cached_step_early_exit(tmp_path, event, backend):
+    calls = []
+
+    @cached_step(
+        max_bytes=10_000,
+        backend=SqliteBackend(path=str(tmp_path / "cache.sqlite"))
+        if backend == "sqlite"
+        else None,
+    )
+    def read_response(
+        data: PipelineData,
+        event: EventModel,
+        context: LambdaContext,
+        dependencies: FrozenDict[str, Any],
+        logger: Logger,
+    ) -> PipelineData:
+        calls.append(data)
+        return PipelineResult.done(data.set("response", "cached"))
+
+    def render_response(
+        data: PipelineData,
+        event: EventModel,
+        context: LambdaContext,
+        dependencies: FrozenDict[str, Any],
+        logger: Logger,
+    ) -> PipelineData:
+        raise AssertionError("the pipeline should have ended")
+
+    pipeline = compile_pipeline(
+        steps=[read_response, render_response], event_type=EventModel
+    ).bind(event=event, context=LambdaContext(), dependencies={}, logger=LOGGER)
+    for _ in range(2):
+        assert pipeline(data=PipelineData()) == PipelineData(response="cached")
+    assert len(calls) == 1
+    assert read_response.cache_info().hits == 1
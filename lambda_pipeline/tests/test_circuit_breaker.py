@@ -0,0 +1,250 @@
+import asyncio
+import io
+import json
+from logging import Logger, getLogger
+from typing import Any
+
+import pytest
+from aws_lambda_powertools.utilities.parser.models import (
+    APIGatewayProxyEventModel as EventModel,
+)
+from lambda_pipeline.async_pipeline import compile_async_pipeline
+from lambda_pipeline.circuit_breaker import (
+    CircuitBreaker,
+    CircuitInfo,
+    CircuitOpenError,
+)
+from lambda_pipeline.instrumentation import (
+    CircuitStateChange,
+    EmbeddedMetricsObserver,
+    PipelineObserver,
+)
+from lambda_pipeline.parallel import parallel
+from lambda_pipeline.pipeline import compile_pipeline
+from lambda_pipeline.tests.conftest import FakeClock
+from lambda_pipeline.types import FrozenDict, LambdaContext, PipelineData
+
+LOGGER = getLogger(__name__)
+
+
+class DownstreamError(Exception):
+    pass
+
+
+class RecordingObserver(PipelineObserver):
+    def __init__(self):
+        self.changes = []
+
+    def on_circuit_state_change(self, change: CircuitStateChange):
+        self.changes.append((change.old_state, change.new_state))
+
+
+def _make_breaker(**kwargs):
+    clock, observer = FakeClock(), RecordingObserver()
+    breaker = CircuitBreaker(
+        "downstream",
+        window_size=4,
+        min_calls=4,
+        open_for_s=30,
+        observers=[observer],
+        clock=clock,
+        **kwargs,
+    )
+    return breaker, clock, observer
+
+
+def _make_step(breaker: CircuitBreaker, outcomes: list):
+    @breaker
+    def read_document(
+        data: PipelineData,
+        event: EventModel,
+        context: LambdaContext,
+        dependencies: FrozenDict[str, Any],
+        logger: Logger,
+    ) -> PipelineData:
+        if outcomes.pop(0):
+            raise DownstreamError("unavailable")
+        return data.set("read", True)
+
+    return read_document
+
+
+def _call(step):
+    return step(
+        data=PipelineData(),
+        event=None,
+        context=LambdaContext(),
+        dependencies=FrozenDict(),
+        logger=LOGGER,
+    )
+
+
+def test_circuit_breaker_opens_and_closes():
+    breaker, clock, observer = _make_breaker()
+    outcomes = [False, True, False, True, False]
+    step = _make_step(breaker, outcomes)
+
+    assert _call(step)["read"]
+    for _ in range(3):
+        try:
+            _call(step)
+        except DownstreamError:
+            pass
+    assert breaker.state == "open"
+
+    # Calls fail fast while the breaker is open, without calling the step
+    with pytest.raises(CircuitOpenError, match="circuit downstream is open"):
+        _call(step)
+    assert outcomes == [False]
+
+    clock.now = 30
+    assert breaker.state == "half_open"
+    assert _call(step)["read"]
+    assert breaker.state == "closed"
+    assert observer.changes == [
+        ("closed", "open"),
+        ("open", "half_open"),
+        ("half_open", "closed"),
+    ]
+    assert breaker.info() == CircuitInfo(
+        state="closed", failure_rate=None, calls=5, failures=2, rejected=1
+    )
+
+
+def test_circuit_breaker_failure_rate_window():
+    breaker, clock, _ = _make_breaker(failure_rate_threshold=0.75)
+    step = _make_step(breaker, [True, True, False, True] + [False] * 4)
+
+    for _ in range(4):
+        try:
+            _call(step)
+        except DownstreamError:
+            pass
+    assert breaker.state == "open"
+
+    breaker.reset()
+    assert breaker.info().failure_rate is None
+
+    # Old outcomes fall out of the window, so the breaker needs 'min_calls' again
+    breaker = CircuitBreaker("downstream", min_calls=2, window_s=10, clock=clock)
+    step = _make_step(breaker, [True, False, True])
+    with pytest.raises(DownstreamError):
+        _call(step)
+    clock.now += 10
+    _call(step)
+    with pytest.raises(DownstreamError):
+        _call(step)
+    assert breaker.state == "open"
+    assert breaker.info().failure_rate == 0.5
+
+    with pytest.raises(ValueError):
+        CircuitBreaker("downstream", min_calls=30)
+
+
+def test_circuit_breaker_reopens_after_a_failed_trial():
+    breaker, clock, observer = _make_breaker(half_open_calls=2)
+    step = _make_step(breaker, [True] * 4 + [False, True])
+    for _ in range(4):
+        with pytest.raises(DownstreamError):
+            _call(step)
+
+    clock.now = 30
+    assert _call(step)["read"]
+    assert breaker.state == "half_open"
+    with pytest.raises(DownstreamError):
+        _call(step)
+    assert breaker.state == "open"
+    assert observer.changes[-2:] == [("open", "half_open"), ("half_open", "open")]
+
+
+def test_circuit_breaker_ignores_other_exceptions():
+    breaker, _, _ = _make_breaker(failure_on=(DownstreamError,))
+
+    @breaker
+    def get_item(key: str):
+        raise KeyError(key)
+
+    for _ in range(10):
+        with pytest.raises(KeyError):
+            get_item("123")
+    assert breaker.info().state == "closed"
+
+
+def test_pipeline_with_circuit_breaker(event, caplog):
+    stream = io.StringIO()
+    breaker = CircuitBreaker(
+        "downstream",
+        min_calls=2,
+        observers=[EmbeddedMetricsObserver(pipeline="test", stream=stream)],
+    )
+    compiled_pipeline = compile_pipeline(
+        steps=[_make_step(breaker, [True, True])], event_type=EventModel
+    )
+
+    # The breaker's state is kept across invocations
+    for _ in range(2):
+        pipeline = compiled_pipeline.bind(
+            event=event, context=LambdaContext(), dependencies={}, logger=LOGGER
+        )
+        with pytest.raises(DownstreamError):
+            pipeline(data=PipelineData())
+    with pytest.raises(CircuitOpenError):
+        pipeline(data=PipelineData())
+
+    assert "circuit downstream changed from closed to open" in caplog.text
+    metrics = json.loads(stream.getvalue())
+    assert metrics["Circuit"] == "downstream"
+    assert metrics["State"] == "open"
+    assert metrics["CircuitStateChange"] == 1
+
+
+@pytest.mark.parametrize("in_parallel", [False, True])
+def test_circuit_state_changes_are_reported_to_the_pipelines_observers(
+    event, in_parallel
+):
+    breaker = CircuitBreaker("downstream", min_calls=2)
+    step = _make_step(breaker, [True, True])
+    observer = RecordingObserver()
+    compiled_pipeline = compile_pipeline(
+        steps=[parallel(step) if in_parallel else step],
+        event_type=EventModel,
+        observers=[observer],
+    )
+    pipeline = compiled_pipeline.bind(
+        event=event, context=LambdaContext(), dependencies={}, logger=LOGGER
+    )
+    for _ in range(2):
+        with pytest.raises(DownstreamError):
+            pipeline(data=PipelineData())
+    assert observer.changes == [("closed", "open")]
+
+    # Changes outside of an instrumented pipeline only go to the breaker's observers
+    breaker.reset()
+    assert observer.changes == [("closed", "open")]
+
+
+def test_async_pipeline_with_circuit_breaker(event):
+    breaker, clock, _ = _make_breaker()
+
+    @breaker
+    async def read_document(
+        data: PipelineData,
+        event: EventModel,
+        context: LambdaContext,
+        dependencies: FrozenDict[str, Any],
+        logger: Logger,
+    ) -> PipelineData:
+        await asyncio.sleep(0)
+        raise DownstreamError("unavailable")
+
+    compiled_pipeline = compile_async_pipeline(
+        steps=[read_document], event_type=EventModel
+    )
+    pipeline = compiled_pipeline.bind(
+        event=event, context=LambdaContext(), dependencies={}, logger=LOGGER
+    )
+    for _ in range(4):
+        with pytest.raises(DownstreamError):
+            asyncio.run(pipeline(data=PipelineData()))
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(pipeline(data=PipelineData()))
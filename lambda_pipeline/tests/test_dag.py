@@ -0,0 +1,205 @@
+import threading
+from logging import Logger, getLogger
+from typing import Any
+
+import pytest
+from aws_lambda_powertools.utilities.parser.models import (
+    APIGatewayProxyEventModel as EventModel,
+)
+from lambda_pipeline.dag import (
+    CompiledDagPipeline,
+    PipelineGraphError,
+    compile_dag_pipeline,
+    declare_io,
+)
+from lambda_pipeline.step_decorators import (
+    PipelineArgumentError,
+    PipelineStepOutputError,
+)
+from lambda_pipeline.types import (
+    FrozenDict,
+    LambdaContext,
+    PipelineData,
+    PipelineResult,
+)
+
+LOGGER = getLogger(__name__)
+
+
+class StepError(Exception):
+    pass
+
+
+def _bind(compiled_pipeline, event):
+    return compiled_pipeline.bind(
+        event=event, context=LambdaContext(), dependencies={}, logger=LOGGER
+    )
+
+
+def _make_step(name, reads=(), writes=(), barrier=None, error=None, declared=True):
+    def step(
+        data: PipelineData,
+        event: EventModel,
+        context: LambdaContext,
+        dependencies: FrozenDict[str, Any],
+        logger: Logger,
+    ) -> PipelineData:
+        if barrier:
+            barrier.wait()
+        if error:
+            raise error
+        value = "+".join([name, *(data[key] for key in sorted(reads))])
+        return data.update({key: value for key in writes})
+
+    step.__name__ = name
+    if declared:
+        step = declare_io(reads=reads, writes=writes)(step)
+    return step
+
+
+def test_compile_dag_pipeline(event):
+    barrier = threading.Barrier(2, timeout=5)
+    steps = [
+        _make_step("render", reads=("body",), writes=("response",)),
+        _make_step("read", reads=("a", "b"), writes=("body",)),
+        _make_step("first", reads=("input",), writes=("a",), barrier=barrier),
+        _make_step("second", writes=("b",), barrier=barrier),
+    ]
+    compiled_pipeline = compile_dag_pipeline(
+        steps=steps, event_type=EventModel, initial_keys=("input",)
+    )
+    assert isinstance(compiled_pipeline, CompiledDagPipeline)
+
+    result = _bind(compiled_pipeline, event)(data=PipelineData(input="x"))
+    assert result.to_dict() == {
+        "input": "x",
+        "a": "first+x",
+        "b": "second",
+        "body": "read+first+x+second",
+        "response": "render+read+first+x+second",
+    }
+
+
+def test_compile_dag_pipeline__undeclared_steps_are_barriers(event):
+    def replace_data(
+        data: PipelineData,
+        event: EventModel,
+        context: LambdaContext,
+        dependencies: FrozenDict[str, Any],
+        logger: Logger,
+    ) -> PipelineData:
+        return PipelineData(c=data["a"] + data["b"])
+
+    steps = [
+        _make_step("first", writes=("a",)),
+        _make_step("second", writes=("b",)),
+        replace_data,
+        _make_step("third", reads=("c",), writes=("a",)),
+    ]
+    result = _bind(compile_dag_pipeline(steps=steps, event_type=EventModel), event)(
+        data=PipelineData()
+    )
+    assert result.to_dict() == {"c": "firstsecond", "a": "third+firstsecond"}
+
+
+@pytest.mark.parametrize(
+    ("steps", "error_text"),
+    [
+        (
+            [_make_step("first", reads=("a",), writes=("b",))],
+            "step first reads 'a', which is not written by any step",
+        ),
+        (
+            [_make_step("first", writes=("a",)), _make_step("second", writes=("a",))],
+            "steps first and second both write 'a'",
+        ),
+        (
+            [
+                _make_step("first", reads=("b",), writes=("a",)),
+                _make_step("second", reads=("a",), writes=("b",)),
+                _make_step("third", reads=("a",), writes=("c",)),
+            ],
+            "steps first, second, third have cyclic dependencies",
+        ),
+    ],
+)
+def test_compile_dag_pipeline__graph_checked(steps, error_text):
+    with pytest.raises(PipelineGraphError, match=error_text):
+        compile_dag_pipeline(steps=steps, event_type=EventModel)
+
+
+def test_compile_dag_pipeline__initial_keys_checked(event):
+    steps = [_make_step("first", reads=("input",), writes=("a",))]
+    pipeline = _bind(
+        compile_dag_pipeline(
+            steps=steps, event_type=EventModel, initial_keys=("input",)
+        ),
+        event,
+    )
+    with pytest.raises(PipelineArgumentError):
+        pipeline(data=PipelineData())
+
+
+def test_compile_dag_pipeline__declared_writes_checked(event):
+    @declare_io(writes=("a",))
+    def bad_step(
+        data: PipelineData,
+        event: EventModel,
+        context: LambdaContext,
+        dependencies: FrozenDict[str, Any],
+        logger: Logger,
+    ) -> PipelineData:
+        return data
+
+    pipeline = _bind(
+        compile_dag_pipeline(steps=[bad_step], event_type=EventModel), event
+    )
+    with pytest.raises(PipelineStepOutputError):
+        pipeline(data=PipelineData())
+
+
+def test_compile_dag_pipeline__exception_priority(event):
+    barrier = threading.Barrier(2, timeout=5)
+    steps = [
+        _make_step("first", writes=("a",), barrier=barrier, error=StepError("first")),
+        _make_step("second", writes=("b",), barrier=barrier, error=StepError("2nd")),
+        _make_step("third", reads=("a", "b"), writes=("c",)),
+    ]
+    pipeline = _bind(compile_dag_pipeline(steps=steps, event_type=EventModel), event)
+    with pytest.raises(StepError, match="first"):
+        pipeline(data=PipelineData())
+
+
+def test_compile_dag_pipeline__early_exit(event):
+    @declare_io(reads=("input",), writes=("cached", "body"))
+    def read_cache(
+        data: PipelineData,
+        event: EventModel,
+        context: LambdaContext,
+        dependencies: FrozenDict[str, Any],
+        logger: Logger,
+    ) -> PipelineData:
+        if data["input"] == "hit":
+            # The step ends the pipeline, so it needn't write all of its keys
+            return PipelineResult.done(data.set("cached", True))
+        return data.update(cached=False, body="read")
+
+    steps = [
+        _make_step("render", reads=("body",), writes=("response",)),
+        read_cache,
+        _make_step("other", writes=("other",)),
+        _make_step("undeclared", declared=False),
+    ]
+    pipeline = _bind(
+        compile_dag_pipeline(
+            steps=steps, event_type=EventModel, initial_keys=("input",)
+        ),
+        event,
+    )
+    # Steps which are already running complete, but no more steps are started
+    assert pipeline(data=PipelineData(input="hit")).to_dict() == {
+        "input": "hit",
+        "cached": True,
+        "other": "other",
+    }
+    assert pipeline(data=PipelineData(input="miss"))["response"] == "render+read"
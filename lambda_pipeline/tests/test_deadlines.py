@@ -0,0 +1,161 @@
+import asyncio
+from logging import Logger, getLogger
+from typing import Any
+
+import pytest
+from aws_lambda_powertools.utilities.parser.models import (
+    APIGatewayProxyEventModel as EventModel,
+)
+from lambda_pipeline.async_pipeline import compile_async_pipeline
+from lambda_pipeline.deadlines import PipelineTimeoutError, budget
+from lambda_pipeline.parallel import parallel
+from lambda_pipeline.pipeline import compile_pipeline
+from lambda_pipeline.tests.conftest import FakeClock
+from lambda_pipeline.types import FrozenDict, LambdaContext, PipelineData
+
+LOGGER = getLogger(__name__)
+
+
+class FakeContext(LambdaContext):
+    """A LambdaContext whose remaining time is controlled by a FakeClock (in ms)"""
+
+    def __init__(self, timeout_ms: float, clock: FakeClock = None):
+        self.timeout_ms = timeout_ms
+        self.clock = FakeClock() if clock is None else clock
+
+    def get_remaining_time_in_millis(self) -> int:
+        return int(self.timeout_ms - self.clock.now)
+
+
+def _make_step(name: str, takes_ms: float):
+    def step(
+        data: PipelineData,
+        event: EventModel,
+        context: LambdaContext,
+        dependencies: FrozenDict[str, Any],
+        logger: Logger,
+    ) -> PipelineData:
+        context.clock.now += takes_ms
+        return data.set(name, True)
+
+    step.__name__ = name
+    return step
+
+
+def _run(compiled_pipeline, event, context):
+    pipeline = compiled_pipeline.bind(
+        event=event, context=context, dependencies={}, logger=LOGGER
+    )
+    return pipeline(data=PipelineData())
+
+
+@pytest.mark.parametrize("validation", ["full", "boundary", "off"])
+def test_deadline(event, validation):
+    compiled_pipeline = compile_pipeline(
+        steps=[_make_step("a", takes_ms=600), _make_step("b", takes_ms=0)],
+        event_type=EventModel,
+        validation=validation,
+        deadline_margin_ms=500,
+    )
+
+    assert set(_run(compiled_pipeline, event, FakeContext(1200))) == {"a", "b"}
+    with pytest.raises(PipelineTimeoutError, match="step b"):
+        _run(compiled_pipeline, event, FakeContext(1000))
+    with pytest.raises(PipelineTimeoutError, match="step a"):
+        _run(compiled_pipeline, event, FakeContext(500))
+
+
+def test_no_deadline_by_default(event):
+    compiled_pipeline = compile_pipeline(
+        steps=[_make_step("a", takes_ms=600)], event_type=EventModel
+    )
+    assert "a" in _run(compiled_pipeline, event, FakeContext(0))
+
+
+def test_budget(event):
+    compiled_pipeline = compile_pipeline(
+        steps=[
+            _make_step("a", takes_ms=100),
+            budget(ms=300, optional=True)(_make_step("optional", takes_ms=300)),
+            budget(ms=200)(_make_step("required", takes_ms=200)),
+            parallel(budget(optional=True)(_make_step("last", takes_ms=0))),
+        ],
+        event_type=EventModel,
+        deadline_margin_ms=10,
+    )
+
+    assert set(_run(compiled_pipeline, event, FakeContext(710))) == {
+        "a",
+        "optional",
+        "required",
+        "last",
+    }
+    # The optional step is skipped, leaving enough time for the required step
+    assert set(_run(compiled_pipeline, event, FakeContext(360))) == {
+        "a",
+        "required",
+        "last",
+    }
+    assert set(_run(compiled_pipeline, event, FakeContext(310))) == {"a", "required"}
+    with pytest.raises(PipelineTimeoutError, match="step required needs 200ms"):
+        _run(compiled_pipeline, event, FakeContext(260))
+    with pytest.raises(ValueError):
+        budget(ms=-1)
+
+
+def _make_async_step(name: str, sleep_s: float):
+    async def step(
+        data: PipelineData,
+        event: EventModel,
+        context: LambdaContext,
+        dependencies: FrozenDict[str, Any],
+        logger: Logger,
+    ) -> PipelineData:
+        await asyncio.sleep(sleep_s)
+        return data.set(name, True)
+
+    step.__name__ = name
+    return step
+
+
+def test_no_deadline_if_the_remaining_time_is_unknown(event):
+    @budget(ms=300)
+    def a(
+        data: PipelineData,
+        event: EventModel,
+        context: LambdaContext,
+        dependencies: FrozenDict[str, Any],
+        logger: Logger,
+    ) -> PipelineData:
+        return data.set("a", True)
+
+    # powertools' LambdaContext is a stub, whose remaining time is always 0
+    compiled_pipeline = compile_pipeline(
+        steps=[a], event_type=EventModel, deadline_margin_ms=500
+    )
+    assert "a" in _run(compiled_pipeline, event, LambdaContext())
+
+    compiled_pipeline = compile_async_pipeline(
+        steps=[budget(ms=300)(_make_async_step("a", sleep_s=0))],
+        event_type=EventModel,
+        deadline_margin_ms=500,
+    )
+    assert "a" in asyncio.run(_run(compiled_pipeline, event, LambdaContext()))
+
+
+def test_async_steps_are_cancelled(event):
+    compiled_pipeline = compile_async_pipeline(
+        steps=[
+            budget(ms=20, optional=True)(_make_async_step("optional", sleep_s=1)),
+            _make_async_step("slow", sleep_s=1),
+        ],
+        event_type=EventModel,
+        deadline_margin_ms=0,
+    )
+    pipeline = compiled_pipeline.bind(
+        event=event, context=FakeContext(50), dependencies={}, logger=LOGGER
+    )
+    with pytest.raises(
+        PipelineTimeoutError, match="step slow was cancelled after 50ms"
+    ):
+        asyncio.run(pipeline(data=PipelineData()))
@@ -0,0 +1,235 @@
+import asyncio
+import threading
+from logging import Logger, getLogger
+from typing import Any
+
+import pytest
+from aws_lambda_powertools.utilities.parser.models import (
+    APIGatewayProxyEventModel as EventModel,
+)
+from lambda_pipeline.async_pipeline import compile_async_pipeline
+from lambda_pipeline.dependencies import (
+    DependencyContainer,
+    PipelineDependencyError,
+    ResourcePool,
+    lazy,
+)
+from lambda_pipeline.parallel import parallel
+from lambda_pipeline.pipeline import compile_pipeline
+from lambda_pipeline.tests.conftest import FakeClock
+from lambda_pipeline.types import FrozenDict, LambdaContext, PipelineData
+
+LOGGER = getLogger(__name__)
+
+
+class Client:
+    def __init__(self, calls: list):
+        calls.append(self)
+        self.healthy = True
+
+
+def test_dependency_container():
+    calls = []
+    dependencies = DependencyContainer(
+        {"client": lazy(lambda: Client(calls)), "config": {"table": ["a"]}}
+    )
+
+    assert list(dependencies) == ["client", "config"]
+    assert "client" in dependencies and len(dependencies) == 2
+    assert dependencies["config"] == FrozenDict(table=["a"])
+    assert not calls
+    assert not dependencies.info()["client"].initialised
+
+    assert dependencies["client"] is dependencies["client"] is calls[0]
+    info = dependencies.info()["client"]
+    assert (info.initialised, info.inits, info.refreshes) == (True, 1, 0)
+    assert info.init_seconds == info.last_init_seconds > 0
+    with pytest.raises(KeyError):
+        dependencies["missing"]
+
+
+def test_dependency_container__resources_are_not_frozen():
+    pages = iter([1, 2])
+    config = {"tables": ["a"]}
+    dependencies = DependencyContainer(
+        {"pages": lazy(lambda: pages), "config": lazy(lambda: config)}
+    )
+
+    assert dependencies["pages"] is pages
+    assert dependencies["config"] is config
+    assert isinstance(dependencies, FrozenDict)
+    assert not hasattr(dependencies, "_d")
+    assert not hasattr(dependencies, "__dict__")
+    assert dependencies == dependencies and dependencies != FrozenDict()
+
+
+def test_dependency_container__factory_raises():
+    def factory():
+        raise ConnectionError("nope")
+
+    dependencies = DependencyContainer({"client": lazy(factory)})
+    with pytest.raises(PipelineDependencyError):
+        dependencies["client"]
+    with pytest.raises(ValueError):
+        lazy(factory, pool_size=0)
+
+
+def test_dependency_container__health_check():
+    calls = []
+    clock = FakeClock()
+    dependencies = DependencyContainer(
+        {
+            "client": lazy(
+                lambda: Client(calls),
+                health_check=lambda client: client.healthy,
+                check_interval=10,
+            )
+        },
+        clock=clock,
+    )
+
+    client = dependencies["client"]
+    client.healthy = False
+    clock.now = 9
+    assert dependencies["client"] is client
+
+    clock.now = 10
+    assert dependencies["client"] is calls[1]
+    assert dependencies.info()["client"].refreshes == 1
+
+
+def test_dependency_container__max_age_and_refresh():
+    clock = FakeClock()
+    dependencies = DependencyContainer(
+        {
+            "token": lazy(
+                lambda: "token-0",
+                refresh=lambda token: f"token-{int(token[-1]) + 1}",
+                max_age=60,
+            )
+        },
+        clock=clock,
+    )
+
+    assert dependencies["token"] == "token-0"
+    clock.now = 60
+    assert dependencies["token"] == "token-1"
+    assert dependencies["token"] == "token-1"
+    assert dependencies.info()["token"].inits == 2
+
+
+def test_resource_pool():
+    calls = []
+    dependencies = DependencyContainer({"db": lazy(lambda: Client(calls), pool_size=2)})
+    pool = dependencies["db"]
+    assert isinstance(pool, ResourcePool)
+    assert not calls
+
+    in_use, barrier = [], threading.Barrier(2)
+
+    def use():
+        with pool.acquire() as client:
+            in_use.append(client)
+            barrier.wait(timeout=5)
+
+    threads = [threading.Thread(target=use) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(map(id, in_use))) == 2
+
+    with pool.acquire() as first:
+        with pool.acquire() as second:
+            assert {id(first), id(second)} == set(map(id, calls))
+    assert len(calls) == 2
+
+
+def test_resource_pool__acquire_async():
+    calls = []
+    pool = DependencyContainer({"db": lazy(lambda: Client(calls), pool_size=1)})["db"]
+    order = []
+
+    async def use(name):
+        async with pool.acquire_async() as client:
+            order.append((name, client))
+            await asyncio.sleep(0.01)
+
+    async def main():
+        await asyncio.gather(use("a"), use("b"))
+
+    asyncio.run(main())
+    assert [name for name, _ in order] == ["a", "b"]
+    assert len(calls) == 1
+
+
+def _read_client(
+    data: PipelineData,
+    event: EventModel,
+    context: LambdaContext,
+    dependencies: FrozenDict[str, Any],
+    logger: Logger,
+) -> PipelineData:
+    return data.set("client", id(dependencies["client"]))
+
+
+@pytest.mark.parametrize("validation", ["full", "boundary", "off"])
+def test_pipeline_with_dependency_container(event, validation):
+    calls, unused_calls = [], []
+    dependencies = DependencyContainer(
+        {
+            "client": lazy(lambda: Client(calls)),
+            "unused": lazy(lambda: Client(unused_calls)),
+        }
+    )
+    compiled_pipeline = compile_pipeline(
+        steps=[parallel(_read_client), _read_client],
+        event_type=EventModel,
+        validation=validation,
+    )
+
+    for _ in range(2):
+        pipeline = compiled_pipeline.bind(
+            event=event,
+            context=LambdaContext(),
+            dependencies=dependencies,
+            logger=LOGGER,
+        )
+        assert pipeline(data=PipelineData())["client"] == id(calls[0])
+    assert len(calls) == 1
+    assert not unused_calls
+
+
+def _make_async_step(key: str):
+    async def read_db(
+        data: PipelineData,
+        event: EventModel,
+        context: LambdaContext,
+        dependencies: FrozenDict[str, Any],
+        logger: Logger,
+    ) -> PipelineData:
+        async with dependencies["db"].acquire_async() as client:
+            await asyncio.sleep(0.01)
+            return data.set(key, id(client))
+
+    return read_db
+
+
+def test_async_pipeline_with_dependency_container(event):
+    calls = []
+    dependencies = DependencyContainer({"db": lazy(lambda: Client(calls), pool_size=2)})
+    compiled_pipeline = compile_async_pipeline(
+        steps=[parallel(_make_async_step("a"), _make_async_step("b"))],
+        event_type=EventModel,
+    )
+
+    for _ in range(2):
+        pipeline = compiled_pipeline.bind(
+            event=event,
+            context=LambdaContext(),
+            dependencies=dependencies,
+            logger=LOGGER,
+        )
+        result = asyncio.run(pipeline(data=PipelineData()))
+        assert result["a"] != result["b"]
+    assert len(calls) == 2
@@ -0,0 +1,130 @@
+import json
+import pickle
+from logging import Logger, getLogger
+from typing import Any
+
+import pytest
+from aws_lambda_powertools.utilities.parser.models import (
+    APIGatewayProxyEventModel as EventModel,
+)
+from lambda_pipeline.events import (
+    PipelineEventError,
+    get_event_type,
+    lazy_event_type,
+    parse_event_lazily,
+)
+from lambda_pipeline.pipeline import compile_pipeline, make_pipeline
+from lambda_pipeline.tests.conftest import get_event
+from lambda_pipeline.types import FrozenDict, LambdaContext, PipelineData
+from pydantic import BaseModel, ValidationError, root_validator
+
+LOGGER = getLogger(__name__)
+
+
+@pytest.fixture()
+def raw_event():
+    return json.loads(json.dumps(get_event()))
+
+
+def read_path(
+    data: PipelineData,
+    event: EventModel,
+    context: LambdaContext,
+    dependencies: FrozenDict[str, Any],
+    logger: Logger,
+) -> PipelineData:
+    return data.set("path", event.path)
+
+
+def test_parse_event_lazily(raw_event):
+    event = parse_event_lazily(event_type=EventModel, event=raw_event)
+
+    assert isinstance(event, EventModel)
+    assert get_event_type(event) is EventModel
+    assert get_event_type(EventModel(**raw_event)) is EventModel
+    assert event.__dict__ == {}
+    assert event.path == "/"
+    assert list(event.__dict__) == ["path"]
+    assert event.requestContext.requestId == raw_event["requestContext"]["requestId"]
+    assert event == EventModel(**raw_event)
+    assert list(event.__dict__) == list(EventModel.__fields__)
+    assert event.json() == EventModel(**raw_event).json()
+
+
+def test_parse_event_lazily__fields_are_validated_on_access(raw_event):
+    raw_event["httpMethod"] = "NOT A METHOD"
+    event = parse_event_lazily(event_type=EventModel, event=raw_event)
+
+    assert event.path == "/"
+    with pytest.raises(ValidationError):
+        event.httpMethod
+
+
+def test_parse_event_lazily__missing_required_fields(raw_event):
+    del raw_event["path"]
+    with pytest.raises(ValidationError):
+        parse_event_lazily(event_type=EventModel, event=raw_event)
+
+
+def test_parse_event_lazily__copies_the_raw_event(raw_event):
+    event = parse_event_lazily(event_type=EventModel, event=raw_event)
+    raw_event["path"] = "/changed"
+    del raw_event["headers"]
+
+    assert event.path == "/"
+    assert event.headers == EventModel(**get_event()).headers
+
+
+def test_parse_event_lazily__is_immutable(raw_event):
+    event = parse_event_lazily(event_type=EventModel, event=raw_event)
+    with pytest.raises(TypeError):
+        event.path = "/elsewhere"
+    with pytest.raises(AttributeError):
+        event.not_a_field
+
+
+def test_parse_event_lazily__copies(raw_event):
+    event = parse_event_lazily(event_type=EventModel, event=raw_event)
+    event.headers
+
+    assert EventModel.validate(event) is event
+    assert event.copy() == event
+    assert event.copy(update={"path": "/elsewhere"}).path == "/elsewhere"
+    assert pickle.loads(pickle.dumps(event)) == event
+
+
+def test_lazy_event_type__root_validators():
+    class Model(BaseModel):
+        a: int
+
+        @root_validator
+        def check(cls, values):
+            return values
+
+    with pytest.raises(PipelineEventError):
+        lazy_event_type(Model)
+
+
+@pytest.mark.parametrize("validation", ["full", "boundary", "off"])
+def test_compiled_pipeline_with_lazy_event(raw_event, validation):
+    compiled_pipeline = compile_pipeline(
+        steps=[read_path, read_path], event_type=EventModel, validation=validation
+    )
+    event = parse_event_lazily(event_type=EventModel, event=raw_event)
+    pipeline = compiled_pipeline.bind(
+        event=event, context=LambdaContext(), dependencies={}, logger=LOGGER
+    )
+
+    assert pipeline(data=PipelineData()) == PipelineData(path="/")
+    assert list(event.__dict__) == ["path"]
+
+
+def test_make_pipeline_with_lazy_event(raw_event):
+    pipeline = make_pipeline(
+        steps=[read_path],
+        event=parse_event_lazily(event_type=EventModel, event=raw_event),
+        context=LambdaContext(),
+        dependencies={},
+        logger=LOGGER,
+    )
+    assert pipeline(data=PipelineData()) == PipelineData(path="/")
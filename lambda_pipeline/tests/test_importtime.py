@@ -0,0 +1,82 @@
+import pytest
+from lambda_pipeline.importtime import (
+    ImportBudgetError,
+    ImportProfile,
+    check_import_budget,
+    format_tree,
+    parse_importtime,
+)
+
+IMPORTTIME_OUTPUT = """\
+import time: self [us] | cumulative | imported package
+import time:       250 |        250 |   lambda_pipeline
+import time:       500 |        500 |       json.decoder
+import time:       600 |       1100 |     json
+import time:       700 |        700 |     lambda_pipeline.types
+import time:      1000 |       2800 |   lambda_pipeline.parallel
+import time:      3000 |       6050 | lambda_pipeline.pipeline
+import time:       100 |        100 | lambda_pipeline.extra
+"""
+
+
+def test_parse_importtime():
+    pipeline, extra = parse_importtime(IMPORTTIME_OUTPUT)
+
+    assert pipeline.name == "lambda_pipeline.pipeline"
+    assert pipeline.self_time == 3000e-6
+    assert pipeline.cumulative_time == 6050e-6
+    assert [child.name for child in pipeline.children] == [
+        "lambda_pipeline",
+        "lambda_pipeline.parallel",
+    ]
+    parallel = pipeline.children[1]
+    assert [child.name for child in parallel.children] == [
+        "json",
+        "lambda_pipeline.types",
+    ]
+    assert [child.name for child in parallel.children[0].children] == ["json.decoder"]
+    assert extra.name == "lambda_pipeline.extra"
+    assert extra.children == []
+
+
+def test_import_profile():
+    profile = ImportProfile(
+        module="lambda_pipeline.pipeline", nodes=parse_importtime(IMPORTTIME_OUTPUT)
+    )
+
+    assert profile.total_time == pytest.approx(6150e-6)
+    assert profile.imports("json")
+    assert profile.imports("lambda_pipeline")
+    assert not profile.imports("lambda_pipeline.par")
+    assert not profile.imports("pydantic")
+
+
+def test_format_tree():
+    tree = format_tree(nodes=parse_importtime(IMPORTTIME_OUTPUT), min_ms=0.6)
+
+    assert [line.split()[-1] for line in tree.splitlines()] == [
+        "lambda_pipeline.pipeline",
+        "lambda_pipeline.parallel",
+        "json",
+        "lambda_pipeline.types",
+    ]
+    assert tree.splitlines()[1].endswith("    lambda_pipeline.parallel")
+
+
+def test_importing_the_pipeline_is_lazy():
+    check_import_budget(
+        module="lambda_pipeline.pipeline",
+        forbid=("pydantic", "aws_lambda_powertools", "asyncio"),
+        budget_ms=500,
+        repeat=1,
+    )
+
+
+def test_check_import_budget_over_budget():
+    with pytest.raises(ImportBudgetError):
+        check_import_budget(module="lambda_pipeline.types", budget_ms=0, repeat=1)
+
+
+def test_check_import_budget_import_error():
+    with pytest.raises(ImportError):
+        check_import_budget(module="lambda_pipeline.does_not_exist", repeat=1)
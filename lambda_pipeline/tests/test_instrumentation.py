@@ -0,0 +1,284 @@
+import asyncio
+import json
+import logging
+from logging import Logger, getLogger
+from typing import Any
+
+import pytest
+from aws_lambda_powertools.utilities.parser.models import (
+    APIGatewayProxyEventModel as EventModel,
+)
+from lambda_pipeline.async_pipeline import compile_async_pipeline
+from lambda_pipeline.instrumentation import (
+    EmbeddedMetricsObserver,
+    InvocationReport,
+    LoggingObserver,
+    PipelineObserver,
+    StepRecord,
+)
+from lambda_pipeline.parallel import parallel
+from lambda_pipeline.pipeline import compile_pipeline, make_pipeline
+from lambda_pipeline.types import (
+    FrozenDict,
+    LambdaContext,
+    PipelineData,
+    PipelineResult,
+)
+
+LOGGER = getLogger(__name__)
+
+
+class CollectingObserver(PipelineObserver):
+    def __init__(self):
+        self.calls = []
+        self.reports = []
+
+    def before_step(self, name: str, report: InvocationReport):
+        self.calls.append(("before_step", name))
+
+    def after_step(self, record: StepRecord, report: InvocationReport):
+        self.calls.append(("after_step", record.name))
+
+    def after_pipeline(self, report: InvocationReport):
+        self.reports.append(report)
+
+
+def _bind(compiled_pipeline, event):
+    return compiled_pipeline.bind(
+        event=event, context=LambdaContext(), dependencies={}, logger=LOGGER
+    )
+
+
+def first_step(
+    data: PipelineData,
+    event: EventModel,
+    context: LambdaContext,
+    dependencies: FrozenDict[str, Any],
+    logger: Logger,
+) -> PipelineData:
+    return data.set("first", [0] * 10000)
+
+
+def second_step(
+    data: PipelineData,
+    event: EventModel,
+    context: LambdaContext,
+    dependencies: FrozenDict[str, Any],
+    logger: Logger,
+) -> PipelineData:
+    return data.set("second", True)
+
+
+def failing_step(
+    data: PipelineData,
+    event: EventModel,
+    context: LambdaContext,
+    dependencies: FrozenDict[str, Any],
+    logger: Logger,
+) -> PipelineData:
+    raise ValueError("oops")
+
+
+async def async_step(
+    data: PipelineData,
+    event: EventModel,
+    context: LambdaContext,
+    dependencies: FrozenDict[str, Any],
+    logger: Logger,
+) -> PipelineData:
+    await asyncio.sleep(0)
+    return data.set("async", True)
+
+
+@pytest.mark.parametrize("validation", ["full", "boundary", "off"])
+def test_instrumentation(event, validation):
+    observer = CollectingObserver()
+    pipeline = _bind(
+        compile_pipeline(
+            steps=[first_step, second_step],
+            event_type=EventModel,
+            validation=validation,
+            observers=[observer],
+        ),
+        event,
+    )
+    for _ in range(2):
+        pipeline(data=PipelineData())
+
+    assert observer.calls == 2 * [
+        ("before_step", "first_step"),
+        ("after_step", "first_step"),
+        ("before_step", "second_step"),
+        ("after_step", "second_step"),
+    ]
+    assert len(observer.reports) == 2
+    report = observer.reports[0]
+    assert [record.name for record in report.steps] == ["first_step", "second_step"]
+    for record in report.steps:
+        assert 0 < record.user_time <= record.wall_time
+        assert record.framework_time == record.wall_time - record.user_time
+        assert record.memory_delta is None
+    assert report.user_time + report.framework_time <= report.wall_time
+    assert report.error is None
+
+
+def test_instrumentation__trace_memory(event):
+    observer = CollectingObserver()
+    pipeline = _bind(
+        compile_pipeline(
+            steps=[first_step],
+            event_type=EventModel,
+            observers=[observer],
+            trace_memory=True,
+        ),
+        event,
+    )
+    pipeline(data=PipelineData())
+    (record,) = observer.reports[0].steps
+    assert record.memory_delta >= 80000
+    assert record.memory_peak >= record.memory_delta
+
+
+def test_instrumentation__error(event):
+    observer = CollectingObserver()
+    pipeline = _bind(
+        compile_pipeline(
+            steps=[first_step, failing_step, second_step],
+            event_type=EventModel,
+            observers=[observer],
+        ),
+        event,
+    )
+    with pytest.raises(ValueError):
+        pipeline(data=PipelineData())
+
+    (report,) = observer.reports
+    assert report.error == "ValueError"
+    assert [(record.name, record.error) for record in report.steps] == [
+        ("first_step", None),
+        ("failing_step", "ValueError"),
+    ]
+
+
+def test_instrumentation__parallel(event):
+    observer = CollectingObserver()
+    pipeline = _bind(
+        compile_pipeline(
+            steps=[parallel(first_step, second_step)],
+            event_type=EventModel,
+            observers=[observer],
+        ),
+        event,
+    )
+    pipeline(data=PipelineData())
+    names = {record.name for record in observer.reports[0].steps}
+    assert names == {"first_step", "second_step"}
+
+
+def test_instrumentation__async(event):
+    observer = CollectingObserver()
+    pipeline = _bind(
+        compile_async_pipeline(
+            steps=[async_step, second_step],
+            event_type=EventModel,
+            observers=[observer],
+        ),
+        event,
+    )
+    asyncio.run(pipeline(data=PipelineData()))
+    (report,) = observer.reports
+    assert [record.name for record in report.steps] == ["async_step", "second_step"]
+    assert all(record.user_time > 0 for record in report.steps)
+
+
+def test_logging_observer(event, caplog):
+    pipeline = _bind(
+        compile_pipeline(
+            steps=[first_step],
+            event_type=EventModel,
+            observers=[LoggingObserver(logger=LOGGER)],
+        ),
+        event,
+    )
+    with caplog.at_level(logging.INFO):
+        pipeline(data=PipelineData())
+
+    (message,) = caplog.messages
+    assert message.startswith("pipeline report: ")
+    report = json.loads(message[len("pipeline report: ") :])
+    assert report["steps"][0]["name"] == "first_step"
+
+
+def test_make_pipeline__verbose(event, caplog):
+    pipeline = make_pipeline(
+        steps=[first_step],
+        event=event,
+        context=LambdaContext(),
+        dependencies={},
+        logger=LOGGER,
+        verbose=True,
+    )
+    with caplog.at_level(logging.INFO):
+        pipeline(data=PipelineData())
+    assert caplog.messages[0].startswith("pipeline report: ")
+
+
+def test_embedded_metrics_observer(event, capsys):
+    pipeline = _bind(
+        compile_pipeline(
+            steps=[first_step, second_step],
+            event_type=EventModel,
+            observers=[EmbeddedMetricsObserver(pipeline="test")],
+            trace_memory=True,
+        ),
+        event,
+    )
+    pipeline(data=PipelineData())
+
+    lines = capsys.readouterr().out.splitlines()
+    documents = list(map(json.loads, lines))
+    assert len(documents) == 3
+
+    first, _, total = documents
+    (metric_directive,) = first["_aws"]["CloudWatchMetrics"]
+    assert metric_directive["Namespace"] == "LambdaPipeline"
+    assert metric_directive["Dimensions"] == [["Pipeline", "Step"]]
+    for metric in metric_directive["Metrics"]:
+        assert metric["Name"] in first
+    assert first["Pipeline"] == "test"
+    assert first["Step"] == "first_step"
+    assert first["StepMemoryDelta"] > 0
+
+    assert total["_aws"]["CloudWatchMetrics"][0]["Dimensions"] == [["Pipeline"]]
+    assert total["PipelineWallTime"] >= total["PipelineUserTime"]
+
+
+def cache_hit(
+    data: PipelineData,
+    event: EventModel,
+    context: LambdaContext,
+    dependencies: FrozenDict[str, Any],
+    logger: Logger,
+) -> PipelineData:
+    return PipelineResult.done(data.set("cached", True))
+
+
+@pytest.mark.parametrize("validation", ["full", "boundary", "off"])
+def test_instrumentation__early_exit(event, validation):
+    observer = CollectingObserver()
+    pipeline = _bind(
+        compile_pipeline(
+            steps=[parallel(second_step, cache_hit), failing_step],
+            event_type=EventModel,
+            validation=validation,
+            observers=[observer],
+        ),
+        event,
+    )
+    assert pipeline(data=PipelineData()) == PipelineData(second=True, cached=True)
+
+    (report,) = observer.reports
+    assert {record.name for record in report.steps} == {"second_step", "cache_hit"}
+    assert report.ended_by == "cache_hit"
+    assert report.to_dict()["ended_by"] == "cache_hit"
+    assert report.error is None
@@ -0,0 +1,259 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from logging import Logger, getLogger
+from typing import Any
+
+import pytest
+from aws_lambda_powertools.utilities.parser.models import (
+    APIGatewayProxyEventModel as EventModel,
+)
+from lambda_pipeline import parallel as parallel_module
+from lambda_pipeline.async_pipeline import compile_async_pipeline
+from lambda_pipeline.parallel import (
+    PipelineMergeConflictError,
+    merge_results,
+    parallel,
+)
+from lambda_pipeline.pipeline import compile_pipeline
+from lambda_pipeline.types import (
+    FrozenDict,
+    LambdaContext,
+    PipelineData,
+    PipelineResult,
+)
+
+LOGGER = getLogger(__name__)
+
+
+class FirstError(Exception):
+    pass
+
+
+class SecondError(Exception):
+    pass
+
+
+def _bind(compiled_pipeline, event):
+    return compiled_pipeline.bind(
+        event=event, context=LambdaContext(), dependencies={}, logger=LOGGER
+    )
+
+
+def _make_steps(first_error=None, second_error=None):
+    barrier = threading.Barrier(2, timeout=5)
+
+    def first_step(
+        data: PipelineData,
+        event: EventModel,
+        context: LambdaContext,
+        dependencies: FrozenDict[str, Any],
+        logger: Logger,
+    ) -> PipelineData:
+        barrier.wait()
+        if first_error:
+            raise first_error
+        return data.set("first", threading.get_ident())
+
+    def second_step(
+        data: PipelineData,
+        event: EventModel,
+        context: LambdaContext,
+        dependencies: FrozenDict[str, Any],
+        logger: Logger,
+    ) -> PipelineData:
+        barrier.wait()
+        if second_error:
+            raise second_error
+        return data.set("second", threading.get_ident())
+
+    return first_step, second_step
+
+
+def test_merge_results():
+    data = PipelineData(foo="bar", spam="eggs", ham="ham")
+    results = [
+        data,
+        data.set("new", "value"),
+        PipelineData(foo="bar", spam="changed"),
+    ]
+    assert merge_results(data=data, results=results).to_dict() == {
+        "foo": "bar",
+        "spam": "changed",
+        "new": "value",
+    }
+
+
+@pytest.mark.parametrize(
+    ("conflict", "expected_value"), [("first", "first"), ("last", "last")]
+)
+def test_merge_results__conflict(conflict, expected_value):
+    data = PipelineData(foo="bar")
+    results = [data.set("foo", "first"), data.set("foo", "last")]
+    merged = merge_results(data=data, results=results, conflict=conflict)
+    assert merged["foo"] == expected_value
+
+
+def test_merge_results__conflict_error():
+    data = PipelineData(foo="bar")
+    results = [data.set("foo", "first"), data.set("foo", "last")]
+    with pytest.raises(PipelineMergeConflictError):
+        merge_results(data=data, results=results)
+
+
+def test_merge_results__same_value_is_not_a_conflict():
+    data = PipelineData()
+    results = [data.set("foo", {"a": 1}), data.set("foo", {"a": 1})]
+    assert merge_results(data=data, results=results) == PipelineData(foo={"a": 1})
+
+
+def test_merge_results__set_and_removed():
+    data = PipelineData(foo="bar", spam="eggs")
+    set_foo, remove_foo = data.set("foo", "set"), PipelineData(spam="eggs")
+
+    for results in ([set_foo, remove_foo], [remove_foo, set_foo]):
+        with pytest.raises(PipelineMergeConflictError, match="set and removed 'foo'"):
+            merge_results(data=data, results=results)
+        first = merge_results(data=data, results=results, conflict="first")
+        last = merge_results(data=data, results=results, conflict="last")
+        assert first == (results[0] if results[0] is set_foo else remove_foo)
+        assert last == (results[1] if results[1] is set_foo else remove_foo)
+
+
+def test_parallel__invalid_conflict():
+    with pytest.raises(ValueError):
+        parallel(*_make_steps(), conflict="not a conflict policy")
+
+
+def test_parallel__empty_group():
+    with pytest.raises(ValueError, match="at least one step"):
+        parallel()
+
+
+def test_parallel__nested_groups_do_not_deadlock(event, monkeypatch):
+    # A pool with a single thread, which the nested groups would wait on
+    monkeypatch.setattr(
+        parallel_module,
+        "_EXECUTOR",
+        ThreadPoolExecutor(max_workers=1, initializer=parallel_module._mark_worker),
+    )
+
+    def _make_step(name):
+        def step(
+            data: PipelineData,
+            event: EventModel,
+            context: LambdaContext,
+            dependencies: FrozenDict[str, Any],
+            logger: Logger,
+        ) -> PipelineData:
+            return data.set(name, threading.current_thread().name)
+
+        step.__name__ = name
+        return step
+
+    group = parallel(
+        _make_step("a"),
+        parallel(_make_step("b"), _make_step("c")),
+        parallel(_make_step("d"), _make_step("e")),
+    )
+    pipeline = _bind(compile_pipeline(steps=[group], event_type=EventModel), event)
+    result = pipeline(data=PipelineData())
+    assert set(result) == {"a", "b", "c", "d", "e"}
+    assert result["b"] == result["c"] != result["a"]
+
+
+def test_parallel(event):
+    first_step, second_step = _make_steps()
+    group = parallel(first_step, second_step)
+    assert group.__name__ == "parallel(first_step, second_step)"
+
+    pipeline = _bind(compile_pipeline(steps=[group], event_type=EventModel), event)
+    result = pipeline(data=PipelineData(foo="bar"))
+    assert result["foo"] == "bar"
+    assert result["first"] != result["second"]
+
+
+@pytest.mark.parametrize(
+    ("first_error", "second_error", "expected_error"),
+    [
+        (FirstError(), None, FirstError),
+        (None, SecondError(), SecondError),
+        (FirstError(), SecondError(), FirstError),
+    ],
+)
+def test_parallel__exception_priority(event, first_error, second_error, expected_error):
+    steps = _make_steps(first_error=first_error, second_error=second_error)
+    pipeline = _bind(
+        compile_pipeline(steps=[parallel(*steps)], event_type=EventModel), event
+    )
+    with pytest.raises(expected_error):
+        pipeline(data=PipelineData())
+
+
+def test_parallel__async(event):
+    started = []
+
+    def _make_async_step(name):
+        async def step(
+            data: PipelineData,
+            event: EventModel,
+            context: LambdaContext,
+            dependencies: FrozenDict[str, Any],
+            logger: Logger,
+        ) -> PipelineData:
+            started.append(name)
+            await asyncio.sleep(0)
+            assert len(started) == 2
+            return data.set(name, True)
+
+        step.__name__ = name
+        return step
+
+    first_step, second_step = _make_steps()
+    group = parallel(
+        _make_async_step("first_async"),
+        _make_async_step("second_async"),
+        parallel(first_step, second_step),
+    )
+    pipeline = _bind(
+        compile_async_pipeline(steps=[group], event_type=EventModel), event
+    )
+    result = asyncio.run(pipeline(data=PipelineData()))
+    assert set(result) == {"first_async", "second_async", "first", "second"}
+
+
+def test_parallel__async_exception_priority(event):
+    steps = _make_steps(first_error=FirstError(), second_error=SecondError())
+    pipeline = _bind(
+        compile_async_pipeline(steps=[parallel(*steps)], event_type=EventModel),
+        event,
+    )
+    with pytest.raises(FirstError):
+        asyncio.run(pipeline(data=PipelineData()))
+
+
+def _make_step(name: str, done: bool = False):
+    def step(
+        data: PipelineData,
+        event: EventModel,
+        context: LambdaContext,
+        dependencies: FrozenDict[str, Any],
+        logger: Logger,
+    ) -> PipelineData:
+        data = data.set(name, True)
+        return PipelineResult.done(data) if done else data
+
+    step.__name__ = name
+    return step
+
+
+def test_parallel__early_exit(event):
+    steps = [
+        parallel(_make_step("first"), _make_step("cache_hit", done=True)),
+        _make_step("last"),
+    ]
+    pipeline = _bind(compile_pipeline(steps=steps, event_type=EventModel), event)
+    assert set(pipeline(data=PipelineData())) == {"first", "cache_hit"}
+
+    pipeline = _bind(compile_async_pipeline(steps=steps, event_type=EventModel), event)
+    assert set(asyncio.run(pipeline(data=PipelineData()))) == {"first", "cache_hit"}
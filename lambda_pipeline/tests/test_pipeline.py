@@ -1,42 +1,32 @@
-import json
-from functools import cache
 from logging import Logger, getLogger
-from pathlib import Path
 from types import FunctionType
-from typing import Any
+from typing import Any, TypedDict
 
 import pytest
 from aws_lambda_powertools.utilities.parser.models import (
     APIGatewayProxyEventModel as EventModel,
 )
 from lambda_pipeline.pipeline import (
+    CompiledPipeline,
     LambdaContext,
     _chain_steps,
     _decorate_step,
     _make_template_step,
+    compile_pipeline,
     make_pipeline,
 )
 from lambda_pipeline.step_decorators import (
+    PipelineArgumentError,
     PipelineSignatureError,
     PipelineStepOutputError,
 )
-from lambda_pipeline.types import FrozenDict, PipelineData
+from lambda_pipeline.tests.conftest import get_event
+from lambda_pipeline.types import FrozenDict, PipelineData, PipelineResult
 from pydantic import ValidationError
 
 LOGGER = getLogger(__name__)
 
 
-@cache
-def _get_event():
-    with open(Path(__file__).parent / "event.json") as f:
-        return json.load(f)
-
-
-@pytest.fixture()
-def event():
-    return EventModel(**_get_event())
-
-
 @pytest.fixture()
 def context():
     return LambdaContext()
@@ -268,7 +258,7 @@ def test_make_pipeline__step_signature_enforced(event, context):
     [
         {
             "steps": ["not a FunctionType"],
-            "event": event,
+            "event": EventModel(**get_event()),
             "context": context,
             "dependencies": dependencies,
             "logger": LOGGER,
@@ -282,21 +272,21 @@ def test_make_pipeline__step_signature_enforced(event, context):
         },
         {
             "steps": steps,
-            "event": event,
+            "event": EventModel(**get_event()),
             "context": "not a LambdaContext",
             "dependencies": dependencies,
             "logger": LOGGER,
         },
         {
             "steps": steps,
-            "event": event,
+            "event": EventModel(**get_event()),
             "context": context,
             "dependencies": "not a dict-like",
             "logger": LOGGER,
         },
         {
             "steps": steps,
-            "event": event,
+            "event": EventModel(**get_event()),
             "context": context,
             "dependencies": dependencies,
             "logger": "not a logger",
@@ -328,3 +318,250 @@ def test_make_pipeline__output_is_data_pipeline(event, context):
     )
     with pytest.raises(PipelineStepOutputError):
         pipeline(data=PipelineData())
+
+
+@pytest.mark.parametrize("validation", ["full", "boundary", "off"])
+def test_compile_pipeline(steps, event, context, dependencies, validation):
+    compiled_pipeline = compile_pipeline(
+        steps=steps, event_type=EventModel, validation=validation
+    )
+    assert isinstance(compiled_pipeline, CompiledPipeline)
+
+    for input_data in ("foo", "bar"):
+        pipeline = compiled_pipeline.bind(
+            event=event,
+            context=context,
+            dependencies=dependencies,
+            logger=LOGGER,
+        )
+        result = pipeline(data=PipelineData(input_data=input_data))
+        assert result.to_dict() == {
+            "first_step_result": input_data.title(),
+            "third_step_result": f"{input_data.upper()} bar",
+        }
+
+
+def test_compile_pipeline__step_signature_enforced_at_compile_time():
+    with pytest.raises(PipelineSignatureError):
+        compile_pipeline(steps=[lambda x: x], event_type=EventModel)
+
+
+def test_compile_pipeline__arguments_validated():
+    with pytest.raises(ValidationError):
+        compile_pipeline(steps=["not a FunctionType"], event_type=EventModel)
+
+
+def test_compile_pipeline__context_mutations_not_persisted(event):
+    def mutate_some_state(
+        data: PipelineData,
+        event: EventModel,
+        context: LambdaContext,
+        dependencies: FrozenDict[str, Any],
+        logger: Logger,
+    ) -> PipelineData:
+        assert context._function_name == "spam, eggs"
+        context._function_name = "foo, bar"
+        return PipelineData()
+
+    context = LambdaContext()
+    context._function_name = "spam, eggs"
+    pipeline = compile_pipeline(
+        steps=[mutate_some_state, mutate_some_state], event_type=EventModel
+    ).bind(event=event, context=context, dependencies={}, logger=LOGGER)
+    pipeline(data=PipelineData())
+    assert context._function_name == "spam, eggs"
+
+
+def test_compile_pipeline__unknown_validation_mode(steps):
+    with pytest.raises(ValidationError):
+        compile_pipeline(steps=steps, event_type=EventModel, validation="some")
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"event": "not an EventModel"},
+        {"context": "not a LambdaContext"},
+        {"dependencies": "not a dict-like"},
+        {"logger": "not a logger"},
+    ],
+)
+def test_compile_pipeline__boundary_arguments_validated(
+    steps, event, context, dependencies, kwargs
+):
+    compiled_pipeline = compile_pipeline(
+        steps=steps, event_type=EventModel, validation="boundary"
+    )
+    bind_kwargs = {
+        "event": event,
+        "context": context,
+        "dependencies": dependencies,
+        "logger": LOGGER,
+        **kwargs,
+    }
+    with pytest.raises(PipelineArgumentError):
+        compiled_pipeline.bind(**bind_kwargs)
+
+
+def test_compile_pipeline__boundary_data_validated(steps, event, context):
+    pipeline = compile_pipeline(
+        steps=steps, event_type=EventModel, validation="boundary"
+    ).bind(event=event, context=context, dependencies={}, logger=LOGGER)
+    with pytest.raises(PipelineArgumentError):
+        pipeline(data={"input_data": "foo"})
+
+
+@pytest.mark.parametrize("validation", ["full", "boundary"])
+def test_compile_pipeline__output_is_data_pipeline(event, context, validation):
+    def bad_step(
+        data: PipelineData,
+        event: EventModel,
+        context: LambdaContext,
+        dependencies: FrozenDict[str, Any],
+        logger: Logger,
+    ) -> PipelineData:
+        return "not a data pipeline"
+
+    pipeline = compile_pipeline(
+        steps=[bad_step], event_type=EventModel, validation=validation
+    ).bind(event=event, context=context, dependencies={}, logger=LOGGER)
+    with pytest.raises(PipelineStepOutputError):
+        pipeline(data=PipelineData())
+
+
+def test_compile_pipeline__validation_off(event, context):
+    def unchecked_step(
+        data: PipelineData,
+        event: EventModel,
+        context: LambdaContext,
+        dependencies: FrozenDict[str, Any],
+        logger: Logger,
+    ) -> PipelineData:
+        return "not a data pipeline"
+
+    pipeline = compile_pipeline(
+        steps=[unchecked_step], event_type=EventModel, validation="off"
+    ).bind(event=event, context=context, dependencies={}, logger=LOGGER)
+    assert pipeline(data=PipelineData()) == "not a data pipeline"
+
+
+@pytest.mark.parametrize("validation", ["full", "boundary", "off"])
+def test_compile_pipeline__streams_are_consumed_lazily(event, context, validation):
+    produced = []
+
+    def read_pages(
+        data: PipelineData,
+        event: EventModel,
+        context: LambdaContext,
+        dependencies: FrozenDict[str, Any],
+        logger: Logger,
+    ) -> PipelineData:
+        def pages():
+            for i in range(3):
+                produced.append(i)
+                yield {"page": i}
+
+        return data.set("pages", pages())
+
+    def count_pages(
+        data: PipelineData,
+        event: EventModel,
+        context: LambdaContext,
+        dependencies: FrozenDict[str, Any],
+        logger: Logger,
+    ) -> PipelineData:
+        return data.set("pages", data["pages"].map(lambda page: page["page"] * 10))
+
+    pipeline = compile_pipeline(
+        steps=[read_pages, count_pages], event_type=EventModel, validation=validation
+    ).bind(event=event, context=context, dependencies={}, logger=LOGGER)
+    result = pipeline(data=PipelineData())
+
+    assert produced == []
+    assert list(result["pages"]) == [0, 10, 20]
+    assert produced == [0, 1, 2]
+
+
+class NotModifiedSchema(TypedDict):
+    etag: str
+
+
+def _make_early_exit_steps(calls: list):
+    def check_etag(
+        data: PipelineData,
+        event: EventModel,
+        context: LambdaContext,
+        dependencies: FrozenDict[str, Any],
+        logger: Logger,
+    ) -> PipelineData[NotModifiedSchema]:
+        calls.append("check_etag")
+        if data["etag"] == "unchanged":
+            # The required keys of the output schema needn't be written
+            return PipelineResult.done(PipelineData(status_code=304))
+        return data.set("etag", data["etag"])
+
+    def read_document(
+        data: PipelineData[NotModifiedSchema],
+        event: EventModel,
+        context: LambdaContext,
+        dependencies: FrozenDict[str, Any],
+        logger: Logger,
+    ) -> PipelineData:
+        calls.append("read_document")
+        return data.set("status_code", 200)
+
+    return [check_etag, read_document]
+
+
+@pytest.mark.parametrize("validation", ["full", "boundary", "off"])
+def test_compile_pipeline__early_exit(event, context, validation):
+    calls = []
+    compiled_pipeline = compile_pipeline(
+        steps=_make_early_exit_steps(calls=calls),
+        event_type=EventModel,
+        validation=validation,
+        initial_keys=("etag",),
+    )
+    pipeline = compiled_pipeline.bind(
+        event=event, context=context, dependencies={}, logger=LOGGER
+    )
+
+    assert pipeline(data=PipelineData(etag="unchanged")) == PipelineData(
+        status_code=304
+    )
+    assert calls == ["check_etag"]
+    assert pipeline(data=PipelineData(etag="changed"))["status_code"] == 200
+    assert calls == ["check_etag", "check_etag", "read_document"]
+
+
+@pytest.mark.parametrize("validation", ["full", "boundary"])
+def test_compile_pipeline__early_exit_output_is_validated(event, context, validation):
+    def bad_step(
+        data: PipelineData,
+        event: EventModel,
+        context: LambdaContext,
+        dependencies: FrozenDict[str, Any],
+        logger: Logger,
+    ) -> PipelineData:
+        return PipelineResult.done({"status_code": 304})
+
+    pipeline = compile_pipeline(
+        steps=[bad_step], event_type=EventModel, validation=validation
+    ).bind(event=event, context=context, dependencies={}, logger=LOGGER)
+    with pytest.raises(PipelineStepOutputError, match="PipelineResult.done"):
+        pipeline(data=PipelineData())
+
+
+def test__chain_steps__keep_result(event, context, dependencies):
+    chain = _chain_steps(
+        steps=_make_early_exit_steps(calls=[]),
+        event=event,
+        context=context,
+        dependencies=dependencies,
+        logger=LOGGER,
+        keep_result=True,
+    )
+    assert chain(data=PipelineData(etag="unchanged")) == PipelineResult.done(
+        PipelineData(status_code=304)
+    )
+    assert chain(data=PipelineData(etag="changed"))["status_code"] == 200
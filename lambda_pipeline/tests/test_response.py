@@ -0,0 +1,143 @@
+import json
+import tracemalloc
+
+import pytest
+from lambda_pipeline.response import (
+    STREAMING_PRELUDE_DELIMITER,
+    get_serializer,
+    iter_json,
+    json_serializer,
+    render_response,
+    stream_body,
+    stream_response,
+)
+from lambda_pipeline.types import PipelineData, StreamConsumedError
+
+BODY = {"id": 123, "tags": ["a"], "flags": {"x"}, "nested": {"pair": (1, {2: "b"})}}
+EXPECTED_BODY = {
+    "id": 123,
+    "tags": ["a"],
+    "flags": ["x"],
+    "nested": {"pair": [1, {"2": "b"}]},
+}
+
+
+@pytest.fixture(params=["json", "orjson"])
+def serializer(request):
+    if request.param == "orjson":
+        pytest.importorskip("orjson")
+    return get_serializer(request.param)
+
+
+def test_serializer_serialises_frozen_values(serializer):
+    data = PipelineData(body=BODY).set("extra", 1)
+
+    assert json.loads(serializer(data["body"])) == EXPECTED_BODY
+    assert json.loads(serializer(data)) == {"body": EXPECTED_BODY, "extra": 1}
+
+
+def test_serializer_unserialisable_value(serializer):
+    with pytest.raises(TypeError):
+        serializer({"value": object()})
+
+
+def test_get_serializer():
+    assert get_serializer("json") is json_serializer
+    assert get_serializer() is get_serializer()
+    with pytest.raises(ValueError):
+        get_serializer("pickle")
+
+
+def test_render_response(serializer):
+    data = PipelineData(body=BODY)
+
+    response = render_response(body=data["body"], serializer=serializer)
+    assert json.loads(response.pop("body")) == EXPECTED_BODY
+    assert response == {
+        "statusCode": 200,
+        "headers": {"Content-Type": "application/json"},
+        "isBase64Encoded": False,
+    }
+
+
+def test_render_response_string_body():
+    response = render_response(
+        body="not found", status_code=404, headers={"Content-Type": "text/plain"}
+    )
+    assert response == {
+        "statusCode": 404,
+        "headers": {"Content-Type": "text/plain"},
+        "body": "not found",
+        "isBase64Encoded": False,
+    }
+
+
+def _documents(n: int, size: int = 100):
+    return ({"id": i, "content": "x" * size} for i in range(n))
+
+
+def test_iter_json(serializer):
+    data = PipelineData(
+        body={"count": 2, "items": _documents(2, size=1), "nested": {"s": iter("ab")}}
+    )
+
+    assert json.loads("".join(iter_json(data["body"], serializer=serializer))) == {
+        "count": 2,
+        "items": [{"id": 0, "content": "x"}, {"id": 1, "content": "x"}],
+        "nested": {"s": ["a", "b"]},
+    }
+    with pytest.raises(StreamConsumedError):
+        list(data["body"]["items"])
+    assert "".join(iter_json(PipelineData(items=iter([]))["items"])) == "[]"
+
+
+def test_iter_json_batches_array_items(serializer):
+    items = [{"id": i} if i % 300 else {"ids": iter([i])} for i in range(1000)]
+
+    assert json.loads("".join(iter_json(iter(items), serializer=serializer))) == [
+        {"id": i} if i % 300 else {"ids": [i]} for i in range(1000)
+    ]
+
+
+def test_stream_body_chunks(serializer):
+    body = PipelineData(body=_documents(1000))["body"]
+
+    chunks = list(stream_body(body, serializer=serializer, chunk_size=1000))
+    assert all(len(chunk) >= 1000 for chunk in chunks[:-1])
+    assert len(chunks) > 10
+    assert len(json.loads(b"".join(chunks))) == 1000
+
+
+def test_stream_body_does_not_build_the_body():
+    body = PipelineData(body=_documents(10_000, size=1000))["body"]
+
+    tracemalloc.start()
+    try:
+        size = sum(map(len, stream_body(body)))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert size > 10_000_000
+    assert peak < size // 4
+
+
+def test_stream_response():
+    response = b"".join(
+        stream_response(
+            body={"items": iter([1, 2])},
+            status_code=201,
+            headers={"Content-Type": "application/json", "X-Stream": "1"},
+        )
+    )
+    prelude, body = response.split(STREAMING_PRELUDE_DELIMITER)
+    assert json.loads(prelude) == {
+        "statusCode": 201,
+        "headers": {"Content-Type": "application/json", "X-Stream": "1"},
+    }
+    assert json.loads(body) == {"items": [1, 2]}
+
+
+def test_render_response_materialises_streams():
+    data = PipelineData(body={"items": iter([1, 2])})
+    response = render_response(body=data["body"])
+    assert json.loads(response["body"]) == {"items": [1, 2]}
@@ -0,0 +1,233 @@
+import asyncio
+import itertools
+import time
+from logging import Logger, getLogger
+from typing import Any
+
+import pytest
+from aws_lambda_powertools.utilities.parser.models import (
+    APIGatewayProxyEventModel as EventModel,
+)
+from lambda_pipeline.async_pipeline import compile_async_pipeline
+from lambda_pipeline.pipeline import compile_pipeline
+from lambda_pipeline.retry import HedgeInfo, hedge, retry
+from lambda_pipeline.types import ContextView, FrozenDict, LambdaContext, PipelineData
+
+LOGGER = getLogger(__name__)
+
+
+class FlakyError(Exception):
+    pass
+
+
+class Context(LambdaContext):
+    def __init__(self, remaining_ms: int = 10_000):
+        self.remaining_ms = remaining_ms
+
+    def get_remaining_time_in_millis(self) -> int:
+        return self.remaining_ms
+
+
+def _make_flaky_step(calls: list, failures: int, exc_type=FlakyError, **retry_kwargs):
+    @retry(**retry_kwargs)
+    def read_document(
+        data: PipelineData,
+        event: EventModel,
+        context: LambdaContext,
+        dependencies: FrozenDict[str, Any],
+        logger: Logger,
+    ) -> PipelineData:
+        calls.append(data)
+        if len(calls) <= failures:
+            raise exc_type("flaked out")
+        return data.set("attempts", len(calls))
+
+    return read_document
+
+
+def _call(step, context=None):
+    return step(
+        data=PipelineData(),
+        event=None,
+        context=Context() if context is None else context,
+        dependencies=FrozenDict(),
+        logger=LOGGER,
+    )
+
+
+def test_retry():
+    calls, sleeps = [], []
+    step = _make_flaky_step(
+        calls=calls, failures=3, max_attempts=4, jitter=False, sleep=sleeps.append
+    )
+
+    assert _call(step)["attempts"] == 4
+    assert sleeps == [0.05, 0.1, 0.2]
+
+
+def test_retry__gives_up():
+    calls, sleeps = [], []
+    step = _make_flaky_step(calls=calls, failures=3, sleep=sleeps.append)
+    with pytest.raises(FlakyError):
+        _call(step)
+    assert len(calls) == 3
+    assert all(0 <= sleep <= 0.1 for sleep in sleeps)
+
+    calls.clear()
+    step = _make_flaky_step(
+        calls=calls, failures=1, exc_type=KeyError, retry_on=(FlakyError,)
+    )
+    with pytest.raises(KeyError):
+        _call(step)
+    assert len(calls) == 1
+
+    with pytest.raises(ValueError):
+        retry(max_attempts=0)
+
+
+def test_retry__respects_remaining_time():
+    calls = []
+    step = _make_flaky_step(
+        calls=calls, failures=1, jitter=False, min_remaining_ms=100, sleep=bool
+    )
+    with pytest.raises(FlakyError):
+        _call(step, context=Context(remaining_ms=150))
+    assert len(calls) == 1
+
+    calls.clear()
+    assert _call(step, context=Context(remaining_ms=151))["attempts"] == 2
+
+    calls.clear()
+    step = _make_flaky_step(calls=calls, failures=1, min_remaining_ms=None, sleep=bool)
+    assert _call(step, context=Context(remaining_ms=150))["attempts"] == 2
+
+
+@pytest.mark.parametrize(
+    "context",
+    [LambdaContext(), ContextView(LambdaContext()), object(), Context(remaining_ms=0)],
+)
+def test_retry__remaining_time_is_unknown(context):
+    # e.g. powertools' LambdaContext, whose get_remaining_time_in_millis returns 0
+    calls = []
+    step = _make_flaky_step(calls=calls, failures=1, sleep=bool)
+    assert _call(step, context=context)["attempts"] == 2
+
+
+@pytest.mark.parametrize("validation", ["full", "boundary", "off"])
+def test_pipeline_with_retries(event, validation):
+    calls = []
+    compiled_pipeline = compile_pipeline(
+        steps=[_make_flaky_step(calls=calls, failures=2, sleep=bool)],
+        event_type=EventModel,
+        validation=validation,
+    )
+    pipeline = compiled_pipeline.bind(
+        event=event, context=Context(), dependencies={}, logger=LOGGER
+    )
+    assert pipeline(data=PipelineData())["attempts"] == 3
+
+
+def test_async_pipeline_with_retries(event):
+    calls = []
+
+    @retry(backoff_ms=1)
+    async def read_document(
+        data: PipelineData,
+        event: EventModel,
+        context: LambdaContext,
+        dependencies: FrozenDict[str, Any],
+        logger: Logger,
+    ) -> PipelineData:
+        calls.append(data)
+        if len(calls) < 3:
+            raise FlakyError("flaked out")
+        return data.set("attempts", len(calls))
+
+    compiled_pipeline = compile_async_pipeline(
+        steps=[read_document], event_type=EventModel
+    )
+    pipeline = compiled_pipeline.bind(
+        event=event, context=Context(), dependencies={}, logger=LOGGER
+    )
+    assert asyncio.run(pipeline(data=PipelineData()))["attempts"] == 3
+
+
+def _make_slow_step(latencies_s):
+    latencies_s = iter(latencies_s)
+    counter = itertools.count()
+
+    @hedge(after_ms=20, min_samples=5)
+    def read_document(
+        data: PipelineData,
+        event: EventModel,
+        context: LambdaContext,
+        dependencies: FrozenDict[str, Any],
+        logger: Logger,
+    ) -> PipelineData:
+        attempt = next(counter)
+        time.sleep(next(latencies_s))
+        return data.set("attempt", attempt)
+
+    return read_document
+
+
+def test_hedge():
+    step = _make_slow_step(latencies_s=[0.5, 0])
+
+    started = time.perf_counter()
+    assert _call(step)["attempt"] == 1
+    assert time.perf_counter() - started < 0.4
+    assert step.hedge_info() == HedgeInfo(
+        calls=1, hedged=1, hedge_wins=1, threshold_ms=20
+    )
+
+
+def test_hedge__threshold_is_a_percentile_of_the_latency():
+    step = _make_slow_step(latencies_s=[0] * 5 + [0.05, 0.2])
+    for _ in range(5):
+        _call(step)
+    threshold_ms = step.hedge_info().threshold_ms
+    assert threshold_ms < 20
+
+    # A call slower than the threshold is hedged, and the first attempt wins
+    # since the second attempt is slower
+    assert _call(step)["attempt"] == 5
+    assert step.hedge_info().hedged == 1
+
+    with pytest.raises(ValueError):
+        hedge(percentile=1)
+
+
+def test_hedge__without_a_threshold():
+    step = hedge()(_make_slow_step(latencies_s=[0]).__wrapped__)
+    assert _call(step)["attempt"] == 0
+    assert step.hedge_info() == HedgeInfo(
+        calls=1, hedged=0, hedge_wins=0, threshold_ms=None
+    )
+
+
+def test_hedge_async(event):
+    delays = iter([0.5, 0])
+
+    @hedge(after_ms=20)
+    async def read_document(
+        data: PipelineData,
+        event: EventModel,
+        context: LambdaContext,
+        dependencies: FrozenDict[str, Any],
+        logger: Logger,
+    ) -> PipelineData:
+        delay = next(delays)
+        await asyncio.sleep(delay)
+        return data.set("delay", delay)
+
+    compiled_pipeline = compile_async_pipeline(
+        steps=[read_document], event_type=EventModel
+    )
+    pipeline = compiled_pipeline.bind(
+        event=event, context=Context(), dependencies={}, logger=LOGGER
+    )
+    started = time.perf_counter()
+    assert asyncio.run(pipeline(data=PipelineData()))["delay"] == 0
+    assert time.perf_counter() - started < 0.4
+    assert read_document.hedge_info().hedge_wins == 1
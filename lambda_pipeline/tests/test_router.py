@@ -0,0 +1,243 @@
+import asyncio
+from logging import Logger, getLogger
+from typing import Any
+
+import pytest
+from aws_lambda_powertools.utilities.parser.models import (
+    APIGatewayProxyEventModel as EventModel,
+)
+from aws_lambda_powertools.utilities.parser.models import SqsRecordModel
+from lambda_pipeline.async_pipeline import CompiledAsyncPipeline
+from lambda_pipeline.batch import compile_batch_pipeline
+from lambda_pipeline.instrumentation import (
+    InvocationReport,
+    PipelineObserver,
+    StepRecord,
+)
+from lambda_pipeline.parallel import parallel
+from lambda_pipeline.pipeline import CompiledPipeline
+from lambda_pipeline.router import (
+    Router,
+    RouteNotFoundError,
+    get_event_source,
+)
+from lambda_pipeline.tests.conftest import get_event
+from lambda_pipeline.types import FrozenDict, LambdaContext, PipelineData
+
+LOGGER = getLogger(__name__)
+
+
+def _event(method: str, path: str, resource: str = "/{proxy+}", **overrides) -> dict:
+    return dict(
+        get_event(), httpMethod=method, path=path, resource=resource, **overrides
+    )
+
+
+def _make_step(name: str):
+    def step(
+        data: PipelineData,
+        event: EventModel,
+        context: LambdaContext,
+        dependencies: FrozenDict[str, Any],
+        logger: Logger,
+    ) -> PipelineData:
+        return data.set("steps", (*data.get("steps", ()), name))
+
+    step.__name__ = name
+    return step
+
+
+authorise = _make_step("authorise")
+
+
+@pytest.fixture()
+def router():
+    router = Router(event_type=EventModel, common_steps=[authorise])
+    router.add_route("GET", "/documents/{id}", steps=[_make_step("read_document")])
+    router.add_route("GET", "/documents/search", steps=[_make_step("search")])
+    router.add_route("POST", "/documents", steps=[_make_step("create_document")])
+    router.add_route(
+        "GET", "/documents/{id}/versions/{version}", steps=[_make_step("read_version")]
+    )
+    router.add_route("ANY", "/files/{path+}", steps=[_make_step("read_file")])
+    return router
+
+
+@pytest.mark.parametrize(
+    ("method", "path", "route", "path_parameters"),
+    [
+        ("GET", "/documents/123", "GET /documents/{id}", {"id": "123"}),
+        ("GET", "/documents/search", "GET /documents/search", {}),
+        ("POST", "/documents", "POST /documents", {}),
+        (
+            "GET",
+            "/documents/123/versions/2",
+            "GET /documents/{id}/versions/{version}",
+            {"id": "123", "version": "2"},
+        ),
+        ("DELETE", "/files/a/b.txt", "ANY /files/{path+}", {"path": "a/b.txt"}),
+    ],
+)
+def test_router_matches_paths(router, method, path, route, path_parameters):
+    match = router.resolve(_event(method=method, path=path))
+    assert match.route == route
+    assert match.path_parameters == FrozenDict(path_parameters)
+
+
+def test_router_matches_resources(router):
+    event = _event(
+        method="GET",
+        path="/documents/123",
+        resource="/documents/{id}",
+        pathParameters={"id": "123"},
+    )
+    match = router.resolve(event)
+    assert match.route == "GET /documents/{id}"
+    assert match.path_parameters == FrozenDict(id="123")
+
+    # A parsed event is routed in the same way
+    assert router.resolve(EventModel(**event)).pipeline is match.pipeline
+
+
+@pytest.mark.parametrize(
+    ("method", "path"),
+    [("POST", "/documents/123"), ("GET", "/documents"), ("GET", "/documents/1/2")],
+)
+def test_router_route_not_found(router, method, path):
+    with pytest.raises(RouteNotFoundError, match=f"no route for {method} {path}"):
+        router.resolve(_event(method=method, path=path))
+
+
+def test_router_matches_templates_in_order_of_specificity(router):
+    router.add_route("GET", "/{proxy+}", steps=[])
+    router.add_route("GET", "/{tenant}/documents/{id}", steps=[])
+
+    routes = {
+        "/documents/1": "GET /documents/{id}",
+        "/documents/1/versions/2": "GET /documents/{id}/versions/{version}",
+        "/acme/documents/1": "GET /{tenant}/documents/{id}",
+        "/documents/1/2": "GET /{proxy+}",
+        "/anything/else": "GET /{proxy+}",
+    }
+    for path, route in routes.items():
+        assert router.resolve(_event(method="GET", path=path)).route == route
+
+
+def test_router_routes_can_only_be_added_once(router):
+    with pytest.raises(ValueError):
+        router.add_route("get", "/documents/{id}", steps=[])
+
+
+def test_router_shares_common_steps(router):
+    read_document = router.resolve(_event(method="GET", path="/documents/1"))
+    create_document = router.resolve(_event(method="POST", path="/documents"))
+    assert read_document.pipeline.steps[0] is create_document.pipeline.steps[0]
+
+    pipeline = read_document.pipeline.bind(
+        event=EventModel(**_event(method="GET", path="/documents/1")),
+        context=LambdaContext(),
+        dependencies={},
+        logger=LOGGER,
+    )
+    result = pipeline(data=PipelineData(path_parameters=read_document.path_parameters))
+    assert result["steps"] == ("authorise", "read_document")
+    assert result["path_parameters"] == FrozenDict(id="1")
+
+
+def test_router_templates_are_compiled_when_routes_are_added(router):
+    matcher = router._matchers["GET"]
+    assert set(matcher.templates) == {"documents"}
+
+    router.add_route("GET", "/{tenant}/documents", steps=[])
+    assert set(matcher.templates) == {"documents", None}
+
+
+def test_router_does_not_share_instrumented_steps():
+    reports = {}
+
+    def make_observer(route: str) -> PipelineObserver:
+        class Observer(PipelineObserver):
+            def after_step(self, record: StepRecord, report: InvocationReport):
+                reports.setdefault(route, []).append(record.name)
+
+        return Observer()
+
+    step_cache = {}
+    pipelines = {
+        route: CompiledPipeline(
+            steps=[authorise],
+            event_type=EventModel,
+            observers=[make_observer(route)],
+            step_cache=step_cache,
+        )
+        for route in ("first", "second")
+    }
+    assert pipelines["first"].steps[0] is not pipelines["second"].steps[0]
+    assert not step_cache
+
+    pipeline = pipelines["second"].bind(
+        event=EventModel(**_event(method="GET", path="/")),
+        context=LambdaContext(),
+        dependencies={},
+        logger=LOGGER,
+    )
+    pipeline(data=PipelineData())
+    assert reports == {"second": ["authorise"]}
+
+
+def test_router_event_sources(router):
+    sqs_pipeline = compile_batch_pipeline(steps=[], event_type=SqsRecordModel)
+    router.add_event_source("aws:sqs", pipeline=sqs_pipeline)
+
+    event = {"Records": [{"eventSource": "aws:sqs", "messageId": "1"}]}
+    assert get_event_source(event) == "aws:sqs"
+    match = router.resolve(event)
+    assert match.route == "aws:sqs"
+    assert match.pipeline is sqs_pipeline
+
+    assert get_event_source({"source": "aws.events"}) == "aws.events"
+    with pytest.raises(RouteNotFoundError, match="aws.events"):
+        router.resolve({"source": "aws.events"})
+
+
+def test_async_router():
+    async def read_document(
+        data: PipelineData,
+        event: EventModel,
+        context: LambdaContext,
+        dependencies: FrozenDict[str, Any],
+        logger: Logger,
+    ) -> PipelineData:
+        await asyncio.sleep(0)
+        return data.set("read", True)
+
+    def validate(
+        data: PipelineData,
+        event: EventModel,
+        context: LambdaContext,
+        dependencies: FrozenDict[str, Any],
+        logger: Logger,
+    ) -> PipelineData:
+        return data.set("valid", True)
+
+    common_steps = [parallel(authorise, validate)]
+    router = Router(
+        event_type=EventModel,
+        common_steps=common_steps,
+        pipeline_type=CompiledAsyncPipeline,
+        validation="boundary",
+    )
+    router.add_route("GET", "/documents/{id}", steps=[read_document])
+    router.add_route("GET", "/", steps=[])
+
+    event = _event(method="GET", path="/documents/1")
+    match = router.resolve(event)
+    pipeline = match.pipeline.bind(
+        event=EventModel(**event),
+        context=LambdaContext(),
+        dependencies={},
+        logger=LOGGER,
+    )
+    result = asyncio.run(pipeline(data=PipelineData()))
+    assert set(result) == {"steps", "valid", "read"}
+    assert len(router.step_cache) == 2
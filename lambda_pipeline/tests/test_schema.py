@@ -0,0 +1,203 @@
+from logging import Logger, getLogger
+from typing import Any, TypedDict
+
+import pytest
+from aws_lambda_powertools.utilities.parser.models import (
+    APIGatewayProxyEventModel as EventModel,
+)
+from lambda_pipeline.dag import compile_dag_pipeline, get_declared_io
+from lambda_pipeline.parallel import parallel
+from lambda_pipeline.pipeline import compile_pipeline
+from lambda_pipeline.schema import (
+    PipelineSchemaError,
+    check_schemas,
+    erase_schemas,
+    get_schema_io,
+    get_step_schemas,
+)
+from lambda_pipeline.step_decorators import (
+    PipelineArgumentError,
+    PipelineStepOutputError,
+)
+from lambda_pipeline.types import FrozenDict, LambdaContext, PipelineData
+
+LOGGER = getLogger(__name__)
+
+
+class TokenSchema(TypedDict):
+    token: str
+
+
+class _DocumentSchema(TypedDict):
+    document_id: str
+
+
+class DocumentSchema(_DocumentSchema, total=False):
+    version: int
+
+
+class BodySchema(TypedDict):
+    body: dict
+
+
+def _bind(compiled_pipeline, event):
+    return compiled_pipeline.bind(
+        event=event, context=LambdaContext(), dependencies={}, logger=LOGGER
+    )
+
+
+def get_token(
+    data: PipelineData,
+    event: EventModel,
+    context: LambdaContext,
+    dependencies: FrozenDict[str, Any],
+    logger: Logger,
+) -> PipelineData[TokenSchema]:
+    return data.set("token", "abc")
+
+
+def get_document_id(
+    data: PipelineData,
+    event: EventModel,
+    context: LambdaContext,
+    dependencies: FrozenDict[str, Any],
+    logger: Logger,
+) -> PipelineData[DocumentSchema]:
+    return data.set("document_id", "123")
+
+
+def read_document(
+    data: PipelineData[DocumentSchema],
+    event: EventModel,
+    context: LambdaContext,
+    dependencies: FrozenDict[str, Any],
+    logger: Logger,
+) -> PipelineData[BodySchema]:
+    return data.set("body", {"id": data["document_id"]})
+
+
+def read_version(
+    data: PipelineData[DocumentSchema],
+    event: EventModel,
+    context: LambdaContext,
+    dependencies: FrozenDict[str, Any],
+    logger: Logger,
+) -> PipelineData:
+    return data.set("has_version", "version" in data)
+
+
+def test_get_step_schemas():
+    assert get_step_schemas(get_token) == (None, TokenSchema)
+    assert get_step_schemas(read_document) == (DocumentSchema, BodySchema)
+    assert get_schema_io(get_token) is None
+    assert get_schema_io(read_document) == ({"document_id"}, {"body"})
+    assert erase_schemas(read_document.__annotations__)["data"] is PipelineData
+
+
+def test_get_step_schemas__not_a_typed_dict():
+    def step(
+        data: PipelineData[dict],
+        event: EventModel,
+        context: LambdaContext,
+        dependencies: FrozenDict[str, Any],
+        logger: Logger,
+    ) -> PipelineData:
+        return data
+
+    with pytest.raises(PipelineSchemaError):
+        get_step_schemas(step)
+    with pytest.raises(PipelineSchemaError):
+        compile_pipeline(steps=[step], event_type=EventModel)
+
+
+def test_check_schemas():
+    assert check_schemas(
+        steps=[parallel(get_token, get_document_id), read_document, read_version]
+    ) == {"token", "document_id", "body"}
+    assert check_schemas(steps=[read_document], initial_keys=("document_id",)) == {
+        "document_id",
+        "body",
+    }
+
+
+@pytest.mark.parametrize(
+    "steps",
+    [
+        [read_document],
+        [read_document, get_document_id],
+        [parallel(get_document_id, read_document)],
+    ],
+)
+def test_check_schemas__key_not_written_upstream(steps):
+    with pytest.raises(PipelineSchemaError):
+        check_schemas(steps=steps)
+    with pytest.raises(PipelineSchemaError):
+        compile_pipeline(steps=steps, event_type=EventModel)
+
+
+@pytest.mark.parametrize("validation", ["full", "boundary", "off"])
+def test_pipeline_with_schemas(event, validation):
+    compiled_pipeline = compile_pipeline(
+        steps=[get_token, get_document_id, read_document, read_version],
+        event_type=EventModel,
+        validation=validation,
+    )
+    result = _bind(compiled_pipeline, event=event)(data=PipelineData())
+    assert result.to_dict() == {
+        "token": "abc",
+        "document_id": "123",
+        "body": {"id": "123"},
+        "has_version": False,
+    }
+
+
+@pytest.mark.parametrize("validation", ["full", "boundary"])
+def test_pipeline_with_schemas__initial_keys(event, validation):
+    compiled_pipeline = compile_pipeline(
+        steps=[read_version],
+        event_type=EventModel,
+        validation=validation,
+        initial_keys=("document_id",),
+    )
+    pipeline = _bind(compiled_pipeline, event=event)
+
+    assert pipeline(data=PipelineData(document_id="1", version=2))["has_version"]
+    with pytest.raises(PipelineArgumentError):
+        pipeline(data=PipelineData())
+
+
+@pytest.mark.parametrize("validation", ["full", "boundary"])
+def test_pipeline_with_schemas__output_keys_are_checked_with_full_validation(
+    event, validation
+):
+    def forget_token(
+        data: PipelineData,
+        event: EventModel,
+        context: LambdaContext,
+        dependencies: FrozenDict[str, Any],
+        logger: Logger,
+    ) -> PipelineData[TokenSchema]:
+        return data
+
+    compiled_pipeline = compile_pipeline(
+        steps=[forget_token], event_type=EventModel, validation=validation
+    )
+    pipeline = _bind(compiled_pipeline, event=event)
+    if validation == "full":
+        with pytest.raises(PipelineStepOutputError):
+            pipeline(data=PipelineData())
+    else:
+        # The schema is trusted, as it was checked on compilation
+        assert pipeline(data=PipelineData()) == PipelineData()
+
+
+def test_dag_pipeline_with_schemas(event):
+    assert get_declared_io(read_document) == ({"document_id"}, {"body"})
+
+    compiled_pipeline = compile_dag_pipeline(
+        steps=[read_document],
+        event_type=EventModel,
+        initial_keys=("document_id",),
+    )
+    result = _bind(compiled_pipeline, event=event)(data=PipelineData(document_id="1"))
+    assert result["body"].to_dict() == {"id": "1"}
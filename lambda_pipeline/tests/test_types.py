@@ -0,0 +1,334 @@
+import pickle
+
+import pytest
+from lambda_pipeline.types import (
+    ContextView,
+    FrozenDict,
+    FrozenList,
+    FrozenSet,
+    LambdaContext,
+    PipelineData,
+    Stream,
+    StreamConsumedError,
+    make_fixed_schema,
+    thaw,
+)
+
+NESTED = {
+    "body": {
+        "id": 123,
+        "tags": ["a", "b"],
+        "flags": {"x", "y"},
+        "pair": (1, {"z": [2]}),
+    }
+}
+
+
+@pytest.fixture()
+def context():
+    context = LambdaContext()
+    context._function_name = "spam, eggs"
+    return context
+
+
+def test_pipeline_data_set():
+    data = PipelineData(foo="bar")
+    new_data = data.set("spam", "eggs")
+
+    assert type(new_data) is PipelineData
+    assert new_data == PipelineData(foo="bar", spam="eggs")
+    assert new_data.to_dict() == {"foo": "bar", "spam": "eggs"}
+    assert data.to_dict() == {"foo": "bar"}
+
+
+def test_pipeline_data_update():
+    data = PipelineData(foo="bar", spam="eggs")
+    new_data = data.update({"foo": "baz"}, ham="ham")
+
+    assert new_data["foo"] == "baz"
+    assert new_data["spam"] == "eggs"
+    assert "ham" in new_data
+    assert "ham" not in data
+    assert list(new_data) == ["foo", "spam", "ham"]
+    assert len(new_data) == 3
+    assert data.update() is data
+
+
+def test_pipeline_data_update__shares_structure_with_parent():
+    document = {"id": 123}
+    data = PipelineData(document=document)
+    new_data = data.set("foo", "bar")
+
+    assert new_data._parent is data
+    assert new_data._layer == {"foo": "bar"}
+    assert new_data["document"] is data["document"]
+
+
+@pytest.mark.parametrize("n_updates", [1, PipelineData._MAX_DEPTH, 50])
+def test_pipeline_data_update__depth_is_bounded(n_updates):
+    data = PipelineData()
+    for i in range(n_updates):
+        data = data.set(f"key_{i}", i)
+        assert data._depth <= PipelineData._MAX_DEPTH
+
+    assert data.to_dict() == {f"key_{i}": i for i in range(n_updates)}
+    assert data.get(f"key_{n_updates}") is None
+    with pytest.raises(KeyError):
+        data[f"key_{n_updates}"]
+
+
+def test_pipeline_data_update__is_hashable_and_comparable():
+    data = PipelineData(foo="bar").set("spam", "eggs")
+    other_data = PipelineData(spam="eggs", foo="bar")
+
+    assert data == other_data
+    assert hash(data) == hash(other_data)
+    assert data == FrozenDict(foo="bar", spam="eggs").to_dict()
+    assert data != {"foo": "bar"}
+
+
+def test_frozen_dict__deep_freezes_nested_values():
+    frozen_dict = FrozenDict(NESTED)
+    body = frozen_dict["body"]
+
+    assert isinstance(body, FrozenDict)
+    assert isinstance(body["tags"], FrozenList)
+    assert body["tags"] == ("a", "b")
+    assert isinstance(body["flags"], FrozenSet)
+    assert isinstance(body["pair"][1], FrozenDict)
+    assert isinstance(body["pair"][1]["z"], FrozenList)
+    assert FrozenDict(frozen_dict)["body"] is body
+
+
+def test_frozen_dict__to_dict_thaws_nested_values():
+    to_dict = FrozenDict(NESTED).to_dict()
+
+    assert to_dict == NESTED
+    assert type(to_dict["body"]) is dict
+    assert type(to_dict["body"]["tags"]) is list
+    assert type(to_dict["body"]["flags"]) is set
+    assert type(to_dict["body"]["pair"]) is tuple
+    assert type(to_dict["body"]["pair"][1]["z"]) is list
+    assert thaw(FrozenDict(NESTED)["body"]) == NESTED["body"]
+
+
+def test_pipeline_data__with_nested_values_is_hashable():
+    data = PipelineData(foo="bar").set("body", NESTED["body"])
+    other_data = PipelineData(NESTED, foo="bar")
+
+    assert data == other_data
+    assert hash(data) == hash(other_data)
+    assert hash(data) != hash(PipelineData(NESTED))
+
+
+def test_frozen_dict__nested_values_are_equal_to_unfrozen_values():
+    data = PipelineData(body={"items": [1, [2, 3]], "tags": {"a"}, "pair": (1, [2])})
+
+    assert data["body"] == {"items": [1, [2, 3]], "tags": {"a"}, "pair": (1, [2])}
+    assert data["body"]["items"] == [1, [2, 3]]
+    assert [1, [2, 3]] == data["body"]["items"]
+    assert data["body"]["items"] == (1, (2, 3))
+    assert data["body"]["items"] != [1, [2, 4]]
+    assert data["body"]["tags"] == {"a"}
+    assert data["body"]["tags"] == frozenset({"a"})
+    assert hash(data["body"]["items"]) == hash((1, (2, 3)))
+    assert data == PipelineData(
+        body={"items": (1, (2, 3)), "tags": {"a"}, "pair": (1, (2,))}
+    )
+
+
+def test_frozen_dict__eq_short_circuits_on_cached_hash():
+    class Value:
+        n_comparisons = 0
+
+        def __eq__(self, other):
+            Value.n_comparisons += 1
+            return True
+
+        def __hash__(self):
+            return 0
+
+    frozen_dict = FrozenDict(value=Value(), n=1)
+    other_frozen_dict = FrozenDict(value=Value(), n=2)
+    assert frozen_dict != other_frozen_dict
+    assert Value.n_comparisons == 1
+
+    hash(frozen_dict), hash(other_frozen_dict)
+    assert frozen_dict != other_frozen_dict
+    assert Value.n_comparisons == 1
+
+
+def test_frozen_dict__hash_of_symmetric_data():
+    hashes = {hash(FrozenDict({"a": i, "b": j})) for i in range(10) for j in range(10)}
+    assert len(hashes) == 100
+
+
+def test_pipeline_data_update__is_immutable():
+    data = PipelineData(foo="bar").set("spam", "eggs")
+    with pytest.raises(TypeError):
+        data["foo"] = "baz"
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        FrozenDict(a=1),
+        PipelineData(a=1).set("b", 2),
+        make_fixed_schema(keys=("a", "b"))(a=1),
+    ],
+)
+def test_frozen_dict__instances_have_no_dict(data):
+    assert not hasattr(data, "__dict__")
+    with pytest.raises(AttributeError):
+        data.attribute = "value"
+
+
+@pytest.mark.parametrize(
+    "data_type", [PipelineData, make_fixed_schema(keys=("a", "b"))]
+)
+def test_pipeline_data__has_no_unused_slots(data_type):
+    slots = [
+        slot for cls in data_type.__mro__ for slot in getattr(cls, "__slots__", ())
+    ]
+    assert "_d" not in slots
+    assert isinstance(data_type(a=1), FrozenDict)
+
+
+def test_fixed_schema():
+    Record = make_fixed_schema(keys=("id", "status", "body"), name="Record")
+    data = Record(id=1, body={"a": [1]})
+
+    assert isinstance(data, PipelineData)
+    assert Record.__name__ == "Record"
+    assert data == PipelineData(id=1, body={"a": [1]})
+    assert hash(data) == hash(PipelineData(id=1, body={"a": [1]}))
+    assert list(data) == ["id", "body"]
+    assert len(data) == 2
+    assert "body" in data and "status" not in data and "spam" not in data
+    assert data.get("status") is None
+    assert data.get("spam") is None
+    assert isinstance(data["body"]["a"], FrozenList)
+    assert data.to_dict() == {"id": 1, "body": {"a": [1]}}
+
+    new_data = data.set("status", "ok").update(id=2)
+    assert type(new_data) is Record
+    assert new_data.to_dict() == {"id": 2, "status": "ok", "body": {"a": [1]}}
+    assert new_data["body"] is data["body"]
+    assert data.to_dict() == {"id": 1, "body": {"a": [1]}}
+    assert pickle.loads(pickle.dumps(new_data)) == new_data
+
+
+def test_fixed_schema__undeclared_keys():
+    Record = make_fixed_schema(keys=("id",))
+
+    with pytest.raises(KeyError):
+        Record(spam="eggs")
+    with pytest.raises(KeyError):
+        Record(id=1).set("spam", "eggs")
+    with pytest.raises(KeyError):
+        Record(id=1)["spam"]
+    with pytest.raises(ValueError):
+        make_fixed_schema(keys=("id", "id"))
+
+
+def test_stream():
+    stream = Stream([{"a": [1]}, 2])
+    assert not stream.consumed
+
+    assert list(stream) == [{"a": [1]}, 2]
+    assert stream.consumed
+    with pytest.raises(StreamConsumedError):
+        list(stream)
+    with pytest.raises(StreamConsumedError):
+        stream.map(str)
+
+
+def test_stream__map_is_lazy():
+    produced = []
+
+    def values():
+        for i in range(3):
+            produced.append(i)
+            yield i
+
+    stream = Stream(values()).map(lambda value: value * 2)
+    assert produced == []
+    assert list(stream) == [0, 2, 4]
+
+
+def test_frozen_dict__iterators_are_streams():
+    data = PipelineData(pages=(i for i in range(3)), items=iter([1]), values=[1, 2])
+
+    assert isinstance(data["pages"], Stream)
+    assert isinstance(data["items"], Stream)
+    assert isinstance(data["values"], FrozenList)
+    assert data.set("other", 1)["pages"] is data["pages"]
+    assert hash(data) == hash(data.set("values", [1, 2]))
+    with pytest.raises(TypeError):
+        pickle.dumps(data)
+
+
+def test_context_view__reads_from_context(context):
+    context_view = ContextView(context)
+
+    assert context_view._function_name == "spam, eggs"
+    assert context_view.function_name == "spam, eggs"
+    assert isinstance(context_view, LambdaContext)
+    with pytest.raises(AttributeError):
+        context_view.not_an_attribute
+
+
+def test_context_view__writes_are_not_persisted(context):
+    context_view = ContextView(context)
+    context_view._function_name = "foo, bar"
+    context_view.new_attribute = "ham"
+
+    assert context_view._function_name == "foo, bar"
+    assert context_view.function_name == "foo, bar"
+    assert context_view.new_attribute == "ham"
+    assert context._function_name == "spam, eggs"
+    assert not hasattr(context, "new_attribute")
+    assert ContextView(context)._function_name == "spam, eggs"
+
+    del context_view._function_name
+    assert context_view._function_name == "spam, eggs"
+    with pytest.raises(AttributeError):
+        del context_view._function_name
+
+
+def test_context_view__static_and_class_methods():
+    class Context:
+        def __init__(self):
+            self.remaining_ms = 1000
+
+        @staticmethod
+        def get_remaining_time_in_millis() -> int:
+            return 0
+
+        @classmethod
+        def name(cls) -> str:
+            return cls.__name__
+
+        def remaining_s(self) -> float:
+            return self.remaining_ms / 1000
+
+    context_view = ContextView(Context())
+    context_view.remaining_ms = 500
+    assert context_view.get_remaining_time_in_millis() == 0
+    assert context_view.name() == "Context"
+    assert context_view.remaining_s() == 0.5
+
+
+def test_context_view__attributes_are_resolved_per_type():
+    class Context:
+        def name(self) -> str:
+            return "method"
+
+    class OtherContext:
+        name = "attribute"
+
+    context = Context()
+    assert ContextView(context).name() == "method"
+    assert ContextView(OtherContext()).name == "attribute"
+    context.name = lambda: "shadowed"
+    assert ContextView(context).name() == "shadowed"
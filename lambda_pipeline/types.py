@@ -1,27 +1,246 @@
 import collections
+import operator
+import threading
+from functools import lru_cache
 from importlib import import_module
+from inspect import getattr_static
+from types import FunctionType
 
-from aws_lambda_powertools.utilities.typing import LambdaContext
+# Where to find the LambdaContext type, in order of preference. These are only
+# imported on first use of LambdaContext, since importing them adds to the cold start
+_LAMBDA_CONTEXT_MODULES = (
+    "localstack.services.awslambda.lambda_executors",
+    "awslambdaric.lambda_context",
+    "aws_lambda_powertools.utilities.typing",
+)
 
-try:
-    lambda_context = import_module("awslambdaric.lambda_context")
-    LambdaContext = lambda_context.LambdaContext
-except ModuleNotFoundError:
-    pass
 
-try:
-    lambda_executors = import_module("localstack.services.awslambda.lambda_executors")
-    LambdaContext = lambda_executors.LambdaContext
-except ModuleNotFoundError:
+def _resolve_lambda_context() -> type:
+    for module_name in _LAMBDA_CONTEXT_MODULES:
+        try:
+            return import_module(module_name).LambdaContext
+        except ModuleNotFoundError:
+            continue
+    raise ImportError(
+        f"LambdaContext could not be imported from {_LAMBDA_CONTEXT_MODULES}"
+    )
+
+
+def __getattr__(name: str):
+    if name == "LambdaContext":
+        LambdaContext = _resolve_lambda_context()
+        globals()["LambdaContext"] = LambdaContext
+        return LambdaContext
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# The properties and functions of context types, by (type, attribute name), or None
+# for attributes which are read directly from the context, so that each attribute
+# is only looked up statically once per context type
+_CONTEXT_ATTRIBUTES: dict = {}
+
+
+def _context_attribute(context_type: type, name: str):
+    key = (context_type, name)
+    try:
+        return _CONTEXT_ATTRIBUTES[key]
+    except KeyError:
+        pass
+    # Static lookup, so that staticmethods and classmethods aren't bound to the view
+    attr = getattr_static(context_type, name, None)
+    if not isinstance(attr, (property, FunctionType)):
+        attr = None
+    _CONTEXT_ATTRIBUTES[key] = attr
+    return attr
+
+
+class ContextView:
+    """
+    A copy-on-write view of a LambdaContext. Attributes are read from the
+    underlying context, but attributes set on the view are only visible on
+    the view, so a step can't persist changes to the context without the
+    cost of a deepcopy. Note that (as with a shallow copy) mutable attribute
+    values are shared with the underlying context.
+
+    Properties and methods of the context are bound to the view, so they
+    see attributes that have been set on the view (staticmethods and
+    classmethods are left as they are), and the view passes isinstance
+    checks for the type of the underlying context.
+    """
+
+    __slots__ = ("__context", "__overrides")
+
+    def __init__(self, context):
+        object.__setattr__(self, "_ContextView__context", context)
+        object.__setattr__(self, "_ContextView__overrides", {})
+
+    # Every attribute is looked up here (rather than in a __getattr__, which is only
+    # called once the default lookup has raised an AttributeError) to keep reads cheap
+    def __getattribute__(self, name):
+        overrides = _view_overrides(self)
+        if name in overrides:
+            return overrides[name]
+
+        context = _view_context(self)
+        attr = _context_attribute(type(context), name)
+        if attr is None:
+            return getattr(context, name)
+        if type(attr) is property or name not in getattr(context, "__dict__", ()):
+            return attr.__get__(self, type(context))
+        # A function shadowed by an instance attribute of the context
+        return getattr(context, name)
+
+    def __setattr__(self, name, value):
+        _view_overrides(self)[name] = value
+
+    def __delattr__(self, name):
+        try:
+            del _view_overrides(self)[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __repr__(self):
+        return f"{ContextView.__name__}({_view_context(self)!r})"
+
+
+_view_context = ContextView._ContextView__context.__get__
+_view_overrides = ContextView._ContextView__overrides.__get__
+
+
+class FrozenList(tuple):
+    """
+    A list which has been frozen by FrozenDict, which is thawed back into a list.
+    It is equal to a list or a tuple of the same items, so that frozen data can be
+    compared with the (unfrozen) values that were put in it.
+    """
+
+    __slots__ = ()
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, list):
+            other = tuple(other)
+        return tuple.__eq__(self, other)
+
+    def __ne__(self, other: object) -> bool:
+        return not self == other
+
+    __hash__ = tuple.__hash__
+
+
+class FrozenSet(frozenset):
+    """
+    A set which has been frozen by FrozenDict, which is thawed back into a set.
+    As a frozenset, it is equal to a set or a frozenset of the same items.
+    """
+
+    __slots__ = ()
+
+
+class StreamConsumedError(Exception):
     pass
 
 
-class FrozenDict(collections.abc.Mapping):
-    """An implementation of a frozen dict, lifted from https://stackoverflow.com/a/2704866/1571593"""
+class Stream:
+    """
+    A lazily produced sequence of values (e.g. the pages of a DynamoDB query, or the
+    lines of an S3 object) which can be consumed once, so that large payloads can be
+    passed between steps without materialising them. Iterators (e.g. generators)
+    are wrapped in a Stream when they are put in a FrozenDict or PipelineData.
+
+    In place of immutability, a Stream can only be iterated once (iterating it
+    again raises StreamConsumedError), so the values it yields are only ever seen
+    by the step which consumes it. Derive a new Stream with `stream.map(func)`,
+    which consumes this one lazily.
+    """
+
+    __slots__ = ("_iterator", "_consumed", "_lock")
+
+    def __init__(self, iterable):
+        self._iterator = iter(iterable)
+        self._consumed = False
+        self._lock = threading.Lock()
+
+    @property
+    def consumed(self) -> bool:
+        return self._consumed
+
+    def __iter__(self):
+        with self._lock:
+            if self._consumed:
+                raise StreamConsumedError("this stream has already been consumed")
+            self._consumed = True
+        return self._iterator
+
+    def map(self, func) -> "Stream":
+        """A new Stream of `func(value)` for each value of this stream"""
+        return Stream(map(func, self))
+
+    def __reduce__(self):
+        raise TypeError("a Stream can't be pickled")
+
+    def __repr__(self):
+        return f"{type(self).__name__}(consumed={self._consumed})"
+
+
+_IMMUTABLE_TYPES = frozenset((str, int, float, bool, bytes, type(None)))
 
-    def __init__(self, *args, **kwargs):
-        self._d = dict(*args, **kwargs)
-        self._hash = None
+
+def freeze(value):
+    """
+    Deep-freeze a value into a hashable, immutable counterpart: mappings into
+    FrozenDicts, lists into FrozenLists, sets into FrozenSets, tuples into tuples
+    of frozen values and iterators into Streams. Other values are returned as they
+    are.
+    """
+    if type(value) in _IMMUTABLE_TYPES or isinstance(
+        value, (FrozenDict, FrozenList, FrozenSet, Stream)
+    ):
+        return value
+    if isinstance(value, collections.abc.Mapping):
+        return FrozenDict(value)
+    if isinstance(value, list):
+        return FrozenList(map(freeze, value))
+    if isinstance(value, set):
+        return FrozenSet(map(freeze, value))
+    if type(value) is tuple:
+        frozen_value = tuple(map(freeze, value))
+        return value if all(map(operator.is_, frozen_value, value)) else frozen_value
+    if isinstance(value, collections.abc.Iterator):
+        return Stream(value)
+    return value
+
+
+def thaw(value):
+    """The inverse of freeze: FrozenDicts, FrozenLists and FrozenSets are thawed into dicts, lists and sets"""
+    if isinstance(value, FrozenDict):
+        return value.to_dict()
+    if isinstance(value, FrozenList):
+        return list(map(thaw, value))
+    if isinstance(value, FrozenSet):
+        return set(map(thaw, value))
+    if type(value) is tuple:
+        return tuple(map(thaw, value))
+    return value
+
+
+def _freeze_values(mapping: dict) -> dict:
+    if _FROZEN_TYPES.issuperset(map(type, mapping.values())):
+        return mapping
+    for key, value in mapping.items():
+        frozen_value = freeze(value)
+        if frozen_value is not value:
+            mapping[key] = frozen_value
+    return mapping
+
+
+class _FrozenMapping(collections.abc.Mapping):
+    """
+    The methods of FrozenDict, which are shared with PipelineData and
+    FixedSchemaPipelineData. Subclasses provide the items as a dict in '_d' (a
+    slot, or a property), so that they don't carry a slot that they don't use.
+    """
+
+    __slots__ = ("_hash",)
 
     def __iter__(self):
         return iter(self._d)
@@ -39,31 +258,290 @@ class FrozenDict(collections.abc.Mapping):
         return repr(self._d)
 
     def __eq__(self, other: object) -> bool:
-        if isinstance(other, FrozenDict):
+        if self is other:
+            return True
+        if isinstance(other, _FrozenMapping):
+            if (
+                self._hash is not None
+                and other._hash is not None
+                and self._hash != other._hash
+            ):
+                return False
             return other._d == self._d
+        if isinstance(other, dict):
+            return self._d == other
         return False
 
     def __hash__(self):
-        # It would have been simpler and maybe more obvious to
-        # use hash(tuple(sorted(self._d.iteritems()))) from this discussion
-        # so far, but this solution is O(n). I don't know what kind of
-        # n we are going to run into, but sometimes it's hard to resist the
-        # urge to optimize when it will gain improved algorithmic performance.
+        # An order-independent combination of the hashes of the items, which
+        # (unlike XOR-ing them) is well distributed for symmetric data
         if self._hash is None:
-            hash_ = 0
-            for pair in self.items():
-                hash_ ^= hash(pair)
-            self._hash = hash_
+            self._hash = hash(frozenset(self._d.items()))
         return self._hash
 
+    def __reduce__(self):
+        # Don't pickle the cached hash, since hashes differ between processes
+        return type(self), (self._d,)
+
     def to_dict(self):
-        return dict(self._d)
+        if _IMMUTABLE_TYPES.issuperset(map(type, self._d.values())):
+            return dict(self._d)
+        return {key: thaw(value) for key, value in self._d.items()}
 
 
-class PipelineData(FrozenDict):
+class FrozenDict(_FrozenMapping):
+    """
+    An implementation of a frozen dict, lifted from https://stackoverflow.com/a/2704866/1571593
+
+    Values are deep-frozen (see `freeze`), so that a FrozenDict is hashable even if
+    it contains dicts, lists or sets, and `to_dict` thaws them back. The hash is
+    cached (at every level), and used to short-circuit equality.
+    """
+
+    __slots__ = ("_d",)
+
+    def __init__(self, *args, **kwargs):
+        self._d = _freeze_values(dict(*args, **kwargs))
+        self._hash = None
+
+
+class PipelineData(_FrozenMapping):
     """
     A dict-object for passing data between pipeline steps.
     Pipeline will force this to be immutable on ingestion to a step.
+
+    New data can be derived with `data.set(key, value)` or `data.update(...)`:
+    the new instance only holds the changed keys (a "layer") and shares the rest
+    of its structure with its parent. The layers are flattened into a single dict
+    when the whole mapping is needed (e.g. iteration, equality or `to_dict`), and
+    when the chain of parents gets deeper than _MAX_DEPTH. So an update usually
+    only costs the size of the update, but every (_MAX_DEPTH + 1)th update in a
+    chain copies all n keys, i.e. O(n / _MAX_DEPTH) amortised, and a lookup walks
+    up to _MAX_DEPTH layers.
+
+    It is a FrozenDict (by registration, without FrozenDict's '_d' slot, since
+    the flattened dict is kept in '_flat').
     """
 
-    pass
+    __slots__ = ("_layer", "_parent", "_depth", "_flat")
+
+    _MAX_DEPTH = 8
+
+    def __init__(self, *args, **kwargs):
+        self._layer = _freeze_values(dict(*args, **kwargs))
+        self._parent = None
+        self._depth = 0
+        self._flat = self._layer
+        self._hash = None
+
+    @property
+    def _d(self):
+        if self._flat is None:
+            self._flat = self._flatten()
+        return self._flat
+
+    def _flatten(self):
+        layers = []
+        node = self
+        while node._flat is None:
+            layers.append(node._layer)
+            node = node._parent
+        flat = dict(node._flat)
+        for layer in reversed(layers):
+            flat.update(layer)
+        return flat
+
+    def __getitem__(self, key):
+        node = self
+        while node._flat is None:
+            if key in node._layer:
+                return node._layer[key]
+            node = node._parent
+        return node._flat[key]
+
+    def __contains__(self, key):
+        node = self
+        while node._flat is None:
+            if key in node._layer:
+                return True
+            node = node._parent
+        return key in node._flat
+
+    def set(self, key, value) -> "PipelineData":
+        """Return a new PipelineData with 'key' set to 'value'"""
+        return self.update({key: value})
+
+    def update(self, *args, **kwargs) -> "PipelineData":
+        """Return a new PipelineData updated as per dict.update"""
+        layer = _freeze_values(dict(*args, **kwargs))
+        if not layer:
+            return self
+
+        data = object.__new__(type(self))
+        data._layer = layer
+        data._parent = self
+        data._depth = self._depth + 1
+        data._flat = None
+        data._hash = None
+        if data._depth > self._MAX_DEPTH:
+            data._flat = data._layer = data._flatten()
+            data._parent = None
+            data._depth = 0
+        return data
+
+
+class PipelineResult:
+    """
+    The output of a step which ends the pipeline early (e.g. on a cache hit, or for
+    a 304 Not Modified), created with `PipelineResult.done(data)`. The remaining
+    steps are skipped and the pipeline returns the data, without the cost of
+    raising an exception (and catching it in the handler).
+    """
+
+    __slots__ = ("data",)
+
+    def __init__(self, data: PipelineData):
+        self.data = data
+
+    @classmethod
+    def done(cls, data: PipelineData) -> "PipelineResult":
+        return cls(data)
+
+    def __eq__(self, other: object) -> bool:
+        return type(other) is type(self) and other.data == self.data
+
+    def __hash__(self):
+        return hash((type(self), self.data))
+
+    def __reduce__(self):
+        return type(self), (self.data,)
+
+    def __repr__(self):
+        return f"{type(self).__name__}.done({self.data!r})"
+
+
+_UNSET = object()
+
+
+class FixedSchemaPipelineData(_FrozenMapping):
+    """
+    A compact PipelineData for a fixed set of keys (see `make_fixed_schema`), whose
+    values are stored in a tuple, in the order of the keys. Setting a key which
+    isn't in the schema raises a KeyError.
+    """
+
+    __slots__ = ("_values",)
+
+    _keys: tuple = ()
+    _index: dict = {}
+
+    def __init__(self, *args, **kwargs):
+        items = _freeze_values(dict(*args, **kwargs))
+        if not items.keys() <= self._index.keys():
+            for key in items:
+                self._position(key)
+        self._values = tuple([items.get(key, _UNSET) for key in self._keys])
+        self._hash = None
+
+    @classmethod
+    def _position(cls, key) -> int:
+        try:
+            return cls._index[key]
+        except KeyError:
+            raise KeyError(f"'{key}' is not in the schema {cls._keys}") from None
+
+    @property
+    def _d(self):
+        return {
+            key: value
+            for key, value in zip(self._keys, self._values)
+            if value is not _UNSET
+        }
+
+    def __getitem__(self, key):
+        value = self._values[self._position(key)]
+        if value is _UNSET:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        index = self._index.get(key)
+        return index is not None and self._values[index] is not _UNSET
+
+    def __iter__(self):
+        return (
+            key for key, value in zip(self._keys, self._values) if value is not _UNSET
+        )
+
+    def __len__(self):
+        return len(self._values) - self._values.count(_UNSET)
+
+    def set(self, key, value) -> "FixedSchemaPipelineData":
+        """Return a new instance with 'key' set to 'value'"""
+        return self.update({key: value})
+
+    def update(self, *args, **kwargs) -> "FixedSchemaPipelineData":
+        """Return a new instance updated as per dict.update"""
+        layer = _freeze_values(dict(*args, **kwargs))
+        if not layer:
+            return self
+
+        values = list(self._values)
+        for key, value in layer.items():
+            values[self._position(key)] = value
+        data = object.__new__(type(self))
+        data._values = tuple(values)
+        data._hash = None
+        return data
+
+    def __reduce__(self):
+        return _unpickle_fixed_schema, (self._keys, type(self).__name__, self._d)
+
+
+FrozenDict.register(PipelineData)
+PipelineData.register(FixedSchemaPipelineData)
+
+
+def make_fixed_schema(
+    keys: tuple[str, ...], name: str = "FixedSchemaPipelineData"
+) -> type:
+    """
+    Create a FixedSchemaPipelineData class for the keys, which can be used in place
+    of PipelineData (it passes isinstance checks for PipelineData), e.g.
+
+    Record = make_fixed_schema(keys=("id", "status", "body"), name="Record")
+    data = Record(id=123)
+
+    The same class is returned for the same keys and name.
+    """
+    keys = tuple(keys)
+    if len(set(keys)) != len(keys):
+        raise ValueError(f"the keys of the schema are not unique: {keys}")
+    return _make_fixed_schema(keys=keys, name=name)
+
+
+@lru_cache(maxsize=None)
+def _make_fixed_schema(keys: tuple[str, ...], name: str) -> type:
+    return type(
+        name,
+        (FixedSchemaPipelineData,),
+        {
+            "__slots__": (),
+            "_keys": keys,
+            "_index": {key: i for i, key in enumerate(keys)},
+        },
+    )
+
+
+def _unpickle_fixed_schema(keys: tuple[str, ...], name: str, items: dict):
+    return make_fixed_schema(keys=keys, name=name)(items)
+
+
+# The types of values which are already frozen, so don't need to be checked by freeze
+_FROZEN_TYPES = _IMMUTABLE_TYPES | {
+    FrozenDict,
+    PipelineData,
+    FrozenList,
+    FrozenSet,
+    Stream,
+}